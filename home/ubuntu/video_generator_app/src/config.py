@@ -16,6 +16,11 @@ class Config:
     AUDIO_DIR = os.path.join(STATIC_DIR, 'audio')
     VIDEOS_DIR = os.path.join(STATIC_DIR, 'videos')
     TEMP_DIR = os.path.join(STATIC_DIR, 'temp')
+    CACHE_DIR = os.path.join(STATIC_DIR, 'cache')
+    SUBTITLE_CACHE_DIR = os.path.join(CACHE_DIR, 'subtitles')
+    IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, 'images')
+    RENDER_CACHE_DIR = os.path.join(CACHE_DIR, 'renders')
+    SLIDE_SEGMENT_CACHE_DIR = os.path.join(CACHE_DIR, 'slide_segments')
     
     # API設定
     TWITTER_API_KEY = os.getenv('TWITTER_API_KEY', '')
@@ -33,10 +38,36 @@ class Config:
     USE_APIFY_FOR_TWITTER = os.getenv('USE_APIFY_FOR_TWITTER', 'True').lower() == 'true'
     
     # 動画生成設定
+    VIDEO_ENGINE = os.getenv('VIDEO_ENGINE', 'diffusionstudio')  # 'diffusionstudio'、'ffmpeg'、'pyav'のいずれか
     DEFAULT_SLIDE_DURATION = int(os.getenv('DEFAULT_SLIDE_DURATION', '5'))  # 秒
+    # スライドの切り替え方（'fixed'は1枚あたりDEFAULT_SLIDE_DURATIONずつ、'even'はナレーション全体に均等、
+    # 'comments'はCOMMENTS_PER_SLIDE件のコメントごとにコメントの境界で切り替え）
+    SLIDE_MODE = os.getenv('SLIDE_MODE', 'fixed')
+    COMMENTS_PER_SLIDE = int(os.getenv('COMMENTS_PER_SLIDE', '0'))  # 0の場合は画像の枚数から決定
     MAX_INTRO_DURATION = int(os.getenv('MAX_INTRO_DURATION', '25'))  # 秒
     DEFAULT_FONT = os.getenv('DEFAULT_FONT', 'Arial')
     DEFAULT_FONT_SIZE = int(os.getenv('DEFAULT_FONT_SIZE', '36'))
+    SUBTITLE_CACHE_MAX_MB = int(os.getenv('SUBTITLE_CACHE_MAX_MB', '512'))
+    BGM_DUCK_GAIN = float(os.getenv('BGM_DUCK_GAIN', '0.5'))  # ナレーション中のBGMの音量倍率
+    VIDEO_WIDTH = int(os.getenv('VIDEO_WIDTH', '1920'))  # 縦動画の場合は1080
+    VIDEO_HEIGHT = int(os.getenv('VIDEO_HEIGHT', '1080'))  # 縦動画の場合は1920
+    IMAGE_CACHE_MAX_MB = int(os.getenv('IMAGE_CACHE_MAX_MB', '1024'))
+    SLIDE_SEGMENT_CACHE_MAX_MB = int(os.getenv('SLIDE_SEGMENT_CACHE_MAX_MB', '2048'))
+    RENDER_CACHE_MAX_MB = int(os.getenv('RENDER_CACHE_MAX_MB', '10240'))
+    RENDER_CACHE_MAX_AGE_DAYS = int(os.getenv('RENDER_CACHE_MAX_AGE_DAYS', '7'))
+    VIDEO_FRAME_MODE = os.getenv('VIDEO_FRAME_MODE', 'cfr')  # 'cfr'（固定フレームレート）または 'vfr'（可変フレームレート）
+    PREVIEW_SHORT_SIDE = int(os.getenv('PREVIEW_SHORT_SIDE', '360'))  # プレビューの短辺（px）
+    PREVIEW_FPS = int(os.getenv('PREVIEW_FPS', '8'))
+    HLS_SEGMENT_SECONDS = int(os.getenv('HLS_SEGMENT_SECONDS', '4'))  # 生成中に配信するHLSのセグメントの長さ（秒）
+    # コメント数がこの数以上の場合は、画像を表示中の間だけ読み込むストリーミング合成を使う
+    STREAMING_RENDER_THRESHOLD = int(os.getenv('STREAMING_RENDER_THRESHOLD', '300'))
+    # 出力プロファイル（'名前:幅x高さ[:ビットレート]'のカンマ区切り）
+    OUTPUT_PROFILES = os.getenv('OUTPUT_PROFILES', 'landscape:1920x1080:8M,portrait:1080x1920:6M')
+    # レンダリングプロファイル（'draft'・'standard'・'archive'が組み込み。リクエストで指定しない場合に使う）
+    RENDER_PROFILE = os.getenv('RENDER_PROFILE', 'standard')
+    # 組み込みに追加・上書きするレンダリングプロファイル（'名前:キー=値:...'をカンマ区切り、
+    # キーはpreset・crf・gop・tune・threads・audio・size・fps・base。例: 'fast:preset=veryfast:crf=26'）
+    RENDER_PROFILES = os.getenv('RENDER_PROFILES', '')
     
     # データ保持期間（日数）
     DATA_RETENTION_DAYS = int(os.getenv('DATA_RETENTION_DAYS', '7'))
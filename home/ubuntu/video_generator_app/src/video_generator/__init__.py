@@ -2,20 +2,24 @@
 動画生成モジュールのインターフェース
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+from .timeline import Timeline
 
 class VideoGeneratorEngine(ABC):
     """動画生成の基底クラス"""
     
     @abstractmethod
     def create_slideshow(self, image_paths: List[str], slide_duration: float = 5.0, 
-                        output_filename: Optional[str] = None) -> str:
+                        output_filename: Optional[str] = None,
+                        timeline: Optional[Timeline] = None) -> str:
         """画像からスライドショー動画を作成する抽象メソッド
 
         Args:
             image_paths: 画像ファイルのパスリスト
             slide_duration: 1枚あたりの表示時間（秒）
             output_filename: 出力ファイル名（Noneの場合は自動生成）
+            timeline: ナレーションのタイムライン（指定した場合はナレーションと同じ長さで作成する）
 
         Returns:
             str: 生成された動画ファイルのパス
@@ -23,14 +27,14 @@ class VideoGeneratorEngine(ABC):
         pass
     
     @abstractmethod
-    def add_audio_to_video(self, video_path: str, audio_paths: List[str], 
+    def add_audio_to_video(self, video_path: str, audio_paths: Union[List[str], Timeline], 
                           bgm_path: Optional[str] = None, bgm_volume: float = 0.3,
                           output_filename: Optional[str] = None) -> str:
         """動画に音声とBGMを追加する抽象メソッド
 
         Args:
             video_path: 元動画のパス
-            audio_paths: 音声ファイルのパスリスト
+            audio_paths: 音声ファイルのパスリスト、またはタイムライン
             bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
             bgm_volume: BGMの音量（0.0〜1.0）
             output_filename: 出力ファイル名（Noneの場合は自動生成）
@@ -41,17 +45,19 @@ class VideoGeneratorEngine(ABC):
         pass
     
     @abstractmethod
-    def add_subtitles(self, video_path: str, subtitles: List[Dict], 
+    def add_subtitles(self, video_path: str, subtitles: Union[List[Dict], Timeline], 
                      font_size: int = 36, font_color: str = 'white',
-                     output_filename: Optional[str] = None) -> str:
+                     output_filename: Optional[str] = None,
+                     soft: bool = False) -> str:
         """動画に字幕を追加する抽象メソッド
 
         Args:
             video_path: 元動画のパス
-            subtitles: 字幕情報のリスト
+            subtitles: 字幕情報のリスト、またはタイムライン
             font_size: フォントサイズ
             font_color: フォント色
             output_filename: 出力ファイル名（Noneの場合は自動生成）
+            soft: Trueの場合は焼き込まずに字幕トラック（mov_text）とサイドカーファイル（SRT/WebVTT）にする
 
         Returns:
             str: 生成された動画ファイルのパス
@@ -59,39 +65,111 @@ class VideoGeneratorEngine(ABC):
         pass
     
     @abstractmethod
-    def generate_video(self, image_paths: List[str], audio_paths: List[Dict], 
+    def generate_video(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline], 
                       intro_audio_path: Optional[str] = None,
                       bgm_path: Optional[str] = None,
                       slide_duration: float = 5.0,
-                      output_filename: Optional[str] = None) -> str:
+                      output_filename: Optional[str] = None,
+                      hls_dir: Optional[str] = None,
+                      soft_subtitles: bool = False) -> str:
         """画像と音声から動画を生成する抽象メソッド
 
         Args:
             image_paths: 画像ファイルのパスリスト
-            audio_paths: 音声ファイル情報のリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン（イントロを含めて計画済みのもの）
             intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
             bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
             slide_duration: 1枚あたりの表示時間（秒）
             output_filename: 出力ファイル名（Noneの場合は自動生成）
+            hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ（Noneの場合は出力しない、
+                生成中から再生できるよう、セグメントは完成前から順に書き出す）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに字幕トラック（mov_text）とサイドカーファイル（SRT/WebVTT）にする
 
         Returns:
             str: 生成された動画ファイルのパス
         """
         pass
+    
+    def plan_timeline(self, audio_paths: List[Dict], intro_audio_path: Optional[str] = None,
+                      image_paths: Optional[List[str]] = None, slide_duration: float = 5.0) -> Timeline:
+        """ナレーション・字幕・スライドのタイムラインを計画する
+
+        タイムラインはtimeline_fpsのフレーム単位で計画する。戻り値をgenerate_videoなどのaudio_pathsに
+        渡すと、計画をやり直さずにそのまま使う（プレビューと本番で同じタイムラインを共有できる）。
+
+        Args:
+            audio_paths: 音声ファイル情報のリスト
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            image_paths: スライドの画像ファイルのパスリスト（Noneの場合はスライドを決定しない）
+            slide_duration: 1枚あたりの表示時間（秒）
+
+        Returns:
+            Timeline: タイムライン
+        """
+        return self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
 
 # 各エンジン用のクラスをインポート
 from .video_generator import VideoGenerator
+from .ffmpeg_generator import FFmpegVideoGenerator
+from .pyav_generator import PyAVVideoGenerator
+from .subtitle_cache import SubtitleRasterCache
+from .audio_probe import DurationIndex, probe_duration
+from .audio_mixer import AudioMixer
+from .image_normalizer import ImageNormalizer
+from .render_metrics import RenderMetrics
+from .render_cache import RenderCache
+from .slide_segments import SlideSegmentCache
+from .output_profiles import make_profile, parse_output_profiles, group_by_aspect
+from .subtitle_tracks import write_sidecars, sidecar_paths, mux_subtitle_track
+from .render_profiles import make_render_profile, parse_render_profiles, get_render_profile
+
+def preview_size(width: int, height: int, short_side: int = 360) -> Tuple[int, int]:
+    """アスペクト比を保ったまま、短辺が指定の長さになる出力サイズを返す
+
+    Args:
+        width: 本番の動画の幅
+        height: 本番の動画の高さ
+        short_side: プレビューの短辺の長さ
+
+    Returns:
+        Tuple[int, int]: プレビューの(幅, 高さ)（どちらも偶数）
+    """
+    scale = short_side / min(width, height)
+    return (max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2))
 
 def create_video_generator(engine_type: str, **kwargs) -> VideoGeneratorEngine:
     """エンジンタイプに応じた動画生成エンジンを作成する
 
+    render_profileにはレンダリングプロファイル名（render_profilesで追加・上書きできる）か
+    get_render_profileの戻り値を指定する。プロファイルに解像度・フレームレートがある場合は
+    width・height・fpsより優先する。
+
+    previewにTrueを指定すると、低解像度・低フレームレートのプレビュー用のエンジンを作成する
+    （preview_short_sideで短辺の長さ、preview_fpsでフレームレートを指定できる）。タイムラインは
+    本番のフレームレートで計画し、出力のフレームレートに換算する。エンコード設定はrender_profileに
+    関わらずdraftプロファイルに置き換える（render_profileは本番の解像度・フレームレートの決定にだけ使う）。
+
     Args:
-        engine_type: エンジンタイプ ('diffusionstudio')
+        engine_type: エンジンタイプ ('diffusionstudio'、'ffmpeg'、'pyav'のいずれか)
         **kwargs: エンジンに渡す追加パラメータ
 
     Returns:
         VideoGeneratorEngine: 動画生成エンジンのインスタンス
     """
+    render_profile = kwargs.get('render_profile')
+    if not isinstance(render_profile, dict):
+        render_profile = get_render_profile(render_profile, kwargs.get('render_profiles', ''))
+    
+    width = render_profile["width"] or kwargs.get('width', 1920)
+    height = render_profile["height"] or kwargs.get('height', 1080)
+    fps = render_profile["fps"] or kwargs.get('fps', 24)
+    timeline_fps = None
+    if kwargs.get('preview'):
+        width, height = preview_size(width, height, kwargs.get('preview_short_side', 360))
+        timeline_fps = fps
+        fps = kwargs.get('preview_fps', 8)
+        render_profile = get_render_profile('draft', kwargs.get('render_profiles', ''))
+    
     if engine_type.lower() == 'diffusionstudio':
         required_keys = ['output_dir', 'temp_dir']
         for key in required_keys:
@@ -101,7 +179,92 @@ def create_video_generator(engine_type: str, **kwargs) -> VideoGeneratorEngine:
         return VideoGenerator(
             output_dir=kwargs['output_dir'],
             temp_dir=kwargs['temp_dir'],
-            font_path=kwargs.get('font_path')
+            font_path=kwargs.get('font_path'),
+            subtitle_cache_dir=kwargs.get('subtitle_cache_dir'),
+            subtitle_cache_max_bytes=kwargs.get('subtitle_cache_max_bytes', 512 * 1024 * 1024),
+            max_concurrent_jobs=kwargs.get('max_concurrent_jobs', 1),
+            segment_workers=kwargs.get('segment_workers'),
+            duration_index=kwargs.get('duration_index'),
+            bgm_duck_gain=kwargs.get('bgm_duck_gain', 1.0),
+            frame_mode=kwargs.get('frame_mode', 'cfr'),
+            width=width,
+            height=height,
+            fps=fps,
+            render_profile=render_profile,
+            image_cache_dir=kwargs.get('image_cache_dir'),
+            image_cache_max_bytes=kwargs.get('image_cache_max_bytes', 1024 * 1024 * 1024),
+            render_cache_dir=kwargs.get('render_cache_dir'),
+            render_cache_max_bytes=kwargs.get('render_cache_max_bytes', 10 * 1024 * 1024 * 1024),
+            render_cache_max_age=kwargs.get('render_cache_max_age', 7 * 24 * 60 * 60),
+            segment_cache_dir=kwargs.get('segment_cache_dir'),
+            segment_comments=kwargs.get('segment_comments', 20),
+            hls_segment_seconds=kwargs.get('hls_segment_seconds', 4),
+            streaming_threshold=kwargs.get('streaming_threshold', 300),
+            slide_mode=kwargs.get('slide_mode', 'fixed'),
+            comments_per_slide=kwargs.get('comments_per_slide', 0),
+            timeline_fps=timeline_fps,
+            slide_segment_cache_dir=kwargs.get('slide_segment_cache_dir'),
+            slide_segment_cache_max_bytes=kwargs.get('slide_segment_cache_max_bytes', 2 * 1024 * 1024 * 1024)
+        )
+    elif engine_type.lower() == 'ffmpeg':
+        required_keys = ['output_dir', 'temp_dir']
+        for key in required_keys:
+            if key not in kwargs:
+                raise ValueError(f"FFmpeg video generator engine requires '{key}' parameter")
+        
+        return FFmpegVideoGenerator(
+            output_dir=kwargs['output_dir'],
+            temp_dir=kwargs['temp_dir'],
+            font_path=kwargs.get('font_path'),
+            width=width,
+            height=height,
+            fps=fps,
+            duration_index=kwargs.get('duration_index'),
+            bgm_duck_gain=kwargs.get('bgm_duck_gain', 1.0),
+            frame_mode=kwargs.get('frame_mode', 'cfr'),
+            render_profile=render_profile,
+            image_cache_dir=kwargs.get('image_cache_dir'),
+            image_cache_max_bytes=kwargs.get('image_cache_max_bytes', 1024 * 1024 * 1024),
+            render_cache_dir=kwargs.get('render_cache_dir'),
+            render_cache_max_bytes=kwargs.get('render_cache_max_bytes', 10 * 1024 * 1024 * 1024),
+            render_cache_max_age=kwargs.get('render_cache_max_age', 7 * 24 * 60 * 60),
+            hls_segment_seconds=kwargs.get('hls_segment_seconds', 4),
+            slide_mode=kwargs.get('slide_mode', 'fixed'),
+            comments_per_slide=kwargs.get('comments_per_slide', 0),
+            timeline_fps=timeline_fps,
+            slide_segment_cache_dir=kwargs.get('slide_segment_cache_dir'),
+            slide_segment_cache_max_bytes=kwargs.get('slide_segment_cache_max_bytes', 2 * 1024 * 1024 * 1024)
+        )
+    elif engine_type.lower() == 'pyav':
+        required_keys = ['output_dir', 'temp_dir']
+        for key in required_keys:
+            if key not in kwargs:
+                raise ValueError(f"PyAV video generator engine requires '{key}' parameter")
+        
+        return PyAVVideoGenerator(
+            output_dir=kwargs['output_dir'],
+            temp_dir=kwargs['temp_dir'],
+            font_path=kwargs.get('font_path'),
+            width=width,
+            height=height,
+            fps=fps,
+            duration_index=kwargs.get('duration_index'),
+            bgm_duck_gain=kwargs.get('bgm_duck_gain', 1.0),
+            frame_mode=kwargs.get('frame_mode', 'cfr'),
+            render_profile=render_profile,
+            subtitle_cache_dir=kwargs.get('subtitle_cache_dir'),
+            subtitle_cache_max_bytes=kwargs.get('subtitle_cache_max_bytes', 512 * 1024 * 1024),
+            image_cache_dir=kwargs.get('image_cache_dir'),
+            image_cache_max_bytes=kwargs.get('image_cache_max_bytes', 1024 * 1024 * 1024),
+            render_cache_dir=kwargs.get('render_cache_dir'),
+            render_cache_max_bytes=kwargs.get('render_cache_max_bytes', 10 * 1024 * 1024 * 1024),
+            render_cache_max_age=kwargs.get('render_cache_max_age', 7 * 24 * 60 * 60),
+            hls_segment_seconds=kwargs.get('hls_segment_seconds', 4),
+            slide_mode=kwargs.get('slide_mode', 'fixed'),
+            comments_per_slide=kwargs.get('comments_per_slide', 0),
+            timeline_fps=timeline_fps,
+            slide_segment_cache_dir=kwargs.get('slide_segment_cache_dir'),
+            slide_segment_cache_max_bytes=kwargs.get('slide_segment_cache_max_bytes', 2 * 1024 * 1024 * 1024)
         )
     else:
         raise ValueError(f"Unsupported video generator engine type: {engine_type}")
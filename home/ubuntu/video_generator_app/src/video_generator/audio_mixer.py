@@ -0,0 +1,248 @@
+"""
+NumPyを使用した音声ミキシングモジュール
+"""
+import wave
+import logging
+import subprocess
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .ffmpeg_utils import run_command
+
+logger = logging.getLogger(__name__)
+
+# ダッキングでナレーション開始前にBGMを下げ始める時間と、終了後にBGMを戻す時間（秒）
+DUCK_ATTACK = 0.08
+DUCK_RELEASE = 0.4
+
+class AudioMixer:
+    """NumPyによる音声ミキシングクラス
+
+    各音声ファイルを1回だけPCMにデコードし、タイムラインをチャンク単位で処理して
+    float32のバッファにベクトル演算で加算する。BGMはサンプル単位でループさせ、
+    ナレーションの区間ではサイドチェイン風にBGMの音量を下げる（ダッキング）。
+    """
+    
+    def __init__(self, sample_rate: int = 44100, channels: int = 2,
+                 chunk_seconds: float = 10.0, ffmpeg_binary: str = 'ffmpeg',
+                 duck_gain: float = 1.0, duck_attack: float = DUCK_ATTACK, duck_release: float = DUCK_RELEASE):
+        """初期化
+
+        Args:
+            sample_rate: サンプリング周波数
+            channels: チャンネル数
+            chunk_seconds: 1回に処理するタイムラインの長さ（秒）
+            ffmpeg_binary: ffmpegの実行ファイル
+            duck_gain: ナレーション中のBGMの音量倍率（1.0の場合はダッキングなし）
+            duck_attack: ナレーション開始前にBGMを下げ始める時間（秒）
+            duck_release: ナレーション終了後にBGMを戻す時間（秒）
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk_samples = max(1, int(chunk_seconds * sample_rate))
+        self.ffmpeg_binary = ffmpeg_binary
+        self.duck_gain = duck_gain
+        self.duck_attack = max(1, int(duck_attack * sample_rate))
+        self.duck_release = max(1, int(duck_release * sample_rate))
+    
+    def decode(self, path: str) -> np.ndarray:
+        """音声ファイルをfloat32のPCMにデコードする
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            np.ndarray: (サンプル数, チャンネル数)の配列
+        """
+        cmd = [self.ffmpeg_binary, '-v', 'error', '-i', path,
+               '-f', 'f32le', '-acodec', 'pcm_f32le',
+               '-ac', str(self.channels), '-ar', str(self.sample_rate), '-']
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to decode {path}: {result.stderr.decode(errors='replace')[-2000:]}")
+        
+        return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, self.channels)
+    
+    def input_options(self) -> List[str]:
+        """pcm_chunksの出力をffmpegに入力するためのオプションを返す
+
+        Returns:
+            List[str]: '-i'の前に指定するffmpegのオプション
+        """
+        return ['-f', 's16le', '-ar', str(self.sample_rate), '-ac', str(self.channels)]
+    
+    def mix(self, narration: List[Tuple[str, float, float]], total_duration: float, output_path: str,
+            bgm_path: Optional[str] = None, bgm_volume: float = 0.3) -> str:
+        """ナレーションとBGMを合成してWAVファイルに書き出す
+
+        Args:
+            narration: (音声パス, 開始時刻, 長さ)のリスト
+            total_duration: 合成後の長さ（秒）
+            output_path: 出力するWAVファイルのパス
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+
+        Returns:
+            str: 出力したWAVファイルのパス
+        """
+        with wave.open(output_path, 'wb') as out:
+            out.setnchannels(self.channels)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            
+            for data in self.pcm_chunks(narration, total_duration, bgm_path, bgm_volume):
+                out.writeframes(data)
+        
+        logger.info(f"Audio mixed successfully: {output_path}")
+        return output_path
+    
+    def encode(self, narration: List[Tuple[str, float, float]], total_duration: float, output_path: str,
+               bgm_path: Optional[str] = None, bgm_volume: float = 0.3, codec: str = 'aac',
+               bitrate: Optional[str] = None) -> str:
+        """ナレーションとBGMを合成し、パイプでffmpegに渡してエンコードする
+
+        合成結果はWAVファイルに書き出さず、チャンクごとにffmpegの標準入力へ書き込む。
+
+        Args:
+            narration: (音声パス, 開始時刻, 長さ)のリスト
+            total_duration: 合成後の長さ（秒）
+            output_path: 出力する音声ファイルのパス（例: .m4a）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+            codec: 音声コーデック
+            bitrate: 音声のビットレート（'128k'など、Noneの場合はエンコーダの既定値）
+
+        Returns:
+            str: 出力した音声ファイルのパス
+        """
+        cmd = [self.ffmpeg_binary, '-y', '-v', 'error'] + self.input_options()
+        cmd += ['-i', 'pipe:0', '-c:a', codec]
+        if bitrate:
+            cmd += ['-b:a', bitrate]
+        cmd.append(output_path)
+        run_command(cmd, stdin_chunks=self.pcm_chunks(narration, total_duration, bgm_path, bgm_volume))
+        
+        logger.info(f"Audio mixed and encoded successfully: {output_path}")
+        return output_path
+    
+    def pcm_chunks(self, narration: List[Tuple[str, float, float]], total_duration: float,
+                   bgm_path: Optional[str] = None, bgm_volume: float = 0.3) -> Iterator[bytes]:
+        """ナレーションとBGMをチャンク単位で合成し、16bitリトルエンディアンのPCMとして返す
+
+        Args:
+            narration: (音声パス, 開始時刻, 長さ)のリスト
+            total_duration: 合成後の長さ（秒）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+
+        Yields:
+            bytes: 1チャンク分のPCMデータ
+        """
+        for chunk in self.sample_chunks(narration, total_duration, bgm_path, bgm_volume):
+            yield (chunk * 32767).astype('<i2').tobytes()
+    
+    def sample_chunks(self, narration: List[Tuple[str, float, float]], total_duration: float,
+                      bgm_path: Optional[str] = None, bgm_volume: float = 0.3) -> Iterator[np.ndarray]:
+        """ナレーションとBGMをチャンク単位で合成し、float32のサンプルとして返す
+
+        返す配列は次のチャンクの合成に再利用するため、次のチャンクを要求する前に使い終えること。
+
+        Args:
+            narration: (音声パス, 開始時刻, 長さ)のリスト
+            total_duration: 合成後の長さ（秒）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+
+        Yields:
+            np.ndarray: 1チャンク分の(サンプル数, チャンネル数)の配列（-1.0〜1.0）
+        """
+        total_samples = int(round(total_duration * self.sample_rate))
+        placements = sorted(
+            (int(round(start * self.sample_rate)), path)
+            for path, start, _ in narration
+        )
+        
+        # ダッキング用のナレーション区間（サンプル単位）
+        intervals = np.array(
+            [(int(round(start * self.sample_rate)), int(round((start + duration) * self.sample_rate)))
+             for _, start, duration in narration],
+            dtype=np.int64
+        ).reshape(-1, 2)
+        
+        bgm = None
+        if bgm_path:
+            bgm = self.decode(bgm_path) * np.float32(bgm_volume)
+            if len(bgm) == 0:
+                bgm = None
+        
+        buffer = np.zeros((self.chunk_samples, self.channels), dtype=np.float32)
+        active: Dict[int, Tuple[int, np.ndarray]] = {}
+        next_placement = 0
+        
+        for chunk_start in range(0, total_samples, self.chunk_samples):
+            chunk_end = min(chunk_start + self.chunk_samples, total_samples)
+            length = chunk_end - chunk_start
+            chunk = buffer[:length]
+            chunk.fill(0)
+            
+            # このチャンクで始まる音声をデコード
+            while next_placement < len(placements) and placements[next_placement][0] < chunk_end:
+                start, path = placements[next_placement]
+                active[next_placement] = (start, self.decode(path))
+                next_placement += 1
+            
+            # ナレーションを加算し、再生し終わった音声は解放する
+            for key in list(active):
+                start, pcm = active[key]
+                end = start + len(pcm)
+                lo, hi = max(start, chunk_start), min(end, chunk_end)
+                if lo < hi:
+                    chunk[lo - chunk_start:hi - chunk_start] += pcm[lo - start:hi - start]
+                if end <= chunk_end:
+                    del active[key]
+            
+            # BGMをサンプル単位でループさせて加算
+            if bgm is not None:
+                indices = np.arange(chunk_start, chunk_end) % len(bgm)
+                chunk += bgm[indices] * self._duck_envelope(intervals, chunk_start, chunk_end)[:, None]
+            
+            np.clip(chunk, -1.0, 1.0, out=chunk)
+            yield chunk
+    
+    def _duck_envelope(self, intervals: np.ndarray, chunk_start: int, chunk_end: int) -> np.ndarray:
+        """チャンク内のBGMの音量倍率を計算する
+
+        各サンプルについて最も近いナレーション区間までの距離をアタック/リリース時間で
+        正規化し、区間内ではduck_gain、十分離れた位置では1.0になるように補間する。
+
+        Args:
+            intervals: ナレーション区間の(開始, 終了)サンプルの配列
+            chunk_start: チャンクの開始サンプル
+            chunk_end: チャンクの終了サンプル
+
+        Returns:
+            np.ndarray: 長さ(chunk_end - chunk_start)の音量倍率
+        """
+        length = chunk_end - chunk_start
+        if self.duck_gain >= 1.0 or len(intervals) == 0:
+            return np.ones(length, dtype=np.float32)
+        
+        # チャンクに影響する区間だけを対象にする
+        nearby = intervals[
+            (intervals[:, 0] - self.duck_attack < chunk_end) &
+            (intervals[:, 1] + self.duck_release > chunk_start)
+        ]
+        if len(nearby) == 0:
+            return np.ones(length, dtype=np.float32)
+        
+        t = np.arange(chunk_start, chunk_end, dtype=np.int64)
+        distance = np.full(length, np.inf, dtype=np.float32)
+        
+        for start, end in nearby:
+            before = (start - t) / self.duck_attack
+            after = (t - end) / self.duck_release
+            np.minimum(distance, np.maximum(np.maximum(before, after), 0.0), out=distance)
+        
+        ramp = np.clip(distance, 0.0, 1.0).astype(np.float32)
+        return np.float32(self.duck_gain) + np.float32(1.0 - self.duck_gain) * ramp
@@ -0,0 +1,242 @@
+"""
+音声ファイルのヘッダから長さを取得するモジュール
+"""
+import os
+import struct
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# MPEGオーディオのビットレート表（kbps）[MPEG1かどうか][レイヤー]
+MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# MPEGオーディオのサンプリング周波数表（Hz）[バージョン]
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG1
+    2: [22050, 24000, 16000],  # MPEG2
+    0: [11025, 12000, 8000],   # MPEG2.5
+}
+
+def probe_duration(path: str) -> float:
+    """コンテナとフレームのヘッダだけを読んで音声ファイルの長さを取得する
+
+    デコーダは起動しない。WAVはRIFFヘッダ、MP3はXing/Info/VBRIヘッダを使い、
+    どちらもない場合はフレームヘッダを走査する。
+
+    Args:
+        path: 音声ファイルのパス
+
+    Returns:
+        float: 長さ（秒）
+
+    Raises:
+        ValueError: 対応していない形式の場合
+    """
+    with open(path, 'rb') as f:
+        head = f.read(12)
+        f.seek(0)
+        
+        if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+            return _probe_wav(f)
+        
+        return _probe_mp3(f, os.path.getsize(path))
+
+def _probe_wav(f) -> float:
+    """WAVファイルのfmtチャンクとdataチャンクから長さを求める"""
+    f.seek(12)
+    byte_rate = None
+    
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            byte_rate = struct.unpack('<I', fmt[8:12])[0]
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if not byte_rate:
+                break
+            return chunk_size / byte_rate
+        else:
+            # チャンクは2バイト境界に揃えられている
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    
+    raise ValueError("Invalid WAV file: missing fmt or data chunk")
+
+def _parse_mp3_header(header: bytes) -> Optional[Tuple[int, int, int, int]]:
+    """MPEGオーディオのフレームヘッダを解析する
+
+    Args:
+        header: フレーム先頭の4バイト
+
+    Returns:
+        Optional[Tuple[int, int, int, int]]: (フレーム長, 1フレームのサンプル数, サンプリング周波数, サイド情報の長さ)
+            （フレームヘッダでない場合はNone）
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    
+    version = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    mono = ((header[3] >> 6) & 0x03) == 3
+    
+    if version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    
+    layer = 4 - layer_bits
+    is_mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(is_mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2:
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 1152 if is_mpeg1 else 576
+        frame_length = (144 if is_mpeg1 else 72) * bitrate // sample_rate + padding
+    
+    if is_mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    
+    return frame_length, samples, sample_rate, side_info
+
+def _probe_mp3(f, file_size: int) -> float:
+    """MP3ファイルのヘッダから長さを求める"""
+    # ID3v2タグを読み飛ばす
+    offset = 0
+    header = f.read(10)
+    if header[:3] == b'ID3' and len(header) == 10:
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        offset = 10 + size + (10 if header[5] & 0x10 else 0)
+    
+    # 最初のフレームを探す
+    f.seek(offset)
+    buffer = f.read(64 * 1024)
+    first = None
+    for i in range(len(buffer) - 4):
+        parsed = _parse_mp3_header(buffer[i:i + 4])
+        if parsed is None:
+            continue
+        # 誤検出を避けるため、次のフレームヘッダも確認する
+        next_start = i + parsed[0]
+        if next_start + 4 <= len(buffer) and _parse_mp3_header(buffer[next_start:next_start + 4]) is None:
+            continue
+        first = (offset + i, parsed)
+        break
+    
+    if first is None:
+        raise ValueError("Unsupported audio format: no WAV header or MPEG audio frame found")
+    
+    frame_offset, (frame_length, samples, sample_rate, side_info) = first
+    
+    # Xing/Infoヘッダ（VBRまたはLAMEのCBR）
+    f.seek(frame_offset + 4 + side_info)
+    xing = f.read(12)
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        if flags & 0x01:
+            frames = struct.unpack('>I', xing[8:12])[0]
+            return frames * samples / sample_rate
+    
+    # VBRIヘッダ（Fraunhofer）
+    f.seek(frame_offset + 4 + 32)
+    vbri = f.read(18)
+    if vbri[:4] == b'VBRI':
+        frames = struct.unpack('>I', vbri[14:18])[0]
+        return frames * samples / sample_rate
+    
+    # フレームヘッダを走査してフレーム数を数える
+    frames = 0
+    position = frame_offset
+    while position + 4 <= file_size:
+        f.seek(position)
+        header = f.read(4)
+        parsed = _parse_mp3_header(header)
+        if parsed is None or parsed[0] <= 0:
+            break
+        frames += 1
+        position += parsed[0]
+    
+    return frames * samples / sample_rate
+
+class DurationIndex:
+    """音声ファイルの長さのインデックスクラス
+
+    TTSで音声ファイルを書き出すたびに登録しておき、動画生成時のタイムライン作成では
+    デコーダを起動せずにインデックスから長さを引く。ファイルサイズと更新時刻が
+    変わっていた場合はヘッダを読み直す。
+    """
+    
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None):
+        """初期化
+
+        Args:
+            entries: to_dictで書き出したインデックスの内容（Noneの場合は空）
+        """
+        self.entries = dict(entries or {})
+    
+    def add(self, path: str) -> float:
+        """音声ファイルの長さを取得してインデックスに登録する
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        stat = os.stat(path)
+        duration = probe_duration(path)
+        self.entries[os.path.abspath(path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "duration": duration,
+        }
+        return duration
+    
+    def get(self, path: str) -> float:
+        """音声ファイルの長さを取得する（インデックスにない場合は登録する）
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is not None:
+            stat = os.stat(path)
+            if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                return entry["duration"]
+        
+        return self.add(path)
+    
+    def to_dict(self) -> Dict[str, Dict]:
+        """インデックスの内容を辞書として返す
+
+        Returns:
+            Dict[str, Dict]: JSONに変換できるインデックスの内容
+        """
+        return dict(self.entries)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,1068 @@
+"""
+ffmpegのフィルタグラフを使用した動画生成モジュール
+"""
+import os
+import logging
+import time
+import uuid
+import shutil
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import VideoGeneratorEngine
+from .audio_probe import DurationIndex
+from .audio_mixer import DUCK_RELEASE
+from .timeline import Timeline, SLIDE_MODES
+from .image_normalizer import ImageNormalizer
+from .render_metrics import RenderMetrics
+from .render_cache import RenderCache
+from .slide_segments import SlideSegmentCache
+from .output_profiles import make_profile, group_by_aspect
+from .render_profiles import get_render_profile, video_encoder_args, audio_encoder_args
+from .subtitle_tracks import format_srt, write_sidecars, subtitle_track_args, mux_subtitle_track
+from .ffmpeg_utils import (
+    run_command, write_concat_list, keyframe_args, tee_output_args, package_hls, HLS_PLAYLIST_NAME
+)
+
+logger = logging.getLogger(__name__)
+
+# ASS字幕で使用する色名（RRGGBB）
+ASS_COLOR_NAMES = {
+    'white': 'FFFFFF',
+    'black': '000000',
+    'red': 'FF0000',
+    'green': '00FF00',
+    'blue': '0000FF',
+    'yellow': 'FFFF00',
+    'cyan': '00FFFF',
+    'magenta': 'FF00FF',
+}
+
+class FFmpegVideoGenerator(VideoGeneratorEngine):
+    """ffmpegのフィルタグラフを使用した動画生成クラス
+
+    スライドショーはconcatデマルチプレクサ（画像ごとの表示時間付き）、
+    音声はamix、字幕はassフィルタで1つのフィルタグラフにまとめ、
+    フレームをPythonに渡さずにffmpeg内でエンコードする。
+    """
+    
+    def __init__(self, output_dir: str, temp_dir: str, font_path: Optional[str] = None,
+                 width: int = 1920, height: int = 1080, fps: int = 24,
+                 ffmpeg_binary: str = 'ffmpeg', ffprobe_binary: str = 'ffprobe',
+                 duration_index: Optional[DurationIndex] = None,
+                 bgm_duck_gain: float = 1.0,
+                 frame_mode: str = 'cfr',
+                 render_profile: Optional[Dict] = None,
+                 image_cache_dir: Optional[str] = None,
+                 image_cache_max_bytes: int = 1024 * 1024 * 1024,
+                 render_cache_dir: Optional[str] = None,
+                 render_cache_max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 render_cache_max_age: Optional[float] = 7 * 24 * 60 * 60,
+                 hls_segment_seconds: int = 4,
+                 slide_mode: str = 'fixed',
+                 comments_per_slide: int = 0,
+                 timeline_fps: Optional[int] = None,
+                 slide_segment_cache_dir: Optional[str] = None,
+                 slide_segment_cache_max_bytes: int = 2 * 1024 * 1024 * 1024):
+        """初期化
+
+        Args:
+            output_dir: 動画ファイルの出力ディレクトリ
+            temp_dir: 一時ファイルの保存ディレクトリ
+            font_path: 字幕用フォントのパス（Noneの場合はデフォルト）
+            width: 出力動画の幅
+            height: 出力動画の高さ
+            fps: 出力動画のフレームレート
+            ffmpeg_binary: ffmpegの実行ファイル
+            ffprobe_binary: ffprobeの実行ファイル
+            duration_index: 音声ファイルの長さのインデックス（Noneの場合は新規作成）
+            bgm_duck_gain: ナレーション中のBGMの音量倍率（1.0の場合はダッキングなし）
+            frame_mode: 'cfr'は固定フレームレート、'vfr'はスライドと字幕が変わる時だけフレームを出力する
+            render_profile: エンコード設定（get_render_profileの戻り値、Noneの場合は'standard'）
+            image_cache_dir: 正規化済み画像のキャッシュのディレクトリ（Noneの場合は一時ディレクトリ内）
+            image_cache_max_bytes: 正規化済み画像のキャッシュの合計サイズの上限（バイト）
+            render_cache_dir: 完成した動画のキャッシュのディレクトリ（Noneの場合はキャッシュしない）
+            render_cache_max_bytes: 完成した動画のキャッシュの合計サイズの上限（バイト）
+            render_cache_max_age: 完成した動画のキャッシュの保持期間（秒、最終利用から）
+            hls_segment_seconds: HLSを出力する場合のセグメントの長さの目安（秒）
+            slide_mode: スライドの表示区間の決め方（'fixed'は1枚あたりslide_durationずつ、
+                'even'はナレーション全体を均等に分け、'comments'はコメントの境界で切り替える）
+            comments_per_slide: slide_modeが'comments'の場合の1枚あたりのコメント数
+                （0の場合はすべてのコメントに画像が行き渡るように決定する）
+            timeline_fps: タイムラインを計画するフレームレート（Noneの場合はfps、プレビューで
+                本番と同じタイムラインを使う場合は本番のフレームレートを指定する）
+            slide_segment_cache_dir: スライド画像ごとのエンコード済み区間のキャッシュのディレクトリ
+                （Noneの場合は一時ディレクトリ内）
+            slide_segment_cache_max_bytes: スライド画像ごとの区間のキャッシュの合計サイズの上限（バイト）
+        """
+        if frame_mode not in ('cfr', 'vfr'):
+            raise ValueError(f"Unsupported frame mode: {frame_mode}")
+        if slide_mode not in SLIDE_MODES:
+            raise ValueError(f"Unsupported slide mode: {slide_mode}")
+        
+        self.output_dir = output_dir
+        self.temp_dir = temp_dir
+        self.font_path = font_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.ffmpeg_binary = ffmpeg_binary
+        self.ffprobe_binary = ffprobe_binary
+        self.duration_index = duration_index if duration_index is not None else DurationIndex()
+        self.bgm_duck_gain = bgm_duck_gain
+        self.frame_mode = frame_mode
+        self.render_profile = render_profile or get_render_profile()
+        self.hls_segment_seconds = hls_segment_seconds
+        self.slide_mode = slide_mode
+        self.comments_per_slide = comments_per_slide
+        self.timeline_fps = timeline_fps or fps
+        
+        # 直近のgenerate_videoの段階ごとの計測結果
+        self.metrics = RenderMetrics()
+        
+        # 出力ディレクトリが存在しない場合は作成
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(temp_dir, exist_ok=True)
+        
+        # スライド画像は向きを補正して出力サイズに正規化し、キャッシュする
+        self.image_normalizer = ImageNormalizer(
+            image_cache_dir or os.path.join(temp_dir, "image_cache"),
+            width=width,
+            height=height,
+            max_bytes=image_cache_max_bytes
+        )
+        
+        # 字幕を焼き込まない映像は、画像ごとにエンコードした区間をキャッシュしてストリームコピーで組み立てる
+        self.slide_segments = SlideSegmentCache(
+            slide_segment_cache_dir or os.path.join(temp_dir, "slide_segments"),
+            ffmpeg_binary=ffmpeg_binary,
+            max_bytes=slide_segment_cache_max_bytes
+        )
+        
+        # 同じ入力の動画はレンダリングせずにキャッシュから返す
+        self.render_cache = None
+        if render_cache_dir:
+            self.render_cache = RenderCache(
+                render_cache_dir,
+                max_bytes=render_cache_max_bytes,
+                max_age_seconds=render_cache_max_age
+            )
+    
+    def create_slideshow(self, image_paths: List[str], slide_duration: float = 5.0,
+                        output_filename: Optional[str] = None,
+                        timeline: Optional[Timeline] = None) -> str:
+        """画像からスライドショー動画を作成する
+
+        timelineを指定した場合は、スライドの表示区間をナレーションからslide_modeに従って決定し、
+        ナレーションと同じ長さで作成する。固定フレームレートの場合は、画像ごとにエンコードした区間を
+        キャッシュから取得し、ストリームコピーで連結する（キャッシュにある画像は再エンコードしない）。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            timeline: ナレーションのタイムライン（Noneの場合は1枚あたりslide_durationずつ表示する）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.temp_dir, output_filename, "slideshow")
+        work_dir = tempfile.mkdtemp(prefix="ffmpeg_", dir=self.temp_dir)
+        
+        try:
+            timeline = self._plan_timeline([] if timeline is None else timeline,
+                                           image_paths=image_paths, slide_duration=slide_duration)
+            slides = timeline.slides(self.image_normalizer.normalize(image_paths))
+            
+            if self.frame_mode == 'cfr':
+                segment_paths = self.slide_segments.segments(
+                    [(path, length) for (path, _, _), length in zip(slides, timeline.slide_frames(self.fps))],
+                    self.width, self.height, self.fps, self._video_encoder_args(faststart=False)
+                )
+                self.slide_segments.assemble(segment_paths, output_path, work_dir)
+                logger.info(f"Slideshow created successfully: {output_path}")
+                return output_path
+            
+            image_paths = [path for path, _, _ in slides]
+            durations = [duration for _, _, duration in slides]
+            slides_list = self._write_image_concat_list(image_paths, durations, work_dir)
+            
+            cmd = [self.ffmpeg_binary, '-y', '-f', 'concat', '-safe', '0', '-i', slides_list,
+                   '-vf', self._canvas_filter()]
+            cmd += self._video_encoder_args()
+            cmd += ['-t', self._format_seconds(sum(durations)), output_path]
+            self._run(cmd)
+            
+            logger.info(f"Slideshow created successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error creating slideshow: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def add_audio_to_video(self, video_path: str, audio_paths: Union[List[str], Timeline],
+                          bgm_path: Optional[str] = None, bgm_volume: float = 0.3,
+                          output_filename: Optional[str] = None) -> str:
+        """動画に音声とBGMを追加する
+
+        動画が音声より長い場合は映像をストリームコピーし、短い場合のみ
+        最後のフレームを延長するために再エンコードする。
+
+        Args:
+            video_path: 元動画のパス
+            audio_paths: 音声ファイルのパスリスト、またはタイムライン
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.temp_dir, output_filename, "video_with_audio")
+        work_dir = tempfile.mkdtemp(prefix="ffmpeg_", dir=self.temp_dir)
+        
+        try:
+            if not isinstance(audio_paths, Timeline):
+                audio_paths = [{"path": path} for path in audio_paths]
+            timeline = self._plan_timeline(audio_paths)
+            total_duration = timeline.duration
+            video_duration = self._probe_duration(video_path)
+            
+            narration_list = self._write_audio_concat_list(
+                [path for path, _, _ in timeline.narration()],
+                [duration for _, _, duration in timeline.narration()],
+                work_dir
+            )
+            
+            cmd = [self.ffmpeg_binary, '-y', '-i', video_path,
+                   '-f', 'concat', '-safe', '0', '-i', narration_list]
+            if bgm_path:
+                cmd += ['-stream_loop', '-1', '-i', bgm_path]
+            
+            filters = [self._audio_mix_filter(1, 2 if bgm_path else None, bgm_volume, total_duration)]
+            
+            if video_duration < total_duration:
+                # 最後のフレームを静止画として延長
+                pad = total_duration - video_duration
+                filters.append(f"[0:v]tpad=stop_mode=clone:stop_duration={self._format_seconds(pad)}[v]")
+                cmd += ['-filter_complex', ';'.join(filters), '-map', '[v]', '-map', '[a]']
+                cmd += video_encoder_args(self.render_profile, self.fps)
+            else:
+                cmd += ['-filter_complex', ';'.join(filters), '-map', '0:v', '-map', '[a]',
+                        '-c:v', 'copy']
+            
+            cmd += audio_encoder_args(self.render_profile)
+            cmd += ['-t', self._format_seconds(total_duration), output_path]
+            self._run(cmd)
+            
+            logger.info(f"Audio added to video successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error adding audio to video: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def add_subtitles(self, video_path: str, subtitles: Union[List[Dict], Timeline],
+                     font_size: int = 36, font_color: str = 'white',
+                     output_filename: Optional[str] = None,
+                     soft: bool = False) -> str:
+        """動画に字幕を追加する
+
+        softがTrueの場合は焼き込まずに、SRTとWebVTTのサイドカーファイルを出力し、
+        映像と音声をストリームコピーしたままmov_textの字幕トラックとして多重化する。
+
+        Args:
+            video_path: 元動画のパス
+            subtitles: 字幕情報のリスト、またはタイムライン
+                [
+                    {"text": "字幕1", "start": 0, "duration": 5},
+                    {"text": "字幕2", "start": 5, "duration": 3},
+                    ...
+                ]
+            font_size: フォントサイズ
+            font_color: フォント色
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            soft: Trueの場合は焼き込まずに字幕トラックとサイドカーファイルにする
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.output_dir, output_filename, "video_with_subtitles")
+        if isinstance(subtitles, Timeline):
+            subtitles = subtitles.subtitles()
+        
+        if soft:
+            sidecars = write_sidecars(subtitles, output_path)
+            return mux_subtitle_track(video_path, sidecars["srt"], output_path, self.ffmpeg_binary)
+        
+        work_dir = tempfile.mkdtemp(prefix="ffmpeg_", dir=self.temp_dir)
+        
+        try:
+            subtitle_path = self._write_ass(subtitles, self._scaled_font_size(font_size), font_color, work_dir)
+            
+            # 入力が可変フレームレートの場合でも字幕の切り替えにフレームが必要なため、固定フレームレートにする
+            cmd = [self.ffmpeg_binary, '-y', '-i', video_path,
+                   '-vf', f"fps={self.fps},{self._subtitle_filter(subtitle_path)}"]
+            cmd += video_encoder_args(self.render_profile, self.fps)
+            cmd += ['-c:a', 'copy', output_path]
+            self._run(cmd)
+            
+            logger.info(f"Subtitles added to video successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error adding subtitles to video: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def generate_video(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                      intro_audio_path: Optional[str] = None,
+                      bgm_path: Optional[str] = None,
+                      slide_duration: float = 5.0,
+                      output_filename: Optional[str] = None,
+                      hls_dir: Optional[str] = None,
+                      soft_subtitles: bool = False) -> str:
+        """画像と音声から1つのフィルタグラフで動画を生成する
+
+        hls_dirを指定した場合は、teeマルチプレクサでエンコードしながらfMP4セグメントのHLSも出力する。
+        キャッシュから返す場合は、完成した動画をストリームコピーで分割する。
+
+        soft_subtitlesがTrueの場合は字幕を焼き込まずに、mov_textの字幕トラックとして同じffmpegの実行で
+        多重化し、SRTとWebVTTのサイドカーファイルを動画の隣に出力する。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン（イントロを含めて計画済みのもの）
+                [
+                    {"path": "音声ファイルパス1", "text": "テキスト1"},
+                    {"path": "音声ファイルパス2", "text": "テキスト2"},
+                    ...
+                ]
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし、audio_pathsがタイムラインの場合は使用しない）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ（Noneの場合は出力しない、既存の内容は削除される）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに字幕トラックとサイドカーファイルにする
+
+        Returns:
+            str: 生成された動画ファイルのパス
+            （段階ごとの計測結果はself.metricsに記録される）
+        """
+        output_path = self._output_path(self.output_dir, output_filename, "video")
+        profile = make_profile("default", self.width, self.height)
+        
+        # 前回のHLSのセグメントが残っていると新しいプレイリストと混ざるため削除しておく
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+        
+        self._generate_targets(image_paths, audio_paths, intro_audio_path, bgm_path,
+                               slide_duration, [(profile, output_path)], hls_dir, soft_subtitles)
+        
+        # サイドカーファイルはキャッシュから返した場合も含めて毎回作成する
+        if soft_subtitles:
+            write_sidecars(self._plan_timeline(audio_paths, intro_audio_path).subtitles(), output_path)
+        
+        # キャッシュから返した場合は、完成した動画を分割する
+        if hls_dir and not os.path.exists(os.path.join(hls_dir, HLS_PLAYLIST_NAME)):
+            with self.metrics.stage("package_hls"):
+                package_hls(output_path, hls_dir, self.hls_segment_seconds, self.ffmpeg_binary)
+        
+        return output_path
+    
+    def generate_video_profiles(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                                profiles: List[Dict],
+                                intro_audio_path: Optional[str] = None,
+                                bgm_path: Optional[str] = None,
+                                slide_duration: float = 5.0,
+                                output_prefix: Optional[str] = None) -> Dict[str, str]:
+        """画像と音声から複数の出力プロファイル（アスペクト比・解像度・ビットレート）の動画を生成する
+
+        ナレーションの計画・音声の合成・字幕の作成は1回だけ行い、すべてのプロファイルを
+        1回のffmpegの実行でエンコードする。同じアスペクト比のプロファイルは最も大きい
+        解像度の画像を1回だけデコードし、splitフィルタで分岐して縮小する。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            profiles: 出力プロファイルのリスト（make_profileの戻り値）
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_prefix: 出力ファイル名の接頭辞（Noneの場合は自動生成、"{接頭辞}_{プロファイル名}.mp4"に出力）
+
+        Returns:
+            Dict[str, str]: プロファイル名と生成された動画ファイルのパスの辞書
+            （段階ごとの計測結果はself.metricsに記録される）
+        """
+        if not profiles:
+            raise ValueError("At least one output profile is required")
+        
+        if output_prefix is None:
+            output_prefix = f"video_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        targets = [
+            (profile, self._output_path(self.output_dir, f"{output_prefix}_{profile['name']}.mp4", "video"))
+            for profile in profiles
+        ]
+        
+        self._generate_targets(image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration, targets)
+        return {profile["name"]: output_path for profile, output_path in targets}
+    
+    def _generate_targets(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                          intro_audio_path: Optional[str], bgm_path: Optional[str],
+                          slide_duration: float, targets: List[Tuple[Dict, str]],
+                          hls_dir: Optional[str] = None, soft_subtitles: bool = False) -> None:
+        """キャッシュにない出力プロファイルの動画を1回のffmpegの実行で生成する
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            targets: (出力プロファイル, 出力ファイルのパス)のリスト
+            hls_dir: エンコードしながらHLSを出力するディレクトリ（出力プロファイルが1つの場合のみ）
+            soft_subtitles: Trueの場合は字幕を焼き込まずにmov_textの字幕トラックとして多重化する
+        """
+        self.metrics = RenderMetrics()
+        
+        # 同じ入力の動画がキャッシュにあればそのまま使う
+        pending = []
+        cache_keys = {}
+        if self.render_cache is not None:
+            with self.metrics.stage("cache_lookup") as stage:
+                for profile, output_path in targets:
+                    cache_key = self.render_cache.make_key(RenderCache.describe(
+                        image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration,
+                        engine='ffmpeg', font_path=self.font_path, font_size=36, font_color='white',
+                        width=profile["width"], height=profile["height"], fps=self.fps,
+                        frame_mode=self.frame_mode, encoder=self._video_encoder_args(profile["bitrate"]),
+                        bgm_duck_gain=self.bgm_duck_gain, soft_subtitles=soft_subtitles, slide_mode=self.slide_mode,
+                        comments_per_slide=self.comments_per_slide
+                    ))
+                    if self.render_cache.fetch(cache_key, output_path) is not None:
+                        continue
+                    
+                    # 以前の出力がキャッシュとinodeを共有している場合があるため、上書きせずに削除しておく
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    cache_keys[output_path] = cache_key
+                    pending.append((profile, output_path))
+                stage["cache_hit"] = not pending
+        else:
+            pending = list(targets)
+        
+        if not pending:
+            return
+        
+        work_dir = tempfile.mkdtemp(prefix="ffmpeg_", dir=self.temp_dir)
+        
+        try:
+            # スライドの表示区間はナレーションの長さに合わせてタイムラインで決定する
+            with self.metrics.stage("plan"):
+                timeline = self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
+                narration = [(path, duration) for path, _, duration in timeline.narration()]
+                subtitles = timeline.subtitles()
+                total_duration = timeline.duration or sum(duration for _, _, duration in timeline.slides())
+            
+            if self.frame_mode == 'cfr' and not (hls_dir and len(pending) == 1) and (soft_subtitles or not subtitles):
+                # 焼き込む字幕がない場合は、映像をスライドごとのエンコード済み区間からストリームコピーで組み立てる
+                self._assemble_targets(timeline, image_paths, pending, narration,
+                                       subtitles if soft_subtitles else [], bgm_path, total_duration, work_dir)
+            else:
+                cmd = [self.ffmpeg_binary, '-y']
+                filters = []
+                outputs = {}
+                frame_count = 0
+                
+                # アスペクト比ごとに、最も大きい解像度に正規化した画像を1つの入力として読み込む
+                groups = group_by_aspect([profile for profile, _ in pending])
+                for input_index, group in enumerate(groups):
+                    largest = group[0]
+                    with self.metrics.stage("normalize_images"):
+                        normalizer = self.image_normalizer.for_size(largest["width"], largest["height"])
+                        slides = timeline.slides(normalizer.normalize(image_paths))
+                    group_images = [path for path, _, _ in slides]
+                    group_durations = [duration for _, _, duration in slides]
+                    
+                    # 可変フレームレートの場合は字幕の切り替え時刻でもスライドを区切り、その時刻にフレームを出力する
+                    if self.frame_mode == 'vfr' and subtitles:
+                        group_images, group_durations = self._split_at_subtitles(group_images, group_durations, subtitles)
+                    
+                    slides_list = self._write_image_concat_list(
+                        group_images, group_durations, work_dir, f"slides_{input_index}.ffconcat"
+                    )
+                    cmd += ['-f', 'concat', '-safe', '0', '-i', slides_list]
+                    frame_count += len(group_images) * len(group)
+                    
+                    source = f"[{input_index}:v]{self._canvas_filter(largest['width'], largest['height'])}"
+                    if len(group) == 1:
+                        branches = [None]
+                    else:
+                        labels = [f"[g{input_index}s{i}]" for i in range(len(group))]
+                        filters.append(f"{source},split={len(group)}{''.join(labels)}")
+                        branches = labels
+                    
+                    # 分岐ごとに縮小し、出力サイズで作成した字幕を焼き込む
+                    for branch, profile in zip(branches, group):
+                        steps = []
+                        if (profile["width"], profile["height"]) != (largest["width"], largest["height"]):
+                            steps.append(f"scale={profile['width']}:{profile['height']},setsar=1")
+                        if subtitles and not soft_subtitles:
+                            subtitle_path = self._write_ass(
+                                subtitles, self._scaled_font_size(36, profile["width"], profile["height"]),
+                                'white', work_dir, profile["width"], profile["height"]
+                            )
+                            steps.append(self._subtitle_filter(subtitle_path))
+                        if branch is None:
+                            video_filter = ','.join([source] + steps)
+                        else:
+                            video_filter = branch + (','.join(steps) or 'null')
+                        label = f"[v_{profile['name']}]"
+                        filters.append(video_filter + label)
+                        outputs[profile["name"]] = label
+                
+                # 音声は1回だけ合成し、出力ごとに分岐する
+                audio_labels = {}
+                if narration:
+                    narration_input = len(groups)
+                    narration_list = self._write_audio_concat_list(
+                        [path for path, _ in narration],
+                        [duration for _, duration in narration],
+                        work_dir
+                    )
+                    cmd += ['-f', 'concat', '-safe', '0', '-i', narration_list]
+                    if bgm_path:
+                        cmd += ['-stream_loop', '-1', '-i', bgm_path]
+                    filters.append(self._audio_mix_filter(
+                        narration_input, narration_input + 1 if bgm_path else None,
+                        narration_duration=sum(duration for _, duration in narration)
+                    ))
+                    if len(pending) == 1:
+                        audio_labels[pending[0][0]["name"]] = "[a]"
+                    else:
+                        labels = [f"[a_{profile['name']}]" for profile, _ in pending]
+                        filters.append(f"[a]asplit={len(pending)}{''.join(labels)}")
+                        audio_labels = {profile["name"]: label for (profile, _), label in zip(pending, labels)}
+                
+                stream_hls = bool(hls_dir) and len(pending) == 1
+                
+                # ソフト字幕はSRTを入力に加えて、出力ごとにmov_textとして多重化する
+                # （HLSと同時に出力する場合はHLSに含められないため、エンコード後に多重化する）
+                srt_path = None
+                srt_input = None
+                if soft_subtitles and subtitles:
+                    srt_path = os.path.join(work_dir, "subtitles.srt")
+                    with open(srt_path, "w", encoding="utf-8") as f:
+                        f.write(format_srt(subtitles))
+                    if not stream_hls:
+                        srt_input = len(groups) + (1 if narration else 0) + (1 if narration and bgm_path else 0)
+                        cmd += ['-i', srt_path]
+                
+                cmd += ['-filter_complex', ';'.join(filters)]
+                for profile, output_path in pending:
+                    cmd += ['-map', outputs[profile["name"]]]
+                    if profile["name"] in audio_labels:
+                        cmd += ['-map', audio_labels[profile["name"]]] + audio_encoder_args(self.render_profile)
+                    if srt_input is not None:
+                        cmd += subtitle_track_args(srt_input)
+                    cmd += self._video_encoder_args(profile["bitrate"], faststart=not stream_hls)
+                    cmd += ['-t', self._format_seconds(total_duration)]
+                    if stream_hls:
+                        # teeで同じエンコード結果をfaststartのMP4とHLSの両方に書き込む
+                        cmd += keyframe_args(self.hls_segment_seconds)
+                        cmd += tee_output_args(output_path, hls_dir, self.hls_segment_seconds)
+                    else:
+                        cmd.append(output_path)
+                
+                # スライド・音声・字幕を1回のffmpegの実行で全プロファイル分エンコード
+                with self.metrics.stage("encode") as stage:
+                    self._run(cmd)
+                    if self.frame_mode == 'vfr':
+                        stage["frames"] = frame_count
+                    else:
+                        stage["frames"] = int(round(total_duration * self.fps)) * len(pending)
+                    stage["output_bytes"] = sum(RenderMetrics.file_size(path) for _, path in pending)
+                
+                if srt_path and srt_input is None:
+                    with self.metrics.stage("subtitle_track"):
+                        for _, output_path in pending:
+                            mux_subtitle_track(output_path, srt_path, ffmpeg_binary=self.ffmpeg_binary)
+            
+            for profile, output_path in pending:
+                if output_path in cache_keys:
+                    try:
+                        self.render_cache.store(cache_keys[output_path], output_path)
+                    except OSError as e:
+                        logger.warning(f"Failed to store render in cache: {e}")
+                logger.info(f"Video generated successfully ({profile['name']}): {output_path}")
+                
+        except Exception as e:
+            logger.error(f"Error generating video: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _assemble_targets(self, timeline: Timeline, image_paths: List[str], pending: List[Tuple[Dict, str]],
+                          narration: List[Tuple[str, float]], subtitles: List[Dict],
+                          bgm_path: Optional[str], total_duration: float, work_dir: str) -> None:
+        """スライドごとのエンコード済み区間をストリームコピーで連結し、音声と字幕トラックを多重化する
+
+        字幕を焼き込まない場合の映像は画像と表示時間だけで決まるため、同じ画像の区間は
+        セッションをまたいでキャッシュから再利用する。映像は再エンコードせず、音声だけをエンコードする。
+
+        Args:
+            timeline: スライドを決定済みのタイムライン
+            image_paths: 画像ファイルのパスリスト
+            pending: (出力プロファイル, 出力ファイルのパス)のリスト
+            narration: (音声パス, 長さ)のリスト
+            subtitles: 字幕トラックとして多重化する字幕情報のリスト（空の場合は字幕トラックなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            total_duration: 動画全体の長さ（秒）
+            work_dir: ジョブごとの作業ディレクトリ
+        """
+        srt_path = None
+        if subtitles:
+            srt_path = os.path.join(work_dir, "subtitles.srt")
+            with open(srt_path, "w", encoding="utf-8") as f:
+                f.write(format_srt(subtitles))
+        
+        narration_list = None
+        if narration:
+            narration_list = self._write_audio_concat_list(
+                [path for path, _ in narration],
+                [duration for _, duration in narration],
+                work_dir
+            )
+        
+        for profile, output_path in pending:
+            with self.metrics.stage(f"slide_segments_{profile['name']}") as stage:
+                normalizer = self.image_normalizer.for_size(profile["width"], profile["height"])
+                slides = timeline.slides(normalizer.normalize(image_paths))
+                segment_paths = self.slide_segments.segments(
+                    [(path, length) for (path, _, _), length in zip(slides, timeline.slide_frames(self.fps))],
+                    profile["width"], profile["height"], self.fps,
+                    self._video_encoder_args(profile["bitrate"], faststart=False)
+                )
+                stage["segments"] = len(segment_paths)
+            
+            # 映像はストリームコピーし、音声の合成とエンコードだけを行う
+            cmd = [self.ffmpeg_binary, '-y', '-f', 'concat', '-safe', '0',
+                   '-i', self.slide_segments.concat_list(segment_paths, work_dir)]
+            next_input = 1
+            audio_args = []
+            if narration_list:
+                cmd += ['-f', 'concat', '-safe', '0', '-i', narration_list]
+                if bgm_path:
+                    cmd += ['-stream_loop', '-1', '-i', bgm_path]
+                audio_filter = self._audio_mix_filter(1, 2 if bgm_path else None,
+                                                      narration_duration=sum(duration for _, duration in narration))
+                audio_args = ['-filter_complex', audio_filter, '-map', '[a]'] + audio_encoder_args(self.render_profile)
+                next_input += 2 if bgm_path else 1
+            if srt_path:
+                cmd += ['-i', srt_path]
+            cmd += ['-map', '0:v', '-c:v', 'copy'] + audio_args
+            if srt_path:
+                cmd += subtitle_track_args(next_input)
+            cmd += ['-movflags', '+faststart', '-t', self._format_seconds(total_duration), output_path]
+            
+            with self.metrics.stage(f"mux_{profile['name']}") as stage:
+                self._run(cmd)
+                stage["output_bytes"] = RenderMetrics.file_size(output_path)
+    
+    def _plan_timeline(self, audio_paths: Union[List[Dict], Timeline],
+                       intro_audio_path: Optional[str] = None,
+                       image_paths: Optional[List[str]] = None,
+                       slide_duration: float = 5.0) -> Timeline:
+        """ナレーション音声の長さを取得し、字幕とスライドのタイムラインを作成する
+
+        audio_pathsがタイムラインの場合はそのまま使い、スライドが未決定の場合のみ
+        複製したタイムラインで決定する（渡されたタイムラインは変更しない）。
+
+        Args:
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            image_paths: スライドの画像ファイルのパスリスト（Noneの場合はスライドを決定しない）
+            slide_duration: 1枚あたりの表示時間（秒）
+
+        Returns:
+            Timeline: タイムライン
+        """
+        if isinstance(audio_paths, Timeline):
+            timeline = audio_paths
+        else:
+            timeline = Timeline(fps=self.timeline_fps)
+            
+            # イントロ音声がある場合は先頭に追加（字幕は最初のコメント）
+            if intro_audio_path:
+                intro_text = audio_paths[0].get("text") if audio_paths else None
+                timeline.add_narration(intro_audio_path, self._audio_duration(intro_audio_path), intro_text)
+            
+            # 各音声ファイルを追加
+            for audio_info in audio_paths:
+                timeline.add_narration(audio_info["path"], self._audio_duration(audio_info["path"]),
+                                       audio_info.get("text"))
+        
+        if image_paths is not None and not timeline.slide_paths:
+            if timeline is audio_paths:
+                timeline = timeline.copy()
+            timeline.schedule_slides(image_paths, slide_duration, self.slide_mode, self.comments_per_slide)
+        
+        return timeline
+    
+    def _split_at_subtitles(self, image_paths: List[str], durations: List[float],
+                            subtitles: List[Dict]) -> Tuple[List[str], List[float]]:
+        """スライドの表示区間を字幕の開始・終了時刻で分割する
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            durations: 各画像の表示時間（秒）
+            subtitles: 字幕情報のリスト
+
+        Returns:
+            Tuple[List[str], List[float]]: 分割後の画像パスリストと表示時間
+        """
+        cuts = sorted({subtitle["start"] for subtitle in subtitles} |
+                      {subtitle["start"] + subtitle["duration"] for subtitle in subtitles})
+        
+        split_paths = []
+        split_durations = []
+        start = 0
+        for path, duration in zip(image_paths, durations):
+            end = start + duration
+            edges = [start] + [t for t in cuts if start < t < end] + [end]
+            for a, b in zip(edges, edges[1:]):
+                split_paths.append(path)
+                split_durations.append(b - a)
+            start = end
+        
+        return split_paths, split_durations
+    
+    def _canvas_filter(self, width: Optional[int] = None, height: Optional[int] = None) -> str:
+        """画像を出力サイズに収めて余白を付けるフィルタを返す
+
+        Args:
+            width: 出力の幅（Noneの場合はself.width）
+            height: 出力の高さ（Noneの場合はself.height）
+
+        Returns:
+            str: フィルタ文字列
+        """
+        width = width or self.width
+        height = height or self.height
+        canvas_filter = (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        )
+        if self.frame_mode == 'cfr':
+            canvas_filter += f"fps={self.fps},"
+        return canvas_filter + "format=yuv420p"
+    
+    def _video_encoder_args(self, bitrate: Optional[str] = None, faststart: bool = True) -> List[str]:
+        """映像エンコードの引数を返す
+
+        設定はレンダリングプロファイルから作成する。可変フレームレートの場合は静止画向けのチューニングを行い、
+        タイムスタンプをミリ秒単位で保持する。どちらの場合もブラウザで再生できるようyuv420pとfaststartを使う。
+
+        Args:
+            bitrate: 映像のビットレート（Noneの場合はプロファイルのCRF）
+            faststart: MP4のmoovを先頭に置くかどうか（teeで出力する場合は出力ごとに指定するためFalse）
+
+        Returns:
+            List[str]: ffmpegの引数
+        """
+        if self.frame_mode == 'vfr':
+            # フレームがまばらなため、GOPの長さはフレーム数で指定する
+            args = video_encoder_args(self.render_profile, self.fps, bitrate, keyframe_interval=12, tune='stillimage')
+            args += ['-vsync', 'vfr', '-enc_time_base', '1:1000', '-video_track_timescale', '1000']
+        else:
+            args = video_encoder_args(self.render_profile, self.fps, bitrate)
+        if faststart:
+            args += ['-movflags', '+faststart']
+        return args
+    
+    def _scaled_font_size(self, font_size: int, width: Optional[int] = None,
+                          height: Optional[int] = None) -> int:
+        """字幕のフォントサイズを出力サイズに合わせて拡大・縮小する
+
+        フォントサイズは短辺1080pxの動画を基準とした値として扱う。
+
+        Args:
+            font_size: 短辺1080pxの動画でのフォントサイズ
+            width: 出力の幅（Noneの場合はself.width）
+            height: 出力の高さ（Noneの場合はself.height）
+
+        Returns:
+            int: 出力サイズでのフォントサイズ
+        """
+        return max(1, round(font_size * min(width or self.width, height or self.height) / 1080))
+    
+    def _audio_mix_filter(self, narration_input: int, bgm_input: Optional[int] = None,
+                          bgm_volume: float = 0.3, narration_duration: Optional[float] = None) -> str:
+        """ナレーションとBGMを合成するフィルタを返す
+
+        bgm_duck_gainが1.0未満の場合は、AudioMixerと同じくナレーション中のBGMの音量を下げる。
+        ナレーションはconcatで隙間なく連結するため、ナレーションの区間は先頭からnarration_durationまでの
+        1つになり、BGMの音量はその間bgm_duck_gain倍、終了後はリリース時間をかけて元に戻る。
+
+        Args:
+            narration_input: ナレーションの入力番号
+            bgm_input: BGMの入力番号（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+            narration_duration: 連結したナレーションの長さ（秒、Noneの場合はダッキングなし）
+
+        Returns:
+            str: 出力ラベル[a]を持つフィルタ文字列
+        """
+        audio_format = "aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo"
+        if bgm_input is None:
+            return f"[{narration_input}:a]{audio_format}[a]"
+        
+        bgm_filter = f"{audio_format},volume={bgm_volume}"
+        if self.bgm_duck_gain < 1.0 and narration_duration:
+            gain = self.bgm_duck_gain
+            release = f"clip((t-{self._format_seconds(narration_duration)})/{DUCK_RELEASE},0,1)"
+            bgm_filter += f",volume='{gain}+{1.0 - gain}*{release}':eval=frame"
+        
+        return (
+            f"[{narration_input}:a]{audio_format}[narration];"
+            f"[{bgm_input}:a]{bgm_filter}[bgm];"
+            f"[narration][bgm]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[a]"
+        )
+    
+    def _subtitle_filter(self, subtitle_path: str) -> str:
+        """ASS字幕を焼き込むフィルタを返す
+
+        Args:
+            subtitle_path: ASS字幕ファイルのパス
+
+        Returns:
+            str: フィルタ文字列
+        """
+        subtitle_filter = f"ass=filename={self._escape_filter_value(subtitle_path)}"
+        if self.font_path:
+            fonts_dir = os.path.dirname(os.path.abspath(self.font_path))
+            subtitle_filter += f":fontsdir={self._escape_filter_value(fonts_dir)}"
+        return subtitle_filter
+    
+    def _write_image_concat_list(self, image_paths: List[str], durations: List[float], work_dir: str,
+                                 filename: str = "slides.ffconcat") -> str:
+        """画像用のconcatデマルチプレクサのリストファイルを作成する
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            durations: 各画像の表示時間（秒）
+            work_dir: リストファイルの保存ディレクトリ
+            filename: リストファイル名
+
+        Returns:
+            str: リストファイルのパス
+        """
+        if not image_paths:
+            raise ValueError("At least one image is required")
+        
+        # 最後の画像の表示時間を反映させるため、最後のファイルをもう一度記述する
+        return write_concat_list(
+            list(zip(image_paths, durations)),
+            os.path.join(work_dir, filename),
+            repeat_last=True
+        )
+    
+    def _write_audio_concat_list(self, audio_paths: List[str], durations: List[float], work_dir: str) -> str:
+        """音声用のconcatデマルチプレクサのリストファイルを作成する
+
+        Args:
+            audio_paths: 音声ファイルのパスリスト
+            durations: 各音声の長さ（秒）
+            work_dir: リストファイルの保存ディレクトリ
+
+        Returns:
+            str: リストファイルのパス
+        """
+        return write_concat_list(
+            list(zip(audio_paths, durations)),
+            os.path.join(work_dir, "narration.ffconcat")
+        )
+    
+    def _write_ass(self, subtitles: List[Dict], font_size: int, font_color: str, work_dir: str,
+                   width: Optional[int] = None, height: Optional[int] = None) -> str:
+        """字幕情報からASS字幕ファイルを作成する
+
+        Args:
+            subtitles: 字幕情報のリスト
+            font_size: フォントサイズ
+            font_color: フォント色
+            work_dir: 字幕ファイルの保存ディレクトリ
+            width: 動画の幅（Noneの場合はself.width）
+            height: 動画の高さ（Noneの場合はself.height）
+
+        Returns:
+            str: 字幕ファイルのパス
+        """
+        width = width or self.width
+        height = height or self.height
+        margin = int(width * 0.05)  # 幅を動画の90%に設定
+        primary = self._ass_color(font_color)
+        
+        lines = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "WrapStyle: 0",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+            "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Default,{self._font_name()},{font_size},{primary},{primary},&H00000000,&H00000000,"
+            f"0,0,0,0,100,100,0,0,1,2,0,2,{margin},{margin},0,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        
+        max_chars = max(1, int(width * 0.9 / font_size))
+        for subtitle in subtitles:
+            start = subtitle["start"]
+            end = start + subtitle["duration"]
+            text = self._escape_ass_text(subtitle["text"], max_chars)
+            lines.append(
+                f"Dialogue: 0,{self._format_ass_time(start)},{self._format_ass_time(end)},Default,,0,0,0,,{text}"
+            )
+        
+        subtitle_path = os.path.join(work_dir, f"subtitles_{width}x{height}.ass")
+        with open(subtitle_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        
+        return subtitle_path
+    
+    def _font_name(self) -> str:
+        """ASS字幕で使用するフォントファミリー名を取得する
+
+        Returns:
+            str: フォントファミリー名
+        """
+        if self.font_path:
+            try:
+                from PIL import ImageFont
+                return ImageFont.truetype(self.font_path, 12).getname()[0]
+            except Exception as e:
+                logger.warning(f"Could not read font name from {self.font_path}: {e}")
+        return "Sans"
+    
+    def _audio_duration(self, path: str) -> float:
+        """音声ファイルの長さを取得する
+
+        ヘッダから長さを取得できない形式の場合のみffprobeを使用する。
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        try:
+            return self.duration_index.get(path)
+        except ValueError:
+            return self._probe_duration(path)
+    
+    def _probe_duration(self, path: str) -> float:
+        """ffprobeでメディアファイルの長さを取得する
+
+        Args:
+            path: メディアファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        cmd = [self.ffprobe_binary, '-v', 'error', '-show_entries', 'format=duration',
+               '-of', 'default=noprint_wrappers=1:nokey=1', path]
+        result = self._run(cmd)
+        return float(result.stdout.strip())
+    
+    def _run(self, cmd: List[str]) -> subprocess.CompletedProcess:
+        """外部コマンドを実行する
+
+        Args:
+            cmd: 実行するコマンド
+
+        Returns:
+            subprocess.CompletedProcess: 実行結果
+        """
+        return run_command(cmd)
+    
+    @staticmethod
+    def _output_path(directory: str, output_filename: Optional[str], prefix: str) -> str:
+        """出力ファイルのパスを作成する
+
+        Args:
+            directory: 出力ディレクトリ
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            prefix: 自動生成するファイル名の接頭辞
+
+        Returns:
+            str: 出力ファイルのパス
+        """
+        # 出力ファイル名が指定されていない場合は自動生成
+        if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
+            timestamp = int(time.time())
+            output_filename = f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+        
+        # 拡張子がない場合は追加
+        if not output_filename.endswith('.mp4'):
+            output_filename += '.mp4'
+        
+        return os.path.join(directory, output_filename)
+    
+    @staticmethod
+    def _format_seconds(seconds: float) -> str:
+        """秒数をffmpegの引数用の文字列に変換する"""
+        return f"{seconds:.6f}"
+    
+    @staticmethod
+    def _format_ass_time(seconds: float) -> str:
+        """秒数をASSの時刻表記（H:MM:SS.cc）に変換する"""
+        centiseconds = int(round(seconds * 100))
+        hours, centiseconds = divmod(centiseconds, 360000)
+        minutes, centiseconds = divmod(centiseconds, 6000)
+        secs, centiseconds = divmod(centiseconds, 100)
+        return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+    
+    @staticmethod
+    def _ass_color(color: str) -> str:
+        """色名または#RRGGBBをASSの色表記（&HAABBGGRR）に変換する"""
+        rgb = ASS_COLOR_NAMES.get(color.lower())
+        if rgb is None:
+            rgb = color.lstrip('#')
+            if len(rgb) != 6:
+                raise ValueError(f"Unsupported subtitle color: {color}")
+        return f"&H00{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".upper()
+    
+    @staticmethod
+    def _escape_ass_text(text: str, max_chars: int) -> str:
+        """テキストをASSのDialogue行に書ける形式に変換する
+
+        libassは空白でしか折り返さないため、日本語の字幕は文字数で改行を入れる。
+        """
+        text = text.replace('\\', '＼').replace('{', '｛').replace('}', '｝')
+        lines = []
+        for paragraph in text.splitlines() or ['']:
+            while len(paragraph) > max_chars:
+                lines.append(paragraph[:max_chars])
+                paragraph = paragraph[max_chars:]
+            lines.append(paragraph)
+        return '\\N'.join(lines)
+    
+    @staticmethod
+    def _escape_filter_value(value: str) -> str:
+        """フィルタ引数の値をエスケープする"""
+        value = value.replace('\\', '/').replace(':', '\\:')
+        return f"'{value}'"
@@ -0,0 +1,227 @@
+"""
+ffmpegの実行に関する共通処理
+"""
+import os
+import logging
+import tempfile
+import subprocess
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def run_command(cmd: List[str], stdin_chunks: Optional[Iterable[bytes]] = None) -> subprocess.CompletedProcess:
+    """外部コマンド（ffmpeg/ffprobe）を実行する
+
+    stdin_chunksを指定した場合は、生成されたデータを順に標準入力へ書き込む
+    （ffmpegでは'pipe:0'を入力にする）。データを一時ファイルに書き出さずに渡せる。
+
+    Args:
+        cmd: 実行するコマンド
+        stdin_chunks: 標準入力に書き込むデータ（Noneの場合は標準入力を使わない）
+
+    Returns:
+        subprocess.CompletedProcess: 実行結果
+
+    Raises:
+        RuntimeError: コマンドが失敗した場合
+    """
+    logger.debug(f"Running: {' '.join(cmd)}")
+    if stdin_chunks is None:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    else:
+        result = _run_with_stdin(cmd, stdin_chunks)
+    
+    if result.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(cmd[0])} failed ({result.returncode}): {result.stderr[-2000:]}")
+    return result
+
+def _run_with_stdin(cmd: List[str], stdin_chunks: Iterable[bytes]) -> subprocess.CompletedProcess:
+    """標準入力にデータを書き込みながらコマンドを実行する
+
+    標準エラー出力は一時ファイルで受けて、パイプが詰まってデッドロックしないようにする。
+    """
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file)
+        try:
+            for chunk in stdin_chunks:
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            # コマンドが先に終了した場合（エラーは終了コードで判定する）
+            pass
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        
+        returncode = process.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+    
+    return subprocess.CompletedProcess(cmd, returncode, '', stderr)
+
+def quote_concat_path(path: str) -> str:
+    """concatデマルチプレクサのリスト用にパスをクォートする
+
+    Args:
+        path: ファイルのパス
+
+    Returns:
+        str: クォートした絶対パス
+    """
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+def write_concat_list(entries: List[Tuple[str, Optional[float]]], list_path: str,
+                      repeat_last: bool = False, outpoints: Optional[List[Optional[float]]] = None) -> str:
+    """concatデマルチプレクサのリストファイルを作成する
+
+    Args:
+        entries: (ファイルパス, 表示時間（秒、Noneの場合はファイルの長さ）)のリスト
+        list_path: リストファイルのパス
+        repeat_last: 最後のファイルをもう一度記述するかどうか
+            （画像の場合、最後の表示時間を反映させるために必要）
+        outpoints: entriesと同じ順序の、各ファイルの終了位置（秒、Noneの場合はファイルの終わりまで。
+            ストリームコピーでは、この時刻以降のパケットが除かれる）
+
+    Returns:
+        str: リストファイルのパス
+    """
+    lines = ["ffconcat version 1.0"]
+    for i, (path, duration) in enumerate(entries):
+        lines.append(f"file {quote_concat_path(path)}")
+        if duration is not None:
+            lines.append(f"duration {duration:.6f}")
+        if outpoints and outpoints[i] is not None:
+            lines.append(f"outpoint {outpoints[i]:.6f}")
+    
+    if repeat_last and entries:
+        lines.append(f"file {quote_concat_path(entries[-1][0])}")
+    
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    
+    return list_path
+
+def mux_tracks(video_path: str, audio_path: str, output_path: str, ffmpeg_binary: str = 'ffmpeg') -> str:
+    """別々に作成した映像と音声をストリームコピーで1つのMP4に多重化する
+
+    どちらも再エンコードしないため、ファイルの読み書きの時間しかかからない。
+
+    Args:
+        video_path: 音声なしの動画ファイルのパス
+        audio_path: エンコード済みの音声ファイルのパス
+        output_path: 出力ファイルのパス
+        ffmpeg_binary: ffmpegの実行ファイル
+
+    Returns:
+        str: 出力ファイルのパス
+    """
+    run_command([ffmpeg_binary, '-y', '-i', video_path, '-i', audio_path,
+                 '-map', '0:v', '-map', '1:a', '-c', 'copy', '-movflags', '+faststart', output_path])
+    return output_path
+
+# HLSのプレイリストのファイル名（セグメントと初期化セグメントは同じディレクトリに出力する）
+HLS_PLAYLIST_NAME = "index.m3u8"
+
+def hls_options(segment_seconds: int = 4) -> List[Tuple[str, str]]:
+    """fMP4セグメントのHLSを出力するhlsマルチプレクサのオプションを返す
+
+    プレイリストはEVENT形式で、セグメントが書き出されるたびに追記される。
+    エンコード中のプレイリストが途中まで書かれた状態で読まれないよう、一時ファイルに書いてから置き換える。
+
+    Args:
+        segment_seconds: セグメントの長さの目安（秒）
+
+    Returns:
+        List[Tuple[str, str]]: (オプション名, 値)のリスト
+    """
+    return [
+        ('hls_time', str(segment_seconds)),
+        ('hls_playlist_type', 'event'),
+        ('hls_segment_type', 'fmp4'),
+        ('hls_flags', 'independent_segments+temp_file'),
+    ]
+
+def keyframe_args(segment_seconds: int = 4) -> List[str]:
+    """HLSのセグメントの長さに合わせてキーフレームを挿入するエンコード引数を返す
+
+    Args:
+        segment_seconds: セグメントの長さの目安（秒）
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    return ['-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds})"]
+
+def tee_output_args(output_path: str, hls_dir: str, segment_seconds: int = 4) -> List[str]:
+    """1回のエンコードでfaststartのMP4とHLSを同時に出力する引数を返す
+
+    teeマルチプレクサで同じエンコード結果を2つの出力に書き込む。HLSのセグメントは
+    エンコードの進行に合わせて書き出されるため、完成前から再生を始められる。
+    出力ファイルのパスの代わりにコマンドの最後に付ける（対象のストリームは-mapで指定しておく）。
+
+    Args:
+        output_path: MP4ファイルのパス
+        hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ
+        segment_seconds: セグメントの長さの目安（秒）
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    os.makedirs(hls_dir, exist_ok=True)
+    hls_spec = ':'.join(f"{key}={value}" for key, value in hls_options(segment_seconds))
+    outputs = [
+        f"[f=mp4:movflags=+faststart]{_escape_tee_path(output_path)}",
+        f"[f=hls:{hls_spec}]{_escape_tee_path(os.path.join(hls_dir, HLS_PLAYLIST_NAME))}",
+    ]
+    return ['-flags', '+global_header', '-f', 'tee', '|'.join(outputs)]
+
+def package_hls(video_path: str, hls_dir: str, segment_seconds: int = 4,
+                ffmpeg_binary: str = 'ffmpeg') -> str:
+    """完成した動画をストリームコピーでHLSに分割する
+
+    レンダリングせずにキャッシュから返した動画など、エンコード中にHLSを出力しなかった場合に使う。
+
+    Args:
+        video_path: 動画ファイルのパス
+        hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ
+        segment_seconds: セグメントの長さの目安（秒）
+        ffmpeg_binary: ffmpegの実行ファイル
+
+    Returns:
+        str: プレイリストのパス
+    """
+    os.makedirs(hls_dir, exist_ok=True)
+    playlist_path = os.path.join(hls_dir, HLS_PLAYLIST_NAME)
+    
+    cmd = [ffmpeg_binary, '-y', '-i', video_path, '-map', '0', '-c', 'copy', '-f', 'hls']
+    for key, value in hls_options(segment_seconds):
+        cmd += [f"-{key}", value]
+    run_command(cmd + [playlist_path])
+    
+    return playlist_path
+
+def hls_to_mp4(playlist_path: str, output_path: str, ffmpeg_binary: str = 'ffmpeg') -> str:
+    """エンコードしながら書き出したHLSのセグメントを、ストリームコピーで1つのMP4にまとめる
+
+    Args:
+        playlist_path: HLSのプレイリストのパス
+        output_path: 出力ファイルのパス
+        ffmpeg_binary: ffmpegの実行ファイル
+
+    Returns:
+        str: 出力ファイルのパス
+    """
+    run_command([ffmpeg_binary, '-y', '-i', playlist_path, '-map', '0', '-c', 'copy',
+                 '-movflags', '+faststart', output_path])
+    return output_path
+
+def _escape_tee_path(path: str) -> str:
+    """teeマルチプレクサの出力指定用にパスの区切り文字をエスケープする"""
+    for char in ('\\', '|', '[', ']', "'"):
+        path = path.replace(char, '\\' + char)
+    return path
@@ -0,0 +1,183 @@
+"""
+スライド画像の正規化モジュール
+"""
+import os
+import json
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from .subtitle_cache import evict_lru_files
+from .render_cache import hash_file
+
+logger = logging.getLogger(__name__)
+
+def normalize_image(spec: Dict, output_path: str) -> str:
+    """画像を1回だけデコードし、向きを補正して出力サイズのキャンバスに収める
+
+    プロセスプールのワーカーから呼び出すため、モジュールレベルの関数として定義する。
+    アスペクト比を保ったまま縮小・拡大し、余白は背景色で埋める（レターボックス）。
+    透過画像は背景色の上に合成してRGBにする。
+
+    Args:
+        spec: 正規化の条件（ImageNormalizer.make_specの戻り値）
+        output_path: 出力するPNGファイルのパス
+
+    Returns:
+        str: 出力したPNGファイルのパス
+    """
+    from PIL import Image, ImageOps
+    
+    width, height = spec["width"], spec["height"]
+    
+    with Image.open(spec["source_path"]) as img:
+        # JPEGは出力サイズに近い縮小率でデコードして読み込みを軽くする（回転後も足りるよう長辺を基準にする）
+        img.draft('RGB', (max(width, height), max(width, height)))
+        img = ImageOps.exif_transpose(img)
+        
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, spec["background"])
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            img = img.convert('RGB')
+        
+        scale = min(width / img.width, height / img.height)
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+        
+        canvas = Image.new('RGB', (width, height), spec["background"])
+        canvas.paste(img, ((width - size[0]) // 2, (height - size[1]) // 2))
+    
+    # 書き込み途中のファイルが読まれないよう、一時ファイルに書いてから置き換える
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    canvas.save(temp_path, format='PNG', compress_level=1)
+    os.replace(temp_path, output_path)
+    
+    return output_path
+
+class ImageNormalizer:
+    """スライド画像の正規化クラス
+
+    元画像の内容のハッシュと出力サイズ・背景色をキーにして正規化済みの画像を
+    ディスクにキャッシュする。動画の合成では同じサイズのRGB画像だけを扱えるようにする。
+    """
+    
+    def __init__(self, cache_dir: str, width: int = 1920, height: int = 1080,
+                 background: str = 'black', max_bytes: int = 1024 * 1024 * 1024,
+                 max_workers: Optional[int] = None):
+        """初期化
+
+        Args:
+            cache_dir: キャッシュの保存ディレクトリ
+            width: 出力する画像の幅
+            height: 出力する画像の高さ
+            background: 余白の背景色
+            max_bytes: キャッシュの合計サイズの上限（バイト）
+            max_workers: 画像を並列に正規化するプロセス数（Noneの場合はCPU数）
+        """
+        self.cache_dir = cache_dir
+        self.width = width
+        self.height = height
+        self.background = background
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        
+        # キャッシュディレクトリが存在しない場合は作成
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def for_size(self, width: int, height: int) -> 'ImageNormalizer':
+        """キャッシュを共有し、別の出力サイズに正規化するインスタンスを返す
+
+        Args:
+            width: 出力する画像の幅
+            height: 出力する画像の高さ
+
+        Returns:
+            ImageNormalizer: 指定の出力サイズの正規化クラスのインスタンス（同じサイズの場合は自身）
+        """
+        if (width, height) == (self.width, self.height):
+            return self
+        
+        return ImageNormalizer(self.cache_dir, width=width, height=height, background=self.background,
+                               max_bytes=self.max_bytes, max_workers=self.max_workers)
+    
+    def make_spec(self, source_path: str) -> Dict:
+        """画像の正規化条件を作成する
+
+        Args:
+            source_path: 元画像のパス
+
+        Returns:
+            Dict: 正規化条件
+        """
+        return {
+            "source_path": source_path,
+            "source_hash": hash_file(source_path),
+            "width": self.width,
+            "height": self.height,
+            "background": self.background,
+        }
+    
+    @staticmethod
+    def make_key(spec: Dict) -> str:
+        """正規化条件からキャッシュキーを作成する
+
+        元画像のパスは含めず、内容が同じ画像は同じキーになる。
+
+        Args:
+            spec: 正規化条件
+
+        Returns:
+            str: キャッシュキー（SHA-256）
+        """
+        canonical = json.dumps({k: v for k, v in spec.items() if k != "source_path"}, sort_keys=True)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def normalize(self, image_paths: List[str]) -> List[str]:
+        """正規化済みの画像を取得し、キャッシュにないものはまとめて作成する
+
+        Args:
+            image_paths: 元画像のパスリスト
+
+        Returns:
+            List[str]: image_pathsと同じ順序の正規化済み画像のパスリスト
+        """
+        paths = []
+        missing = {}
+        
+        for image_path in image_paths:
+            spec = self.make_spec(image_path)
+            key = self.make_key(spec)
+            path = self._path_for(key)
+            if os.path.exists(path):
+                # 最終利用時刻を更新（LRU削除に使用）
+                os.utime(path)
+            else:
+                missing[key] = (spec, path)
+            paths.append(path)
+        
+        if missing:
+            logger.info(f"Normalizing {len(missing)} images to {self.width}x{self.height} "
+                        f"({len(image_paths) - len(missing)} cached)")
+            jobs = list(missing.values())
+            
+            if len(jobs) == 1 or self.max_workers == 1:
+                for spec, path in jobs:
+                    normalize_image(spec, path)
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                    list(executor.map(normalize_image,
+                                      [spec for spec, _ in jobs],
+                                      [path for _, path in jobs]))
+            
+            evict_lru_files(self.cache_dir, self.max_bytes, keep=set(paths))
+        
+        return paths
+    
+    def _path_for(self, key: str) -> str:
+        """キャッシュキーに対応するファイルパスを返す"""
+        return os.path.join(self.cache_dir, f"{key}.png")
@@ -0,0 +1,79 @@
+"""
+動画の出力プロファイルモジュール
+"""
+from math import gcd
+from typing import Dict, List, Optional
+
+def make_profile(name: str, width: int, height: int, bitrate: Optional[str] = None) -> Dict:
+    """出力プロファイルを作成する
+
+    Args:
+        name: プロファイル名（出力ファイル名の接尾辞に使用）
+        width: 出力動画の幅（偶数）
+        height: 出力動画の高さ（偶数）
+        bitrate: 映像のビットレート（'8M'など、Noneの場合はエンコーダの既定値）
+
+    Returns:
+        Dict: 出力プロファイル
+    """
+    if not name or not name.replace('-', '').replace('_', '').isalnum():
+        raise ValueError(f"Invalid output profile name: {name!r}")
+    if width <= 0 or height <= 0 or width % 2 or height % 2:
+        raise ValueError(f"Output profile {name} must have a positive even size: {width}x{height}")
+    
+    return {"name": name, "width": width, "height": height, "bitrate": bitrate or None}
+
+def parse_output_profiles(text: str) -> List[Dict]:
+    """'名前:幅x高さ[:ビットレート]'をカンマ区切りで並べた文字列から出力プロファイルを作成する
+
+    例: 'landscape:1920x1080:8M,portrait:1080x1920:6M'
+
+    Args:
+        text: 出力プロファイルの記述
+
+    Returns:
+        List[Dict]: 出力プロファイルのリスト
+    """
+    profiles = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        
+        parts = item.split(':')
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Invalid output profile: {item!r}")
+        try:
+            width, height = (int(value) for value in parts[1].lower().split('x'))
+        except ValueError:
+            raise ValueError(f"Invalid output profile size: {item!r}")
+        
+        profiles.append(make_profile(parts[0], width, height, parts[2] if len(parts) == 3 else None))
+    
+    names = [profile["name"] for profile in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate output profile names: {text!r}")
+    
+    return profiles
+
+def group_by_aspect(profiles: List[Dict]) -> List[List[Dict]]:
+    """アスペクト比が同じプロファイルをまとめる
+
+    同じアスペクト比のプロファイルは、最も大きい解像度の画像を1回だけデコードして
+    縮小すれば作成できる。各グループは解像度の大きい順に並べる。
+
+    Args:
+        profiles: 出力プロファイルのリスト
+
+    Returns:
+        List[List[Dict]]: アスペクト比ごとのプロファイルのリスト（最初の出現順）
+    """
+    groups: Dict[tuple, List[Dict]] = {}
+    for profile in profiles:
+        divisor = gcd(profile["width"], profile["height"])
+        groups.setdefault((profile["width"] // divisor, profile["height"] // divisor), []).append(profile)
+    
+    return [
+        sorted(group, key=lambda profile: profile["width"] * profile["height"], reverse=True)
+        for group in groups.values()
+    ]
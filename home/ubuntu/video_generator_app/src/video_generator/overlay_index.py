@@ -0,0 +1,99 @@
+"""
+合成時のオーバーレイ（字幕・スライド）の区間インデックスモジュール
+"""
+import math
+from array import array
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from moviepy.editor import CompositeVideoClip
+
+class OverlayIndex:
+    """オーバーレイの表示区間のインデックスクラス
+
+    表示区間を開始時刻順に並べた開始・終了時刻の配列として保持する。
+    動画の書き出しのように時刻が単調増加する問い合わせは、前回の位置から掃引して
+    表示中のオーバーレイだけを更新するため、1フレームあたりの処理量は
+    全体の数ではなく表示中のオーバーレイの数に比例する。
+    """
+    
+    __slots__ = ('starts', 'ends', 'order', '_cursor', '_active', '_last_time')
+    
+    def __init__(self, intervals: Sequence[Tuple[float, Optional[float]]]):
+        """初期化
+
+        Args:
+            intervals: オーバーレイごとの(開始時刻, 終了時刻)のリスト（終了時刻がNoneの場合は終わりなし）
+        """
+        order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+        self.order = array('l', order)
+        self.starts = array('d', (intervals[i][0] for i in order))
+        self.ends = array('d', (math.inf if intervals[i][1] is None else intervals[i][1] for i in order))
+        
+        self._cursor = 0
+        self._active: List[int] = []
+        self._last_time = -math.inf
+    
+    def __len__(self) -> int:
+        return len(self.starts)
+    
+    def active(self, t: float) -> List[int]:
+        """時刻tに表示中のオーバーレイを返す
+
+        moviepyのis_playingと同じく、開始時刻 <= t < 終了時刻のものを表示中とする。
+
+        Args:
+            t: 時刻（秒）
+
+        Returns:
+            List[int]: 表示中のオーバーレイの元の番号（重ね順を保つため昇順）
+        """
+        if t < self._last_time:
+            # 時刻が戻った場合は二分探索で位置を求め直す
+            self._cursor = bisect_right(self.starts, t)
+            self._active = [k for k in range(self._cursor) if self.ends[k] > t]
+        self._last_time = t
+        
+        # 開始したオーバーレイを追加し、終了したオーバーレイを除く
+        cursor = self._cursor
+        count = len(self.starts)
+        while cursor < count and self.starts[cursor] <= t:
+            self._active.append(cursor)
+            cursor += 1
+        self._cursor = cursor
+        self._active = [k for k in self._active if self.ends[k] > t]
+        
+        return sorted(self.order[k] for k in self._active)
+
+class IndexedCompositeVideoClip(CompositeVideoClip):
+    """表示中のクリップを区間インデックスで求める合成クリップ
+
+    CompositeVideoClipはフレームごとに全クリップのis_playingを評価するため、
+    字幕が数百あるとフレーム数×字幕数の処理になる。このクラスは構築時に一度だけ
+    インデックスを作成し、フレームごとには表示中のクリップだけを合成する。
+    """
+    
+    def __init__(self, clips: List, *args, **kwargs):
+        """初期化
+
+        Args:
+            clips: 合成するクリップのリスト（後のものほど手前に重なる）
+            *args: CompositeVideoClipの引数
+            **kwargs: CompositeVideoClipのキーワード引数
+        """
+        super().__init__(clips, *args, **kwargs)
+        self.overlay_index = OverlayIndex([(clip.start, clip.end) for clip in self.clips])
+    
+    def playing_clips(self, t: float = 0) -> List:
+        """時刻tに表示中のクリップを返す
+
+        Args:
+            t: 時刻（秒）
+
+        Returns:
+            List: 表示中のクリップのリスト（重ね順）
+        """
+        # 時刻の配列（マスクの一括評価など）は従来どおり判定する
+        if not isinstance(t, (int, float)):
+            return super().playing_clips(t)
+        return [self.clips[i] for i in self.overlay_index.active(t)]
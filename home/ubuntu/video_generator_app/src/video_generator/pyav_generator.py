@@ -0,0 +1,943 @@
+"""
+PyAVを使用した動画生成モジュール
+"""
+import os
+import logging
+import time
+import uuid
+import shutil
+import tempfile
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from . import VideoGeneratorEngine
+from .audio_probe import DurationIndex
+from .audio_mixer import AudioMixer
+from .timeline import Timeline, SLIDE_MODES
+from .image_normalizer import ImageNormalizer
+from .streaming_compositor import StreamingCompositor
+from .subtitle_cache import SubtitleRasterCache
+from .text_renderer import SUBTITLE_MAX_HEIGHT_RATIO
+from .slide_segments import SlideSegmentCache
+from .render_metrics import RenderMetrics
+from .render_cache import RenderCache
+from .output_profiles import make_profile
+from .subtitle_tracks import write_sidecars, mux_subtitle_track
+from .ffmpeg_utils import mux_tracks, package_hls, hls_options, hls_to_mp4, HLS_PLAYLIST_NAME
+from .render_profiles import get_render_profile, gop_frames, video_encoder_args, VIDEO_CODEC, AUDIO_CODEC
+
+logger = logging.getLogger(__name__)
+
+# AACの1フレームあたりのサンプル数
+AAC_FRAME_SAMPLES = 1024
+
+class PyAVVideoGenerator(VideoGeneratorEngine):
+    """PyAV（libavのバインディング）を使用した動画生成クラス
+
+    合成したフレームをffmpegのサブプロセスにパイプで渡さず、プロセス内でエンコードする。
+    RGBのフレームは1つだけ確保してNumPyの配列として直接書き込み、yuv420pへの変換は
+    表示中のスライドや字幕が変わった時だけ行う（変わらない間は変換済みのフレームを再利用する）。
+    音声はAudioMixerで合成したサンプルをそのままAACにエンコードし、映像と同じファイルに多重化する。
+    """
+    
+    def __init__(self, output_dir: str, temp_dir: str, font_path: Optional[str] = None,
+                 width: int = 1920, height: int = 1080, fps: int = 24,
+                 ffmpeg_binary: str = 'ffmpeg',
+                 duration_index: Optional[DurationIndex] = None,
+                 bgm_duck_gain: float = 1.0,
+                 frame_mode: str = 'cfr',
+                 render_profile: Optional[Dict] = None,
+                 subtitle_cache_dir: Optional[str] = None,
+                 subtitle_cache_max_bytes: int = 512 * 1024 * 1024,
+                 image_cache_dir: Optional[str] = None,
+                 image_cache_max_bytes: int = 1024 * 1024 * 1024,
+                 render_cache_dir: Optional[str] = None,
+                 render_cache_max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 render_cache_max_age: Optional[float] = 7 * 24 * 60 * 60,
+                 hls_segment_seconds: int = 4,
+                 slide_mode: str = 'fixed',
+                 comments_per_slide: int = 0,
+                 timeline_fps: Optional[int] = None,
+                 slide_segment_cache_dir: Optional[str] = None,
+                 slide_segment_cache_max_bytes: int = 2 * 1024 * 1024 * 1024):
+        """初期化
+
+        Args:
+            output_dir: 動画ファイルの出力ディレクトリ
+            temp_dir: 一時ファイルの保存ディレクトリ
+            font_path: 字幕用フォントのパス（Noneの場合はデフォルト）
+            width: 出力動画の幅（偶数）
+            height: 出力動画の高さ（偶数）
+            fps: 出力動画のフレームレート
+            ffmpeg_binary: 音声のデコードと、字幕トラック・HLSのストリームコピーに使うffmpegの実行ファイル
+            duration_index: 音声ファイルの長さのインデックス（Noneの場合は新規作成）
+            bgm_duck_gain: ナレーション中のBGMの音量倍率（1.0の場合はダッキングなし）
+            frame_mode: 'cfr'は固定フレームレート、'vfr'はスライドと字幕が変わる時だけフレームを出力する
+            render_profile: エンコード設定（get_render_profileの戻り値、Noneの場合は'standard'）
+            subtitle_cache_dir: 字幕画像キャッシュのディレクトリ（Noneの場合は一時ディレクトリ内）
+            subtitle_cache_max_bytes: 字幕画像キャッシュの合計サイズの上限（バイト）
+            image_cache_dir: 正規化済み画像のキャッシュのディレクトリ（Noneの場合は一時ディレクトリ内）
+            image_cache_max_bytes: 正規化済み画像のキャッシュの合計サイズの上限（バイト）
+            render_cache_dir: 完成した動画のキャッシュのディレクトリ（Noneの場合はキャッシュしない）
+            render_cache_max_bytes: 完成した動画のキャッシュの合計サイズの上限（バイト）
+            render_cache_max_age: 完成した動画のキャッシュの保持期間（秒、最終利用から）
+            hls_segment_seconds: HLSを出力する場合のセグメントの長さの目安（秒）
+            slide_mode: スライドの表示区間の決め方（'fixed'は1枚あたりslide_durationずつ、
+                'even'はナレーション全体を均等に分け、'comments'はコメントの境界で切り替える）
+            comments_per_slide: slide_modeが'comments'の場合の1枚あたりのコメント数
+                （0の場合はすべてのコメントに画像が行き渡るように決定する）
+            timeline_fps: タイムラインを計画するフレームレート（Noneの場合はfps、プレビューで
+                本番と同じタイムラインを使う場合は本番のフレームレートを指定する）
+            slide_segment_cache_dir: スライド画像ごとのエンコード済み区間のキャッシュのディレクトリ
+                （Noneの場合は一時ディレクトリ内）
+            slide_segment_cache_max_bytes: スライド画像ごとの区間のキャッシュの合計サイズの上限（バイト）
+        """
+        if frame_mode not in ('cfr', 'vfr'):
+            raise ValueError(f"Unsupported frame mode: {frame_mode}")
+        if slide_mode not in SLIDE_MODES:
+            raise ValueError(f"Unsupported slide mode: {slide_mode}")
+        
+        self.output_dir = output_dir
+        self.temp_dir = temp_dir
+        self.font_path = font_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.ffmpeg_binary = ffmpeg_binary
+        self.frame_mode = frame_mode
+        self.duration_index = duration_index if duration_index is not None else DurationIndex()
+        self.render_profile = render_profile or get_render_profile()
+        self.hls_segment_seconds = hls_segment_seconds
+        self.slide_mode = slide_mode
+        self.comments_per_slide = comments_per_slide
+        self.timeline_fps = timeline_fps or fps
+        
+        # 直近のgenerate_videoの段階ごとの計測結果
+        self.metrics = RenderMetrics()
+        
+        # 出力ディレクトリが存在しない場合は作成
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(temp_dir, exist_ok=True)
+        
+        # ナレーションとBGMはNumPyで合成し、サンプルのままエンコーダに渡す
+        self.audio_mixer = AudioMixer(ffmpeg_binary=ffmpeg_binary, duck_gain=bgm_duck_gain)
+        
+        # 字幕画像はテキストとスタイルをキーにしてセッションをまたいでキャッシュする
+        self.subtitle_cache = SubtitleRasterCache(
+            subtitle_cache_dir or os.path.join(temp_dir, "subtitle_cache"),
+            max_bytes=subtitle_cache_max_bytes
+        )
+        
+        # スライド画像は向きを補正して出力サイズに正規化し、キャッシュする
+        self.image_normalizer = ImageNormalizer(
+            image_cache_dir or os.path.join(temp_dir, "image_cache"),
+            width=width,
+            height=height,
+            max_bytes=image_cache_max_bytes
+        )
+        
+        # 字幕のないスライドショーは、画像ごとにエンコードした区間をキャッシュしてストリームコピーで組み立てる
+        self.slide_segments = SlideSegmentCache(
+            slide_segment_cache_dir or os.path.join(temp_dir, "slide_segments"),
+            ffmpeg_binary=ffmpeg_binary,
+            max_bytes=slide_segment_cache_max_bytes
+        )
+        
+        # 同じ入力の動画はレンダリングせずにキャッシュから返す
+        self.render_cache = None
+        if render_cache_dir:
+            self.render_cache = RenderCache(
+                render_cache_dir,
+                max_bytes=render_cache_max_bytes,
+                max_age_seconds=render_cache_max_age
+            )
+    
+    def create_slideshow(self, image_paths: List[str], slide_duration: float = 5.0,
+                        output_filename: Optional[str] = None,
+                        timeline: Optional[Timeline] = None) -> str:
+        """画像からスライドショー動画を作成する
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            timeline: ナレーションのタイムライン（Noneの場合は1枚あたりslide_durationずつ表示する）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.temp_dir, output_filename, "slideshow")
+        work_dir = tempfile.mkdtemp(prefix="pyav_", dir=self.temp_dir)
+        
+        try:
+            timeline = self._plan_timeline([] if timeline is None else timeline,
+                                           image_paths=image_paths, slide_duration=slide_duration)
+            slides = timeline.slides(self.image_normalizer.normalize(image_paths))
+            
+            if self.frame_mode == 'cfr':
+                # 画像ごとの区間を取得し（キャッシュにないものだけエンコード）、ストリームコピーで連結
+                segment_paths = self.slide_segments.segments(
+                    [(path, length) for (path, _, _), length in zip(slides, timeline.slide_frames(self.fps))],
+                    self.width, self.height, self.fps, video_encoder_args(self.render_profile, self.fps)
+                )
+                self.slide_segments.assemble(segment_paths, output_path, work_dir)
+                logger.info(f"Slideshow created successfully: {output_path}")
+                return output_path
+            
+            compositor = StreamingCompositor((self.width, self.height), slides, [])
+            try:
+                self._encode(output_path, self._composited_frames(compositor), timeline.output_frames(self.fps))
+            finally:
+                compositor.close()
+            
+            logger.info(f"Slideshow created successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error creating slideshow: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def add_audio_to_video(self, video_path: str, audio_paths: Union[List[str], Timeline],
+                          bgm_path: Optional[str] = None, bgm_volume: float = 0.3,
+                          output_filename: Optional[str] = None) -> str:
+        """動画に音声とBGMを追加する
+
+        動画が音声より短い場合は最後のフレームを延長する。
+
+        Args:
+            video_path: 元動画のパス
+            audio_paths: 音声ファイルのパスリスト、またはタイムライン
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            bgm_volume: BGMの音量（0.0〜1.0）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.temp_dir, output_filename, "video_with_audio")
+        
+        try:
+            if not isinstance(audio_paths, Timeline):
+                audio_paths = [{"path": path} for path in audio_paths]
+            timeline = self._plan_timeline(audio_paths)
+            
+            frames = self._decoded_frames(video_path)
+            try:
+                audio_chunks = self.audio_mixer.sample_chunks(timeline.narration(), timeline.duration,
+                                                              bgm_path, bgm_volume)
+                self._encode(output_path, frames, timeline.output_frames(self.fps), audio_chunks)
+            finally:
+                frames.close()
+            
+            logger.info(f"Audio added to video successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error adding audio to video: {e}")
+            raise
+    
+    def add_subtitles(self, video_path: str, subtitles: Union[List[Dict], Timeline],
+                     font_size: int = 36, font_color: str = 'white',
+                     output_filename: Optional[str] = None,
+                     soft: bool = False) -> str:
+        """動画に字幕を追加する
+
+        焼き込む場合は映像だけをデコードして字幕を重ね、音声は元の動画からストリームコピーする。
+        softがTrueの場合は焼き込まずに、SRTとWebVTTのサイドカーファイルを出力し、
+        映像と音声をストリームコピーしたままmov_textの字幕トラックとして多重化する。
+
+        Args:
+            video_path: 元動画のパス
+            subtitles: 字幕情報のリスト、またはタイムライン
+                [
+                    {"text": "字幕1", "start": 0, "duration": 5},
+                    {"text": "字幕2", "start": 5, "duration": 3},
+                    ...
+                ]
+            font_size: フォントサイズ
+            font_color: フォント色
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            soft: Trueの場合は焼き込まずに字幕トラックとサイドカーファイルにする
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        output_path = self._output_path(self.output_dir, output_filename, "video_with_subtitles")
+        if isinstance(subtitles, Timeline):
+            subtitles = subtitles.subtitles()
+        
+        if soft:
+            sidecars = write_sidecars(subtitles, output_path)
+            return mux_subtitle_track(video_path, sidecars["srt"], output_path, self.ffmpeg_binary)
+        
+        work_dir = tempfile.mkdtemp(prefix="pyav_", dir=self.temp_dir)
+        
+        try:
+            raster_paths = self._subtitle_rasters(subtitles, self.width, self.height, font_size, font_color)
+            overlays = [
+                (path, subtitle["start"], subtitle["duration"])
+                for path, subtitle in zip(raster_paths, subtitles)
+            ]
+            compositor = StreamingCompositor((self.width, self.height), [], overlays)
+            frames = self._decoded_frames(video_path)
+            video_only_path = os.path.join(work_dir, "video.mp4")
+            
+            try:
+                frame_count = int(round(self._probe_duration(video_path) * self.fps))
+                self._encode(video_only_path, self._subtitled_frames(frames, compositor), frame_count)
+            finally:
+                frames.close()
+                compositor.close()
+            
+            if self._has_audio(video_path):
+                mux_tracks(video_only_path, video_path, output_path, self.ffmpeg_binary)
+            else:
+                shutil.move(video_only_path, output_path)
+            
+            logger.info(f"Subtitles added to video successfully: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logger.error(f"Error adding subtitles to video: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def generate_video(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                      intro_audio_path: Optional[str] = None,
+                      bgm_path: Optional[str] = None,
+                      slide_duration: float = 5.0,
+                      output_filename: Optional[str] = None,
+                      hls_dir: Optional[str] = None,
+                      soft_subtitles: bool = False) -> str:
+        """画像と音声から動画を生成する
+
+        スライドと字幕は表示中の画像だけを読み込んで時刻順に合成し、音声と一緒に
+        プロセス内で1回だけエンコードする。hls_dirを指定した場合は、エンコードしながら
+        fMP4セグメントのHLSを書き出し（完成前からプレイリストを再生できる）、最後にセグメントを
+        ストリームコピーでMP4にまとめる。キャッシュから返す場合は、完成した動画を分割する。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン（イントロを含めて計画済みのもの）
+                [
+                    {"path": "音声ファイルパス1", "text": "テキスト1"},
+                    {"path": "音声ファイルパス2", "text": "テキスト2"},
+                    ...
+                ]
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし、audio_pathsがタイムラインの場合は使用しない）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ（Noneの場合は出力しない、既存の内容は削除される）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに字幕トラックとサイドカーファイルにする
+
+        Returns:
+            str: 生成された動画ファイルのパス
+            （段階ごとの計測結果はself.metricsに記録される）
+        """
+        output_path = self._output_path(self.output_dir, output_filename, "video")
+        profile = make_profile("default", self.width, self.height)
+        
+        # 前回のHLSのセグメントが残っていると新しいプレイリストと混ざるため削除しておく
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+        
+        self._generate_targets(image_paths, audio_paths, intro_audio_path, bgm_path,
+                               slide_duration, [(profile, output_path)], soft_subtitles, hls_dir)
+        
+        # サイドカーファイルはキャッシュから返した場合も含めて毎回作成する
+        if soft_subtitles:
+            write_sidecars(self._plan_timeline(audio_paths, intro_audio_path).subtitles(), output_path)
+        
+        # キャッシュから返した場合はエンコード中にHLSを出力していないため、完成した動画を分割する
+        if hls_dir and not os.path.exists(os.path.join(hls_dir, HLS_PLAYLIST_NAME)):
+            with self.metrics.stage("package_hls"):
+                package_hls(output_path, hls_dir, self.hls_segment_seconds, self.ffmpeg_binary)
+        
+        return output_path
+    
+    def generate_video_profiles(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                                profiles: List[Dict],
+                                intro_audio_path: Optional[str] = None,
+                                bgm_path: Optional[str] = None,
+                                slide_duration: float = 5.0,
+                                output_prefix: Optional[str] = None) -> Dict[str, str]:
+        """画像と音声から複数の出力プロファイル（アスペクト比・解像度・ビットレート）の動画を生成する
+
+        ナレーションの計画と字幕のテキストは1回だけ作成し、プロファイルごとに
+        その解像度で合成してエンコードする。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            profiles: 出力プロファイルのリスト（make_profileの戻り値）
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_prefix: 出力ファイル名の接頭辞（Noneの場合は自動生成、"{接頭辞}_{プロファイル名}.mp4"に出力）
+
+        Returns:
+            Dict[str, str]: プロファイル名と生成された動画ファイルのパスの辞書
+            （段階ごとの計測結果はself.metricsに記録される）
+        """
+        if not profiles:
+            raise ValueError("At least one output profile is required")
+        
+        if output_prefix is None:
+            output_prefix = f"video_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        targets = [
+            (profile, self._output_path(self.output_dir, f"{output_prefix}_{profile['name']}.mp4", "video"))
+            for profile in profiles
+        ]
+        
+        self._generate_targets(image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration, targets)
+        return {profile["name"]: output_path for profile, output_path in targets}
+    
+    def _generate_targets(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                          intro_audio_path: Optional[str], bgm_path: Optional[str],
+                          slide_duration: float, targets: List[Tuple[Dict, str]],
+                          soft_subtitles: bool = False, hls_dir: Optional[str] = None) -> None:
+        """キャッシュにない出力プロファイルの動画を合成してエンコードする
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            targets: (出力プロファイル, 出力ファイルのパス)のリスト
+            soft_subtitles: Trueの場合は字幕を焼き込まずにmov_textの字幕トラックとして多重化する
+            hls_dir: エンコードしながらHLSを出力するディレクトリ（出力プロファイルが1つの場合のみ）
+        """
+        self.metrics = RenderMetrics()
+        
+        # 同じ入力の動画がキャッシュにあればそのまま使う
+        pending = []
+        cache_keys = {}
+        if self.render_cache is not None:
+            with self.metrics.stage("cache_lookup") as stage:
+                for profile, output_path in targets:
+                    cache_key = self.render_cache.make_key(RenderCache.describe(
+                        image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration,
+                        engine='pyav', font_path=self.font_path, font_size=36, font_color='white',
+                        width=profile["width"], height=profile["height"], fps=self.fps,
+                        encoder=self._encoder_options(profile["bitrate"]),
+                        bgm_duck_gain=self.audio_mixer.duck_gain, soft_subtitles=soft_subtitles,
+                        frame_mode=self.frame_mode, slide_mode=self.slide_mode, comments_per_slide=self.comments_per_slide
+                    ))
+                    if self.render_cache.fetch(cache_key, output_path) is not None:
+                        continue
+                    
+                    # 以前の出力がキャッシュとinodeを共有している場合があるため、上書きせずに削除しておく
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    cache_keys[output_path] = cache_key
+                    pending.append((profile, output_path))
+                stage["cache_hit"] = not pending
+        else:
+            pending = list(targets)
+        
+        if not pending:
+            return
+        
+        work_dir = tempfile.mkdtemp(prefix="pyav_", dir=self.temp_dir)
+        
+        try:
+            # スライドの表示区間はナレーションの長さに合わせてタイムラインで決定する
+            with self.metrics.stage("plan"):
+                timeline = self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
+                narration = timeline.narration()
+                subtitles = timeline.subtitles()
+                total_duration = timeline.duration or sum(duration for _, _, duration in timeline.slides())
+            
+            srt_path = None
+            if subtitles and soft_subtitles:
+                srt_path = write_sidecars(subtitles, os.path.join(work_dir, "subtitles.mp4"))["srt"]
+            
+            for profile, output_path in pending:
+                width, height = profile["width"], profile["height"]
+                
+                with self.metrics.stage(f"normalize_images_{profile['name']}"):
+                    normalizer = self.image_normalizer.for_size(width, height)
+                    slides = timeline.slides(normalizer.normalize(image_paths))
+                
+                overlays = []
+                if subtitles and not soft_subtitles:
+                    with self.metrics.stage(f"subtitles_{profile['name']}"):
+                        raster_paths = self._subtitle_rasters(subtitles, width, height, 36, 'white')
+                    overlays = [
+                        (path, subtitle["start"], subtitle["duration"])
+                        for path, subtitle in zip(raster_paths, subtitles)
+                    ]
+                
+                # 字幕トラックを多重化する場合は、作業ディレクトリに書き出してから出力先に多重化する
+                encode_path = os.path.join(work_dir, "video.mp4") if srt_path else output_path
+                audio_chunks = None
+                if narration:
+                    audio_chunks = self.audio_mixer.sample_chunks(narration, total_duration, bgm_path)
+                
+                # HLSを出力する場合は、エンコード結果をセグメントとして書き出してから最後にMP4にまとめる
+                playlist_path = None
+                if hls_dir and len(targets) == 1:
+                    os.makedirs(hls_dir, exist_ok=True)
+                    playlist_path = os.path.join(hls_dir, HLS_PLAYLIST_NAME)
+                
+                compositor = StreamingCompositor((width, height), slides, overlays)
+                try:
+                    with self.metrics.stage(f"encode_{profile['name']}") as stage:
+                        stage["frames"] = self._encode(
+                            playlist_path or encode_path, self._composited_frames(compositor),
+                            timeline.output_frames(self.fps), audio_chunks, width, height, profile["bitrate"],
+                            hls=playlist_path is not None
+                        )
+                        stage["output_bytes"] = RenderMetrics.file_size(playlist_path or encode_path)
+                        stage["peak_images"] = compositor.peak_images
+                finally:
+                    compositor.close()
+                
+                if playlist_path:
+                    with self.metrics.stage(f"mux_{profile['name']}") as stage:
+                        hls_to_mp4(playlist_path, encode_path, self.ffmpeg_binary)
+                        stage["output_bytes"] = RenderMetrics.file_size(encode_path)
+                
+                if srt_path:
+                    with self.metrics.stage("subtitle_track"):
+                        mux_subtitle_track(encode_path, srt_path, output_path, self.ffmpeg_binary)
+                
+                if output_path in cache_keys:
+                    try:
+                        self.render_cache.store(cache_keys[output_path], output_path)
+                    except OSError as e:
+                        logger.warning(f"Failed to store render in cache: {e}")
+                logger.info(f"Video generated successfully ({profile['name']}): {output_path}")
+                
+        except Exception as e:
+            logger.error(f"Error generating video: {e}")
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _encode(self, output_path: str, frames: Iterable[np.ndarray], frame_count: int,
+                audio_chunks: Optional[Iterator[np.ndarray]] = None,
+                width: Optional[int] = None, height: Optional[int] = None,
+                bitrate: Optional[str] = None, hls: bool = False) -> int:
+        """RGBのフレームと音声のサンプルをプロセス内でH.264/AACにエンコードし、MP4に書き出す
+
+        同じ配列のフレームが続く間は、yuv420pに変換済みのフレームのタイムスタンプだけを
+        進めて再利用する。frame_modeが'vfr'の場合は、同じ配列が続く間のフレームを出力せず
+        （最後のフレームは長さを保つため出力する）、表示時間はタイムスタンプの間隔で表す。
+        音声は映像の進行に合わせて多重化する。
+
+        hlsがTrueの場合はMP4の代わりにfMP4セグメントのHLSに書き出す。セグメントは
+        エンコードの進行に合わせて書き出され、プレイリストに追記される。
+
+        Args:
+            output_path: 出力ファイルのパス（hlsがTrueの場合はプレイリストのパス）
+            frames: (高さ, 幅, 3)のRGBフレームの反復子（frame_count個より多い分は使わない）
+            frame_count: エンコードするフレーム数
+            audio_chunks: AudioMixer.sample_chunksの戻り値（Noneの場合は音声なし）
+            width: 出力の幅（Noneの場合はself.width）
+            height: 出力の高さ（Noneの場合はself.height）
+            bitrate: 映像のビットレート（Noneの場合はエンコーダの既定値）
+            hls: Trueの場合はHLSに書き出す
+
+        Returns:
+            int: エンコードしたフレーム数
+        """
+        import av
+        
+        width = width or self.width
+        height = height or self.height
+        if hls:
+            container = av.open(output_path, mode='w', format='hls',
+                                options=dict(hls_options(self.hls_segment_seconds)))
+        else:
+            container = av.open(output_path, mode='w', options={'movflags': '+faststart'})
+        
+        try:
+            stream = container.add_stream(VIDEO_CODEC, rate=self.fps)
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = 'yuv420p'
+            stream.codec_context.time_base = Fraction(1, self.fps)
+            # ビットレートを指定しない場合は、ffmpegと同じく品質（CRF）基準でエンコードする
+            stream.codec_context.bit_rate = 0
+            options = self._encoder_options(bitrate)
+            if hls:
+                # fMP4の初期化セグメントにコーデックの設定を書き、セグメントの長さごとにキーフレームを入れる
+                options['flags'] = '+global_header'
+                if self.frame_mode == 'cfr':
+                    options['g'] = str(self.hls_segment_seconds * self.fps)
+            stream.options = options
+            
+            audio = None
+            if audio_chunks is not None:
+                audio = _AudioTrack(container, audio_chunks, self.audio_mixer.sample_rate,
+                                    self.audio_mixer.channels, self.render_profile["audio_bitrate"], hls)
+            
+            # RGBのフレームは1つだけ確保し、合成したフレームをそのバッファに直接書き込む
+            rgb_frame = av.VideoFrame(width, height, 'rgb24')
+            rgb_buffer = self._frame_buffer(rgb_frame)
+            source = None
+            encoded_frame = None
+            encoded = 0
+            
+            for index, frame in zip(range(frame_count), frames):
+                changed = frame is not source
+                if changed:
+                    rgb_buffer[:] = frame
+                    encoded_frame = rgb_frame.reformat(format='yuv420p')
+                    source = frame
+                if changed or self.frame_mode == 'cfr' or index == frame_count - 1:
+                    encoded_frame.pts = index
+                    container.mux(stream.encode(encoded_frame))
+                    encoded += 1
+                
+                if audio is not None:
+                    audio.write_until((index + 1) / self.fps)
+            
+            container.mux(stream.encode(None))
+            if audio is not None:
+                audio.close()
+            
+            return encoded
+            
+        finally:
+            container.close()
+    
+    def _encoder_options(self, bitrate: Optional[str] = None) -> Dict[str, str]:
+        """レンダリングプロファイルから、libx264のエンコーダのオプションを返す
+
+        Args:
+            bitrate: 映像のビットレート（Noneの場合はプロファイルのCRF）
+
+        Returns:
+            Dict[str, str]: エンコーダのオプション
+        """
+        profile = self.render_profile
+        options = {'preset': profile["preset"], 'g': str(gop_frames(profile, self.fps))}
+        if self.frame_mode == 'vfr':
+            # フレームがまばらなため、GOPの長さはフレーム数で指定し、静止画向けのチューニングを行う
+            options['g'] = '12'
+        if bitrate:
+            options['b'] = bitrate
+        else:
+            options['crf'] = str(profile["crf"])
+        if self.frame_mode == 'vfr':
+            options['tune'] = 'stillimage'
+        elif profile["tune"]:
+            options['tune'] = profile["tune"]
+        if profile["threads"]:
+            options['threads'] = str(profile["threads"])
+        return options
+    
+    @staticmethod
+    def _frame_buffer(frame) -> np.ndarray:
+        """RGBのフレームのバッファを、コピーせずに(高さ, 幅, 3)の配列として参照する
+
+        行末のパディング（line_size）を除いた範囲を返す。
+
+        Args:
+            frame: rgb24のav.VideoFrame
+
+        Returns:
+            np.ndarray: フレームのバッファに書き込める配列
+        """
+        plane = frame.planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(frame.height, plane.line_size)
+        return rows[:, :frame.width * 3].reshape(frame.height, frame.width, 3)
+    
+    def _composited_frames(self, compositor: StreamingCompositor) -> Iterator[np.ndarray]:
+        """合成したフレームを出力のフレームレートで時刻順に返す
+
+        Args:
+            compositor: スライドと字幕の合成
+
+        Yields:
+            np.ndarray: (高さ, 幅, 3)のRGBフレーム（表示中の画像が変わらない間は同じ配列）
+        """
+        index = 0
+        while True:
+            yield compositor.frame(index / self.fps)
+            index += 1
+    
+    def _subtitled_frames(self, frames: Iterator[np.ndarray],
+                          compositor: StreamingCompositor) -> Iterator[np.ndarray]:
+        """デコードしたフレームに字幕を重ねて時刻順に返す
+
+        元のフレームと表示中の字幕がどちらも変わらない間は、前に返した配列をそのまま返す。
+
+        Args:
+            frames: _decoded_framesの戻り値
+            compositor: 字幕だけを持つ合成
+
+        Yields:
+            np.ndarray: (高さ, 幅, 3)のRGBフレーム
+        """
+        source = None
+        active = None
+        subtitled = None
+        for index, frame in enumerate(frames):
+            t = index / self.fps
+            overlays = compositor.overlay_index.active(t)
+            if frame is not source or overlays != active:
+                subtitled = compositor.overlay(frame.copy(), t)
+                source = frame
+                active = overlays
+            yield subtitled
+    
+    def _decoded_frames(self, video_path: str) -> Iterator[np.ndarray]:
+        """動画をデコードし、出力のフレームレートと解像度で時刻順にフレームを返す
+
+        動画より後の時刻では最後のフレームを返し続ける。
+
+        Args:
+            video_path: 動画ファイルのパス
+
+        Yields:
+            np.ndarray: (高さ, 幅, 3)のRGBフレーム（元の動画の同じフレームが続く間は同じ配列）
+        """
+        import av
+        
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            decoded = container.decode(stream)
+            
+            current = next(decoded, None)
+            if current is None:
+                raise ValueError(f"No video frames in {video_path}")
+            upcoming = next(decoded, None)
+            array = None
+            index = 0
+            
+            while True:
+                t = index / self.fps
+                while upcoming is not None and upcoming.time is not None and upcoming.time <= t:
+                    current, upcoming = upcoming, next(decoded, None)
+                    array = None
+                
+                # 出力に使うフレームだけをRGBに変換する
+                if array is None:
+                    array = current.to_ndarray(width=self.width, height=self.height, format='rgb24')
+                yield array
+                index += 1
+    
+    def _subtitle_rasters(self, subtitles: List[Dict], width: int, height: int,
+                          font_size: int, font_color: str) -> List[str]:
+        """字幕画像をキャッシュから取得し、キャッシュにないものだけを描画する
+
+        Args:
+            subtitles: 字幕情報のリスト
+            width: 動画の幅（字幕の折り返し幅の基準）
+            height: 動画の高さ
+            font_size: フォントサイズ（短辺1080pxの動画での値）
+            font_color: フォント色
+
+        Returns:
+            List[str]: subtitlesと同じ順序の字幕画像のパスリスト
+        """
+        specs = [
+            SubtitleRasterCache.make_spec(
+                subtitle["text"],
+                self.font_path,
+                self._scaled_font_size(font_size, width, height),
+                font_color,
+                wrap_width=width * 0.9,  # 幅を動画の90%に設定
+                max_height=height * SUBTITLE_MAX_HEIGHT_RATIO
+            )
+            for subtitle in subtitles
+        ]
+        return self.subtitle_cache.rasterize(specs)
+    
+    def _scaled_font_size(self, font_size: int, width: Optional[int] = None,
+                          height: Optional[int] = None) -> int:
+        """字幕のフォントサイズを出力サイズに合わせて拡大・縮小する
+
+        フォントサイズは短辺1080pxの動画を基準とした値として扱う。
+
+        Args:
+            font_size: 短辺1080pxの動画でのフォントサイズ
+            width: 出力の幅（Noneの場合はself.width）
+            height: 出力の高さ（Noneの場合はself.height）
+
+        Returns:
+            int: 出力サイズでのフォントサイズ
+        """
+        return max(1, round(font_size * min(width or self.width, height or self.height) / 1080))
+    
+    def _plan_timeline(self, audio_paths: Union[List[Dict], Timeline],
+                       intro_audio_path: Optional[str] = None,
+                       image_paths: Optional[List[str]] = None,
+                       slide_duration: float = 5.0) -> Timeline:
+        """ナレーション音声の長さを取得し、字幕とスライドのタイムラインを作成する
+
+        audio_pathsがタイムラインの場合はそのまま使い、スライドが未決定の場合のみ
+        複製したタイムラインで決定する（渡されたタイムラインは変更しない）。
+
+        Args:
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            image_paths: スライドの画像ファイルのパスリスト（Noneの場合はスライドを決定しない）
+            slide_duration: 1枚あたりの表示時間（秒）
+
+        Returns:
+            Timeline: タイムライン
+        """
+        if isinstance(audio_paths, Timeline):
+            timeline = audio_paths
+        else:
+            timeline = Timeline(self.audio_mixer.sample_rate, self.timeline_fps)
+            
+            # イントロ音声がある場合は先頭に追加（字幕は最初のコメント）
+            if intro_audio_path:
+                intro_text = audio_paths[0].get("text") if audio_paths else None
+                timeline.add_narration(intro_audio_path, self._audio_duration(intro_audio_path), intro_text)
+            
+            # 各音声ファイルを追加
+            for audio_info in audio_paths:
+                timeline.add_narration(audio_info["path"], self._audio_duration(audio_info["path"]),
+                                       audio_info.get("text"))
+        
+        if image_paths is not None and not timeline.slide_paths:
+            if timeline is audio_paths:
+                timeline = timeline.copy()
+            timeline.schedule_slides(image_paths, slide_duration, self.slide_mode, self.comments_per_slide)
+        
+        return timeline
+    
+    def _audio_duration(self, path: str) -> float:
+        """音声ファイルの長さを取得する
+
+        ヘッダから長さを取得できない形式の場合のみPyAVでコンテナを開く。
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        try:
+            return self.duration_index.get(path)
+        except ValueError:
+            return self._probe_duration(path)
+    
+    @staticmethod
+    def _probe_duration(path: str) -> float:
+        """PyAVでメディアファイルの長さを取得する
+
+        Args:
+            path: メディアファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        import av
+        
+        with av.open(path) as container:
+            if container.duration is None:
+                raise ValueError(f"Could not determine duration of {path}")
+            return container.duration / av.time_base
+    
+    @staticmethod
+    def _has_audio(path: str) -> bool:
+        """メディアファイルに音声トラックがあるかどうかを返す"""
+        import av
+        
+        with av.open(path) as container:
+            return len(container.streams.audio) > 0
+    
+    @staticmethod
+    def _output_path(directory: str, output_filename: Optional[str], prefix: str) -> str:
+        """出力ファイルのパスを作成する
+
+        Args:
+            directory: 出力ディレクトリ
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            prefix: 自動生成するファイル名の接頭辞
+
+        Returns:
+            str: 出力ファイルのパス
+        """
+        # 出力ファイル名が指定されていない場合は自動生成
+        if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
+            timestamp = int(time.time())
+            output_filename = f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+        
+        # 拡張子がない場合は追加
+        if not output_filename.endswith('.mp4'):
+            output_filename += '.mp4'
+        
+        return os.path.join(directory, output_filename)
+
+class _AudioTrack:
+    """AudioMixerのサンプルをAACのフレーム単位に区切ってエンコードし、多重化するクラス"""
+    
+    def __init__(self, container, chunks: Iterator[np.ndarray], sample_rate: int, channels: int,
+                 bitrate: str = '128k', global_header: bool = False):
+        """初期化
+
+        Args:
+            container: 出力先のav.container.OutputContainer
+            chunks: AudioMixer.sample_chunksの戻り値
+            sample_rate: サンプリング周波数
+            channels: チャンネル数
+            bitrate: 音声のビットレート
+            global_header: Trueの場合はコーデックの設定をストリームのヘッダに書く（fMP4のHLSに必要）
+        """
+        self.container = container
+        self.chunks = chunks
+        self.sample_rate = sample_rate
+        self.layout = 'stereo' if channels == 2 else 'mono'
+        self.stream = container.add_stream(AUDIO_CODEC, rate=sample_rate)
+        self.stream.options = {'b': bitrate, 'flags': '+global_header'} if global_header else {'b': bitrate}
+        self.stream.codec_context.layout = self.layout
+        self.stream.codec_context.format = 'fltp'
+        
+        # AACのフレームに満たない残りのサンプル（平面形式）
+        self.pending = np.zeros((channels, 0), dtype=np.float32)
+        self.samples = 0
+        self.exhausted = False
+    
+    def write_until(self, seconds: Optional[float]) -> None:
+        """指定の時刻までの音声をエンコードする
+
+        Args:
+            seconds: 時刻（秒、Noneの場合は最後まで）
+        """
+        target = None if seconds is None else int(seconds * self.sample_rate)
+        while not self.exhausted and (target is None or self.samples + self.pending.shape[1] < target):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            # チャンクの配列は次の合成に再利用されるため、平面形式に転置してコピーしておく
+            self.pending = np.concatenate([self.pending, chunk.T], axis=1)
+        
+        while self.pending.shape[1] >= AAC_FRAME_SAMPLES:
+            self._write(self.pending[:, :AAC_FRAME_SAMPLES])
+            self.pending = self.pending[:, AAC_FRAME_SAMPLES:]
+    
+    def close(self) -> None:
+        """残りの音声をエンコードし、エンコーダを終了する"""
+        self.write_until(None)
+        if self.pending.shape[1]:
+            self._write(self.pending)
+            self.pending = self.pending[:, :0]
+        self.container.mux(self.stream.encode(None))
+    
+    def _write(self, samples: np.ndarray) -> None:
+        """(チャンネル数, サンプル数)の平面形式のサンプルを1フレームとしてエンコードする"""
+        import av
+        
+        frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(samples), format='fltp', layout=self.layout)
+        frame.sample_rate = self.sample_rate
+        frame.pts = self.samples
+        self.samples += samples.shape[1]
+        self.container.mux(self.stream.encode(frame))
@@ -0,0 +1,202 @@
+"""
+完成した動画のキャッシュモジュール
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from .subtitle_cache import evict_lru_files
+from .timeline import Timeline
+
+logger = logging.getLogger(__name__)
+
+# ファイルの内容のハッシュ（パス・サイズ・更新時刻が同じ間は再計算しない）
+# サーバーは常駐するため、最近使ったものから上限の件数だけ保持する
+FILE_HASH_MEMO_SIZE = 4096
+_file_hashes: 'OrderedDict[Tuple[str, int, int], str]' = OrderedDict()
+_file_hashes_lock = threading.Lock()
+
+def hash_file(path: str) -> str:
+    """ファイルの内容のハッシュを計算する
+
+    Args:
+        path: ファイルのパス
+
+    Returns:
+        str: SHA-256
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            _file_hashes.move_to_end(memo_key)
+            return _file_hashes[memo_key]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest.hexdigest()
+        while len(_file_hashes) > FILE_HASH_MEMO_SIZE:
+            _file_hashes.popitem(last=False)
+    return digest.hexdigest()
+
+class RenderCache:
+    """完成した動画のディスクキャッシュクラス
+
+    画像・音声・BGMの内容のハッシュ、タイミング、字幕のスタイル、エンコード設定を
+    まとめた入力の記述をキーにして動画を保存する。キャッシュにある場合は
+    ハードリンク（別のファイルシステムの場合はコピー）で出力先に配置するだけで済む。
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 max_age_seconds: Optional[float] = 7 * 24 * 60 * 60):
+        """初期化
+
+        Args:
+            cache_dir: キャッシュの保存ディレクトリ
+            max_bytes: キャッシュの合計サイズの上限（バイト）
+            max_age_seconds: 最終利用からこの秒数を過ぎた動画を削除する（Noneの場合は無期限）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        
+        # キャッシュディレクトリが存在しない場合は作成
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def describe(image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                 intro_audio_path: Optional[str], bgm_path: Optional[str],
+                 slide_duration: float, **settings) -> Dict:
+        """動画の入力の記述を作成する
+
+        ファイルはパスではなく内容のハッシュで記述するため、同じ内容のファイルであれば
+        別のセッションからのリクエストでも同じ記述になる。タイムラインの場合は
+        ナレーションとスライドの位置（サンプル・フレーム単位）も記述に含める。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス
+            bgm_path: BGMファイルのパス
+            slide_duration: 1枚あたりの表示時間（秒）
+            **settings: 字幕のスタイルやエンコード設定など、出力に影響するその他の設定
+
+        Returns:
+            Dict: 入力の記述
+        """
+        if isinstance(audio_paths, Timeline):
+            audio = [
+                {"hash": hash_file(path), "text": text or "", "start": start, "length": length}
+                for path, text, start, length in audio_paths.entries()
+            ]
+        else:
+            audio = [
+                {"hash": hash_file(audio["path"]), "text": audio.get("text", "")}
+                for audio in audio_paths
+            ]
+        
+        description = {
+            "images": [hash_file(path) for path in image_paths],
+            "audio": audio,
+            "intro": hash_file(intro_audio_path) if intro_audio_path else None,
+            "bgm": hash_file(bgm_path) if bgm_path else None,
+            "slide_duration": slide_duration,
+            "settings": settings,
+        }
+        if isinstance(audio_paths, Timeline):
+            description["timeline"] = {
+                "sample_rate": audio_paths.sample_rate,
+                "fps": audio_paths.fps,
+                "slides": [audio_paths.slide_starts.tolist(), audio_paths.slide_lengths.tolist()],
+            }
+        
+        return description
+    
+    @staticmethod
+    def make_key(description: Dict) -> str:
+        """入力の記述からキャッシュキーを作成する
+
+        Args:
+            description: 入力の記述
+
+        Returns:
+            str: キャッシュキー（SHA-256）
+        """
+        canonical = json.dumps(description, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def fetch(self, key: str, output_path: str) -> Optional[str]:
+        """キャッシュ済みの動画を出力先に配置する
+
+        Args:
+            key: キャッシュキー
+            output_path: 出力ファイルのパス
+
+        Returns:
+            Optional[str]: 出力ファイルのパス（キャッシュにない場合はNone）
+        """
+        path = self._path_for(key)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            # 最終利用時刻を更新（LRU削除と期限切れの判定に使用）
+            os.utime(path)
+            self._link(path, output_path)
+        except OSError as e:
+            logger.warning(f"Failed to use cached render {key}: {e}")
+            return None
+        
+        logger.info(f"Render cache hit: {key}")
+        return output_path
+    
+    def store(self, key: str, video_path: str) -> str:
+        """生成した動画をキャッシュに登録する
+
+        Args:
+            key: キャッシュキー
+            video_path: 生成した動画ファイルのパス
+
+        Returns:
+            str: キャッシュ内のファイルのパス
+        """
+        path = self._path_for(key)
+        self._link(video_path, path)
+        self.evict(keep={path})
+        return path
+    
+    def evict(self, keep: Optional[set] = None) -> None:
+        """期限切れの動画を削除し、合計サイズが上限を超えている場合は最終利用が古いものから削除する
+
+        Args:
+            keep: 削除しないファイルのパス
+        """
+        evict_lru_files(self.cache_dir, self.max_bytes, keep, extension='.mp4',
+                        max_age_seconds=self.max_age_seconds)
+    
+    @staticmethod
+    def _link(source: str, destination: str) -> None:
+        """ファイルをハードリンクで配置する（できない場合はコピー）
+
+        同じinodeを共有するため、出力先のファイルは上書きせずに削除してから書き直すこと。
+        """
+        temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copy2(source, temp_path)
+        os.replace(temp_path, destination)
+    
+    def _path_for(self, key: str) -> str:
+        """キャッシュキーに対応するファイルパスを返す"""
+        return os.path.join(self.cache_dir, f"{key}.mp4")
@@ -0,0 +1,180 @@
+"""
+動画生成の段階ごとの計測モジュール
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windowsでは使用できない
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 段階の実行中にメモリ使用量を読み取る間隔（秒）
+RSS_SAMPLE_INTERVAL = 0.05
+
+class RenderMetrics:
+    """動画生成の段階ごとの計測クラス
+
+    段階ごとに経過時間・CPU時間（終了済みの子プロセスのffmpegやワーカーを含む）・
+    エンコードしたフレーム数・出力サイズ・段階の実行中の最大メモリ使用量と増減を記録する。
+    """
+    
+    def __init__(self):
+        """初期化"""
+        self.stages: List[Dict] = []
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """段階を計測する
+
+        withブロック内で戻り値の辞書の"frames"と"output_bytes"を設定すると、
+        それらも記録される。例外が発生した場合も、そこまでの計測結果を記録する。
+
+        Args:
+            name: 段階の名前
+
+        Yields:
+            Dict: 段階の計測結果
+        """
+        record = {"name": name, "frames": 0, "output_bytes": 0}
+        wall_start = time.perf_counter()
+        cpu_start = self._cpu_seconds()
+        sampler = _RssSampler()
+        
+        try:
+            yield record
+        except BaseException:
+            record["failed"] = True
+            raise
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 3)
+            record["cpu_seconds"] = round(self._cpu_seconds() - cpu_start, 3)
+            record.update(sampler.stop())
+            record.update(self._children_max_rss_mb())
+            self.stages.append(record)
+            
+            logger.info(
+                f"Stage {name}: wall {record['wall_seconds']:.2f}s, cpu {record['cpu_seconds']:.2f}s, "
+                f"frames {record['frames']}, output {record['output_bytes']} bytes"
+            )
+    
+    def to_dict(self) -> Dict:
+        """計測結果を辞書として返す
+
+        Returns:
+            Dict: JSONに変換できる計測結果
+        """
+        return {
+            "stages": [dict(stage) for stage in self.stages],
+            "total_wall_seconds": round(sum(stage["wall_seconds"] for stage in self.stages), 3),
+            "total_cpu_seconds": round(sum(stage["cpu_seconds"] for stage in self.stages), 3),
+            "total_frames": sum(stage["frames"] for stage in self.stages),
+        }
+    
+    @staticmethod
+    def file_size(path: Optional[str]) -> int:
+        """ファイルサイズを返す（存在しない場合は0）
+
+        Args:
+            path: ファイルのパス
+
+        Returns:
+            int: ファイルサイズ（バイト）
+        """
+        if path and os.path.exists(path):
+            return os.path.getsize(path)
+        return 0
+    
+    @staticmethod
+    def _cpu_seconds() -> float:
+        """自プロセスと終了済みの子プロセスのCPU時間の合計を返す"""
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+    
+    @staticmethod
+    def _children_max_rss_mb() -> Dict:
+        """終了済みの子プロセスのうち、最もメモリを使ったものの最大メモリ使用量を返す
+
+        ru_maxrssはサーバーの起動からの値で、段階ごとの値ではない（実行中の子プロセスも含まない）。
+        """
+        if resource is None:
+            return {}
+        
+        # ru_maxrssはLinuxではKB、macOSではバイト単位
+        unit = 1 if sys.platform == 'darwin' else 1024
+        children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+        return {"children_lifetime_max_rss_mb": round(children_rss / (1024 * 1024), 1)}
+
+def _current_rss() -> Optional[int]:
+    """自プロセスの現在の常駐メモリ量を返す（/procがない環境ではNone）
+
+    Returns:
+        Optional[int]: 常駐メモリ量（バイト）
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+class _RssSampler:
+    """段階の実行中に自プロセスの常駐メモリ量を定期的に読み取り、最大値を保持するクラス
+
+    ru_maxrssはプロセスの起動からの最大値のため、常駐するサーバーでは前のリクエストの値になる。
+    段階の開始から終了までだけを計測するため、別スレッドで/proc/self/statmを読み取る。
+    """
+    
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        """初期化（計測を開始する）
+
+        Args:
+            interval: 読み取る間隔（秒）
+        """
+        self.interval = interval
+        self.start_rss = _current_rss()
+        self.peak_rss = self.start_rss
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.start_rss is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> Dict:
+        """計測を終了し、段階の実行中の最大メモリ使用量と、開始時からの増減を返す
+
+        Returns:
+            Dict: 計測結果（/procがない環境では空）
+        """
+        if self._thread is None:
+            return {}
+        
+        self._stopped.set()
+        self._thread.join()
+        end_rss = self._sample()
+        return {
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+            "rss_delta_mb": round((end_rss - self.start_rss) / (1024 * 1024), 1),
+        }
+    
+    def _run(self) -> None:
+        """終了するまで一定の間隔でメモリ使用量を読み取る"""
+        while not self._stopped.wait(self.interval):
+            self._sample()
+    
+    def _sample(self) -> int:
+        """現在のメモリ使用量を読み取り、最大値を更新する
+
+        Returns:
+            int: 現在の常駐メモリ量（バイト）
+        """
+        rss = _current_rss() or self.peak_rss
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
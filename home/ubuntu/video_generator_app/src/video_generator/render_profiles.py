@@ -0,0 +1,213 @@
+"""
+動画のレンダリングプロファイル（エンコード設定）モジュール
+"""
+from typing import Dict, List, Optional
+
+# 映像・音声のコーデック（すべてのエンジンとプロファイルで共通）
+VIDEO_CODEC = 'libx264'
+AUDIO_CODEC = 'aac'
+
+# x264のプリセットとチューニング（速い順）
+X264_PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast',
+                'medium', 'slow', 'slower', 'veryslow', 'placebo')
+X264_TUNES = ('film', 'animation', 'grain', 'stillimage', 'fastdecode', 'zerolatency')
+
+# 組み込みのレンダリングプロファイル
+# draftはファイルサイズが大きくなる代わりに速くエンコードし、archiveは時間をかけて高画質で小さくする
+BUILTIN_RENDER_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 23, "gop_seconds": 2.0, "tune": None,
+              "threads": 0, "audio_bitrate": "96k"},
+    "standard": {"preset": "medium", "crf": 23, "gop_seconds": 10.0, "tune": "stillimage",
+                 "threads": 0, "audio_bitrate": "128k"},
+    "archive": {"preset": "veryslow", "crf": 18, "gop_seconds": 10.0, "tune": "stillimage",
+                "threads": 0, "audio_bitrate": "192k"},
+}
+
+# 指定がない場合に使うプロファイル
+DEFAULT_RENDER_PROFILE = "standard"
+
+def make_render_profile(name: str, preset: str = 'medium', crf: int = 23, gop_seconds: float = 10.0,
+                        tune: Optional[str] = None, threads: int = 0, audio_bitrate: str = '128k',
+                        width: Optional[int] = None, height: Optional[int] = None,
+                        fps: Optional[int] = None) -> Dict:
+    """レンダリングプロファイルを作成する
+
+    Args:
+        name: プロファイル名
+        preset: x264のプリセット
+        crf: 品質（0〜51、小さいほど高画質で大きい。ビットレートを指定した出力では使わない）
+        gop_seconds: キーフレームの最大間隔（秒）
+        tune: x264のチューニング（Noneの場合はなし）
+        threads: エンコードのスレッド数（0の場合はエンコーダが決定）
+        audio_bitrate: 音声のビットレート（'128k'など）
+        width: 出力動画の幅（Noneの場合はエンジンの設定を使う）
+        height: 出力動画の高さ（Noneの場合はエンジンの設定を使う）
+        fps: 出力動画のフレームレート（Noneの場合はエンジンの設定を使う）
+
+    Returns:
+        Dict: レンダリングプロファイル
+    """
+    if not name or not name.replace('-', '').replace('_', '').isalnum():
+        raise ValueError(f"Invalid render profile name: {name!r}")
+    if preset not in X264_PRESETS:
+        raise ValueError(f"Render profile {name} has an unsupported preset: {preset}")
+    if tune is not None and tune not in X264_TUNES:
+        raise ValueError(f"Render profile {name} has an unsupported tune: {tune}")
+    if not 0 <= crf <= 51:
+        raise ValueError(f"Render profile {name} must have a CRF between 0 and 51: {crf}")
+    if gop_seconds <= 0 or threads < 0 or (fps is not None and fps <= 0):
+        raise ValueError(f"Render profile {name} has an invalid GOP length, thread count or frame rate")
+    if (width is None) != (height is None):
+        raise ValueError(f"Render profile {name} must specify both width and height")
+    if width is not None and (width <= 0 or height <= 0 or width % 2 or height % 2):
+        raise ValueError(f"Render profile {name} must have a positive even size: {width}x{height}")
+    
+    return {
+        "name": name,
+        "preset": preset,
+        "crf": int(crf),
+        "gop_seconds": float(gop_seconds),
+        "tune": tune,
+        "threads": int(threads),
+        "audio_bitrate": audio_bitrate,
+        "width": width,
+        "height": height,
+        "fps": fps,
+    }
+
+def parse_render_profiles(text: str) -> Dict[str, Dict]:
+    """'名前[:キー=値...]'をカンマ区切りで並べた文字列から、組み込みに追加・上書きしたプロファイルを作成する
+
+    キーはpreset・crf・gop（秒）・tune・threads・audio（音声のビットレート）・size（幅x高さ）・fps・base
+    （設定を引き継ぐプロファイル、省略時は同名の組み込みプロファイルかstandard）。
+
+    例: 'fast:preset=veryfast:crf=26,archive:preset=slower,uhd:base=archive:size=3840x2160'
+
+    Args:
+        text: レンダリングプロファイルの記述（空の場合は組み込みのプロファイルのみ）
+
+    Returns:
+        Dict[str, Dict]: プロファイル名とレンダリングプロファイルの辞書
+    """
+    profiles = {name: make_render_profile(name, **settings) for name, settings in BUILTIN_RENDER_PROFILES.items()}
+    
+    seen = set()
+    for item in (text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        
+        name, *fields = item.split(':')
+        if name in seen:
+            raise ValueError(f"Duplicate render profile names: {text!r}")
+        seen.add(name)
+        
+        options = {}
+        for field in fields:
+            key, separator, value = field.partition('=')
+            if not separator or not value:
+                raise ValueError(f"Invalid render profile field {field!r}: {item!r}")
+            options[key.strip().lower()] = value.strip()
+        
+        base = options.pop('base', name if name in profiles else DEFAULT_RENDER_PROFILE)
+        if base not in profiles:
+            raise ValueError(f"Unknown base render profile {base!r}: {item!r}")
+        settings = {key: value for key, value in profiles[base].items() if key != "name"}
+        
+        try:
+            for key, value in options.items():
+                if key == 'size':
+                    settings["width"], settings["height"] = (int(part) for part in value.lower().split('x'))
+                elif key in ('preset', 'tune'):
+                    settings[key] = None if value.lower() == 'none' else value
+                elif key in ('crf', 'threads', 'fps'):
+                    settings[key] = int(value)
+                elif key == 'gop':
+                    settings["gop_seconds"] = float(value)
+                elif key == 'audio':
+                    settings["audio_bitrate"] = value
+                else:
+                    raise ValueError(f"Unknown render profile field {key!r}")
+        except ValueError as e:
+            raise ValueError(f"Invalid render profile {item!r}: {e}")
+        
+        profiles[name] = make_render_profile(name, **settings)
+    
+    return profiles
+
+def get_render_profile(name: Optional[str] = None, text: str = '') -> Dict:
+    """名前でレンダリングプロファイルを取得する
+
+    Args:
+        name: プロファイル名（Noneの場合はDEFAULT_RENDER_PROFILE）
+        text: 組み込みに追加するプロファイルの記述（parse_render_profilesの形式）
+
+    Returns:
+        Dict: レンダリングプロファイル
+    """
+    profiles = parse_render_profiles(text)
+    name = name or DEFAULT_RENDER_PROFILE
+    if name not in profiles:
+        raise ValueError(f"Unknown render profile: {name} (available: {', '.join(profiles)})")
+    return profiles[name]
+
+def gop_frames(profile: Dict, fps: float) -> int:
+    """キーフレームの最大間隔をフレーム数で返す
+
+    Args:
+        profile: レンダリングプロファイル
+        fps: 出力動画のフレームレート
+
+    Returns:
+        int: キーフレームの最大間隔（フレーム数）
+    """
+    return max(1, int(round(profile["gop_seconds"] * fps)))
+
+def x264_params(profile: Dict, fps: float, bitrate: Optional[str] = None,
+                keyframe_interval: Optional[int] = None, tune: Optional[str] = None) -> List[str]:
+    """レート制御・GOP・チューニングのffmpegの引数を返す（コーデック・プリセット・スレッド数は含まない）
+
+    moviepyのwrite_videofileではffmpeg_paramsに渡す。
+
+    Args:
+        profile: レンダリングプロファイル
+        fps: 出力動画のフレームレート
+        bitrate: 映像のビットレート（指定した場合はCRFの代わりに使う）
+        keyframe_interval: キーフレームの最大間隔（フレーム数、Noneの場合はプロファイルのGOPの長さ）
+        tune: チューニング（Noneの場合はプロファイルの設定）
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    args = ['-b:v', bitrate] if bitrate else ['-crf', str(profile["crf"])]
+    args += ['-g', str(keyframe_interval or gop_frames(profile, fps))]
+    tune = tune or profile["tune"]
+    if tune:
+        args += ['-tune', tune]
+    return args
+
+def video_encoder_args(profile: Dict, fps: float, bitrate: Optional[str] = None,
+                       keyframe_interval: Optional[int] = None, tune: Optional[str] = None) -> List[str]:
+    """映像エンコードのffmpegの引数を返す
+
+    ブラウザで再生できるようyuv420pを使う。引数はx264_paramsと同じ。
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    args = ['-c:v', VIDEO_CODEC, '-preset', profile["preset"], '-pix_fmt', 'yuv420p']
+    args += x264_params(profile, fps, bitrate, keyframe_interval, tune)
+    if profile["threads"]:
+        args += ['-threads', str(profile["threads"])]
+    return args
+
+def audio_encoder_args(profile: Dict) -> List[str]:
+    """音声エンコードのffmpegの引数を返す
+
+    Args:
+        profile: レンダリングプロファイル
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    return ['-c:a', AUDIO_CODEC, '-b:a', profile["audio_bitrate"]]
@@ -0,0 +1,251 @@
+"""
+動画の区間ごとの並列レンダリングモジュール
+"""
+import os
+import json
+import uuid
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .ffmpeg_utils import run_command, write_concat_list
+
+logger = logging.getLogger(__name__)
+
+def split_timeline(boundaries: List[float], total_duration: float, segment_count: int,
+                   fps: int) -> List[Tuple[float, float]]:
+    """コメントの境界で動画を区間に分割する
+
+    各区間の長さがなるべく均等になるように境界を選び、区間の端はフレーム単位に揃える。
+
+    Args:
+        boundaries: 区切りに使える時刻（各コメントの開始時刻）
+        total_duration: 動画全体の長さ（秒）
+        segment_count: 分割数
+        fps: フレームレート
+
+    Returns:
+        List[Tuple[float, float]]: (開始時刻, 終了時刻)のリスト
+    """
+    candidates = sorted({round(t * fps) / fps for t in boundaries if 0 < t < total_duration})
+    end_time = round(total_duration * fps) / fps
+    
+    cuts = []
+    for i in range(1, segment_count):
+        if not candidates:
+            break
+        target = total_duration * i / segment_count
+        cut = min(candidates, key=lambda t: abs(t - target))
+        if not cuts or cut > cuts[-1]:
+            cuts.append(cut)
+    
+    edges = [0.0] + cuts + [end_time]
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1) if edges[i + 1] > edges[i]]
+
+def split_at_boundaries(boundaries: List[float], total_duration: float, fps: int,
+                        comments_per_segment: int = 1) -> List[Tuple[float, float]]:
+    """comments_per_segment件ごとのコメントの境界で動画を区間に分割する
+
+    前回のレンダリングの区間を再利用する場合に使う。区切る位置はコメントの順番で決まるため、
+    1つのコメントを編集しても他の区間の境界（区間内の相対的な配置）は変わらない。
+    複数のコメントを1区間にまとめることで、エンコードの回数と区間の先頭のキーフレームを減らす。
+    区間の端はフレームに丸めずコメントの開始時刻のままにし、音声の長さがフレームの整数倍でなく
+    変わった場合も、以降の区間内の相対時刻が変わらないようにする（連結で使うフレーム数はsegment_framesで求める）。
+
+    Args:
+        boundaries: 区切りに使える時刻（各コメントの開始時刻、再生順）
+        total_duration: 動画全体の長さ（秒）
+        fps: フレームレート
+        comments_per_segment: 1区間にまとめるコメント数
+
+    Returns:
+        List[Tuple[float, float]]: (開始時刻, 終了時刻)のリスト
+    """
+    edges = [0.0]
+    for t in sorted(set(boundaries[::max(1, comments_per_segment)])):
+        # 前の境界と同じフレームに丸められる位置では区切らない（連結で使うフレームがない区間になるため）
+        if 0 < t < total_duration and round(t * fps) > round(edges[-1] * fps):
+            edges.append(t)
+    if len(edges) > 1 and round(total_duration * fps) <= round(edges[-1] * fps):
+        edges.pop()
+    edges.append(total_duration)
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1) if edges[i + 1] > edges[i]]
+
+def segment_frames(segments: List[Tuple[float, float]], fps: int) -> List[int]:
+    """split_at_boundariesの区間ごとに、連結で使うフレーム数を返す
+
+    区間の端をフレームに丸めた位置の差のため、合計は動画全体の長さをフレーム数にしたものと一致する。
+    区間はコメントの開始時刻から描画するため、各区間の映像は最大で半フレームずれる。
+
+    Args:
+        segments: (開始時刻, 終了時刻)のリスト
+        fps: フレームレート
+
+    Returns:
+        List[int]: 区間ごとのフレーム数
+    """
+    return [round(end * fps) - round(start * fps) for start, end in segments]
+
+def segment_key(spec: Dict) -> str:
+    """区間の入力からキーを作成する
+
+    スライド画像と字幕画像はどちらも内容のハッシュで名前が付いたキャッシュ上のファイルのため、
+    パスを比較すれば内容を比較したことになる。出力先とスレッド数は出力に影響しないため含めない。
+
+    Args:
+        spec: 区間の情報（render_segmentの引数）
+
+    Returns:
+        str: キー（SHA-256）
+    """
+    inputs = {k: v for k, v in spec.items() if k not in ("output_path", "threads")}
+    canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def clip_events(events: List[Tuple[str, float, float]], start: float, end: float) -> List[Tuple[str, float, float]]:
+    """区間に含まれるイベントを区間の先頭からの相対時刻に変換する
+
+    Args:
+        events: (ファイルパス, 開始時刻, 表示時間)のリスト
+        start: 区間の開始時刻（秒）
+        end: 区間の終了時刻（秒）
+
+    Returns:
+        List[Tuple[str, float, float]]: 区間内の(ファイルパス, 相対開始時刻, 表示時間)のリスト
+    """
+    clipped = []
+    for path, event_start, duration in events:
+        event_end = event_start + duration
+        if event_end <= start or event_start >= end:
+            continue
+        local_start = max(event_start, start) - start
+        local_end = min(event_end, end) - start
+        # 浮動小数点の誤差で同じ配置の区間が別の入力とみなされないよう丸める
+        # （境界で接するイベントが誤差で長さ0のまま含まれる場合は除く）
+        duration = round(local_end - local_start, 6)
+        if duration > 0:
+            clipped.append((path, round(local_start, 6), duration))
+    return clipped
+
+def render_segment(spec: Dict) -> str:
+    """1つの区間を音声なしの動画として書き出す
+
+    プロセスプールのワーカーから呼び出すため、モジュールレベルの関数として定義する。
+    全区間で同じエンコード設定を使うことで、後からストリームコピーで連結できる。
+
+    Args:
+        spec: 区間の情報
+            {
+                "output_path": "出力ファイルのパス",
+                "duration": 区間の長さ（秒）,
+                "size": (幅, 高さ),
+                "slides": [(画像パス, 相対開始時刻, 表示時間), ...],
+                "subtitles": [(字幕画像パス, 相対開始時刻, 表示時間), ...],
+                "fps": フレームレート,
+                "codec": 映像コーデック,
+                "preset": x264のプリセット,
+                "ffmpeg_params": レート制御・GOP・チューニングのffmpegの引数,
+                "threads": エンコードスレッド数,
+                "streaming": Trueの場合は画像を表示中の間だけ読み込んで合成する
+            }
+
+    Returns:
+        str: 書き出した動画ファイルのパス
+    """
+    from moviepy.editor import ImageClip, VideoClip
+    from .overlay_index import IndexedCompositeVideoClip
+    from .streaming_compositor import StreamingCompositor
+    
+    clips = []
+    if spec.get("streaming"):
+        compositor = StreamingCompositor(tuple(spec["size"]), spec["slides"], spec["subtitles"])
+        video = VideoClip(compositor.frame, duration=spec["duration"])
+        clips.append(compositor)
+    else:
+        for path, start, duration in spec["slides"]:
+            clips.append(ImageClip(path).set_start(start).set_duration(duration).set_position('center'))
+        for path, start, duration in spec["subtitles"]:
+            clips.append(
+                ImageClip(path, transparent=True)
+                .set_start(start)
+                .set_duration(duration)
+                .set_position(('center', 'bottom'))
+            )
+        
+        video = IndexedCompositeVideoClip(clips, size=spec["size"]).set_duration(spec["duration"])
+    
+    # 書き込み途中のファイルが再利用されないよう、一時ファイルに書いてから置き換える
+    root, extension = os.path.splitext(spec["output_path"])
+    temp_path = f"{root}.{uuid.uuid4().hex}.tmp{extension}"
+    
+    try:
+        video.write_videofile(
+            temp_path,
+            codec=spec["codec"],
+            preset=spec["preset"],
+            ffmpeg_params=spec["ffmpeg_params"],
+            fps=spec["fps"],
+            audio=False,
+            threads=spec["threads"],
+            logger=None
+        )
+        os.replace(temp_path, spec["output_path"])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        video.close()
+        for clip in clips:
+            clip.close()
+    
+    return spec["output_path"]
+
+def concat_segments(segment_paths: List[str], output_path: str, audio_path: Optional[str] = None,
+                    ffmpeg_binary: str = 'ffmpeg', audio_input_options: Optional[List[str]] = None,
+                    audio_chunks: Optional[Iterable[bytes]] = None, audio_codec: str = 'aac',
+                    work_dir: Optional[str] = None, frame_counts: Optional[List[int]] = None,
+                    fps: Optional[float] = None) -> str:
+    """区間ごとの動画をconcatデマルチプレクサで無劣化連結し、音声を多重化する
+
+    frame_countsを指定した場合は、各区間の先頭から指定のフレーム数だけを使い、残りのフレームは
+    ストリームコピーのまま除く（区間はBフレームを使わずにエンコードしておく必要がある）。
+
+    Args:
+        segment_paths: 区間の動画ファイルのパスリスト（再生順）
+        output_path: 出力ファイルのパス
+        audio_path: 多重化する音声ファイルのパス（Noneの場合は音声なし、'pipe:0'の場合はaudio_chunksを使用）
+        ffmpeg_binary: ffmpegの実行ファイル
+        audio_input_options: 音声入力のオプション（生PCMをパイプで渡す場合の形式指定など）
+        audio_chunks: 標準入力に書き込む音声データ
+        audio_codec: 音声コーデック（エンコード済みの音声をそのまま多重化する場合は'copy'）
+        work_dir: リストファイルを作成するディレクトリ（Noneの場合は区間の動画と同じディレクトリ。
+            複数のレンダリングが共有するディレクトリの区間を連結する場合は、ジョブごとのディレクトリを指定する）
+        frame_counts: 区間ごとに使うフレーム数（Noneの場合は区間の全体を使う）
+        fps: 区間のフレームレート（frame_countsを指定する場合に必要）
+
+    Returns:
+        str: 出力ファイルのパス
+    """
+    entries = [(path, None) for path in segment_paths]
+    outpoints = None
+    if frame_counts is not None:
+        # 次の区間はdurationの位置から始まる。outpointは丸め誤差で次のフレームを含めないよう半フレーム前にする
+        entries = [(path, frames / fps) for path, frames in zip(segment_paths, frame_counts)]
+        outpoints = [(frames - 0.5) / fps for frames in frame_counts]
+    list_path = write_concat_list(
+        entries,
+        os.path.join(work_dir or os.path.dirname(os.path.abspath(segment_paths[0])), "segments.ffconcat"),
+        outpoints=outpoints
+    )
+    
+    cmd = [ffmpeg_binary, '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_path:
+        cmd += (audio_input_options or []) + ['-i', audio_path, '-map', '0:v', '-map', '1:a', '-c:a', audio_codec]
+    cmd += ['-c:v', 'copy', '-movflags', '+faststart', output_path]
+    
+    try:
+        run_command(cmd, stdin_chunks=audio_chunks)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    
+    return output_path
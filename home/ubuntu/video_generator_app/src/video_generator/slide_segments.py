@@ -0,0 +1,206 @@
+"""
+スライド画像ごとのエンコード済み区間のキャッシュモジュール
+"""
+import os
+import json
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .subtitle_cache import evict_lru_files
+from .render_cache import hash_file
+from .ffmpeg_utils import run_command, write_concat_list
+
+logger = logging.getLogger(__name__)
+
+# 区間の形式のバージョン（エンコードのコマンドを変更した場合は更新してキャッシュを無効にする）
+SEGMENT_FORMAT = 'slide-1'
+
+# 区間のタイムスケール（ストリームコピーで連結するため、すべての区間で揃える）
+SEGMENT_TIMESCALE = 90000
+
+def encode_slide_segment(spec: Dict, output_path: str) -> str:
+    """正規化済みの画像1枚を、指定のフレーム数の静止画の区間としてエンコードする
+
+    プロセスプールのワーカーから呼び出すため、モジュールレベルの関数として定義する。
+    区間はIDRフレームから始まる独立したGOPで構成し、Bフレームを使わないため、
+    区間の境界がそのままGOPの境界になり、ストリームコピーで連結できる。
+
+    Args:
+        spec: 区間の条件（SlideSegmentCache.make_specの戻り値）
+        output_path: 出力するMP4ファイルのパス
+
+    Returns:
+        str: 出力したMP4ファイルのパス
+    """
+    # 書き込み途中のファイルが読まれないよう、一時ファイルに書いてから置き換える
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    cmd = [spec["ffmpeg_binary"], '-y', '-loop', '1', '-framerate', str(spec["fps"]),
+           '-i', spec["source_path"], '-frames:v', str(spec["frames"]),
+           '-vf', f"scale={spec['width']}:{spec['height']},setsar=1,format=yuv420p", '-an']
+    cmd += spec["encoder"]
+    cmd += ['-bf', '0', '-video_track_timescale', str(SEGMENT_TIMESCALE), '-f', 'mp4', temp_path]
+    
+    try:
+        run_command(cmd)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    return output_path
+
+class SlideSegmentCache:
+    """スライド画像ごとのエンコード済み区間のディスクキャッシュクラス
+
+    正規化済み画像の内容のハッシュ・出力サイズ・フレームレート・フレーム数・エンコード設定を
+    キーにして、画像1枚分の短いH.264の区間を保存する。スライドショーは区間を
+    concatデマルチプレクサでストリームコピーして組み立てるため、キャッシュにある画像は
+    再エンコードしない。同じ画像はセッションをまたいで再利用する。
+    """
+    
+    def __init__(self, cache_dir: str, ffmpeg_binary: str = 'ffmpeg',
+                 max_bytes: int = 2 * 1024 * 1024 * 1024, max_workers: Optional[int] = None):
+        """初期化
+
+        Args:
+            cache_dir: キャッシュの保存ディレクトリ
+            ffmpeg_binary: ffmpegの実行ファイル
+            max_bytes: キャッシュの合計サイズの上限（バイト）
+            max_workers: 区間を並列にエンコードするプロセス数（Noneの場合はCPU数）
+        """
+        self.cache_dir = cache_dir
+        self.ffmpeg_binary = ffmpeg_binary
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        
+        # キャッシュディレクトリが存在しない場合は作成
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def make_spec(self, image_path: str, frames: int, width: int, height: int, fps: int,
+                  encoder: List[str]) -> Dict:
+        """区間の条件を作成する
+
+        Args:
+            image_path: 正規化済み画像のパス
+            frames: 区間のフレーム数
+            width: 出力動画の幅
+            height: 出力動画の高さ
+            fps: 出力動画のフレームレート
+            encoder: 映像エンコードの引数（プリセット・ビットレートなど）
+
+        Returns:
+            Dict: 区間の条件
+        """
+        return {
+            "source_path": image_path,
+            "source_hash": hash_file(image_path),
+            "frames": int(frames),
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "encoder": list(encoder),
+            "ffmpeg_binary": self.ffmpeg_binary,
+            "format": SEGMENT_FORMAT,
+        }
+    
+    @staticmethod
+    def make_key(spec: Dict) -> str:
+        """区間の条件からキャッシュキーを作成する
+
+        画像のパスとffmpegの実行ファイルは含めず、内容と出力の条件が同じ区間は同じキーになる。
+
+        Args:
+            spec: 区間の条件
+
+        Returns:
+            str: キャッシュキー（SHA-256）
+        """
+        canonical = json.dumps(
+            {k: v for k, v in spec.items() if k not in ("source_path", "ffmpeg_binary")}, sort_keys=True
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def segments(self, slides: List[Tuple[str, int]], width: int, height: int, fps: int,
+                 encoder: List[str]) -> List[str]:
+        """スライドごとの区間を取得し、キャッシュにないものはまとめてエンコードする
+
+        Args:
+            slides: (正規化済み画像のパス, フレーム数)のリスト（再生順）
+            width: 出力動画の幅
+            height: 出力動画の高さ
+            fps: 出力動画のフレームレート
+            encoder: 映像エンコードの引数
+
+        Returns:
+            List[str]: slidesと同じ順序の区間のパスリスト
+        """
+        paths = []
+        missing = {}
+        
+        for image_path, frames in slides:
+            spec = self.make_spec(image_path, frames, width, height, fps, encoder)
+            key = self.make_key(spec)
+            path = self._path_for(key)
+            if os.path.exists(path):
+                # 最終利用時刻を更新（LRU削除に使用）
+                os.utime(path)
+            else:
+                missing[key] = (spec, path)
+            paths.append(path)
+        
+        if missing:
+            logger.info(f"Encoding {len(missing)} slide segments ({len(slides) - len(missing)} cached)")
+            jobs = list(missing.values())
+            
+            if len(jobs) == 1 or self.max_workers == 1:
+                for spec, path in jobs:
+                    encode_slide_segment(spec, path)
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                    list(executor.map(encode_slide_segment,
+                                      [spec for spec, _ in jobs],
+                                      [path for _, path in jobs]))
+            
+            evict_lru_files(self.cache_dir, self.max_bytes, keep=set(paths), extension='.mp4')
+        
+        return paths
+    
+    def assemble(self, segment_paths: List[str], output_path: str, work_dir: str) -> str:
+        """区間をconcatデマルチプレクサでストリームコピーして1つの動画にする
+
+        Args:
+            segment_paths: 区間のパスリスト（再生順）
+            output_path: 出力ファイルのパス
+            work_dir: リストファイルの保存ディレクトリ（ジョブごとのディレクトリ）
+
+        Returns:
+            str: 出力ファイルのパス
+        """
+        run_command([self.ffmpeg_binary, '-y', '-f', 'concat', '-safe', '0',
+                     '-i', self.concat_list(segment_paths, work_dir),
+                     '-c', 'copy', '-movflags', '+faststart', output_path])
+        return output_path
+    
+    @staticmethod
+    def concat_list(segment_paths: List[str], work_dir: str) -> str:
+        """区間を連結するconcatデマルチプレクサのリストファイルを作成する
+
+        Args:
+            segment_paths: 区間のパスリスト（再生順）
+            work_dir: リストファイルの保存ディレクトリ（ジョブごとのディレクトリ）
+
+        Returns:
+            str: リストファイルのパス
+        """
+        if not segment_paths:
+            raise ValueError("At least one slide segment is required")
+        
+        return write_concat_list([(path, None) for path in segment_paths],
+                                 os.path.join(work_dir, "slide_segments.ffconcat"))
+    
+    def _path_for(self, key: str) -> str:
+        """キャッシュキーに対応するファイルパスを返す"""
+        return os.path.join(self.cache_dir, f"{key}.mp4")
@@ -0,0 +1,136 @@
+"""
+タイムラインを時刻順に合成するストリーミング合成モジュール
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .overlay_index import OverlayIndex
+
+logger = logging.getLogger(__name__)
+
+class StreamingCompositor:
+    """スライドと字幕を時刻順に合成するフレーム生成クラス
+
+    画像は表示区間に入った時点で読み込み（ファイルは読み込み後すぐに閉じる）、
+    表示区間を出た時点で解放する。コメント数にかかわらず、同時に保持する画像は
+    表示中のものだけになる。表示中の画像が変わらない間は前のフレームをそのまま返す。
+    """
+    
+    def __init__(self, size: Tuple[int, int], slides: List[Tuple[str, float, float]],
+                 overlays: List[Tuple[str, float, float]]):
+        """初期化
+
+        Args:
+            size: 出力動画の(幅, 高さ)
+            slides: (画像パス, 開始時刻, 表示時間)のリスト（画面中央に配置）
+            overlays: (字幕画像パス, 開始時刻, 表示時間)のリスト（下部中央に透過合成）
+        """
+        self.size = size
+        self.slides = slides
+        self.overlays = overlays
+        self.slide_index = OverlayIndex([(start, start + duration) for _, start, duration in slides])
+        self.overlay_index = OverlayIndex([(start, start + duration) for _, start, duration in overlays])
+        
+        self._images: Dict[Tuple[str, int], np.ndarray] = {}
+        self._last_key: Optional[Tuple] = None
+        self._last_frame: Optional[np.ndarray] = None
+        
+        # 読み込んだ画像の延べ数と、同時に保持した画像の最大数（計測用）
+        self.loaded_images = 0
+        self.peak_images = 0
+    
+    def frame(self, t: float) -> np.ndarray:
+        """時刻tのフレームを合成する
+
+        Args:
+            t: 時刻（秒）
+
+        Returns:
+            np.ndarray: (高さ, 幅, 3)のRGBフレーム
+        """
+        slides = self.slide_index.active(t)
+        overlays = self.overlay_index.active(t)
+        key = (tuple(slides), tuple(overlays))
+        if key == self._last_key:
+            return self._last_frame
+        
+        # 表示区間を出た画像を解放する
+        wanted = {('slide', i) for i in slides} | {('overlay', i) for i in overlays}
+        for image_key in list(self._images):
+            if image_key not in wanted:
+                del self._images[image_key]
+        
+        width, height = self.size
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        for i in slides:
+            image = self._load(('slide', i), self.slides[i][0], 'RGB')
+            self._paste(frame, image, (width - image.shape[1]) // 2, (height - image.shape[0]) // 2)
+        for i in overlays:
+            image = self._load(('overlay', i), self.overlays[i][0], 'RGBA')
+            self._paste(frame, image, (width - image.shape[1]) // 2, height - image.shape[0])
+        
+        self.peak_images = max(self.peak_images, len(self._images))
+        self._last_key = key
+        self._last_frame = frame
+        return frame
+    
+    def overlay(self, frame: np.ndarray, t: float) -> np.ndarray:
+        """既存の動画のフレームに時刻tの字幕を重ねる（スライドは使わない）
+
+        Args:
+            frame: (高さ, 幅, 3)のRGBフレーム（字幕はこの配列に直接書き込む）
+            t: 時刻（秒）
+
+        Returns:
+            np.ndarray: 字幕を重ねたフレーム
+        """
+        overlays = self.overlay_index.active(t)
+        wanted = {('overlay', i) for i in overlays}
+        for image_key in list(self._images):
+            if image_key not in wanted:
+                del self._images[image_key]
+        
+        height, width = frame.shape[:2]
+        for i in overlays:
+            image = self._load(('overlay', i), self.overlays[i][0], 'RGBA')
+            self._paste(frame, image, (width - image.shape[1]) // 2, height - image.shape[0])
+        
+        self.peak_images = max(self.peak_images, len(self._images))
+        return frame
+    
+    def close(self) -> None:
+        """保持している画像をすべて解放する"""
+        self._images.clear()
+        self._last_key = None
+        self._last_frame = None
+    
+    def _load(self, image_key: Tuple[str, int], path: str, mode: str) -> np.ndarray:
+        """画像を読み込む（表示中の間は読み込んだものを使う）"""
+        image = self._images.get(image_key)
+        if image is None:
+            with Image.open(path) as source:
+                image = np.asarray(source.convert(mode))
+            self._images[image_key] = image
+            self.loaded_images += 1
+        return image
+    
+    @staticmethod
+    def _paste(frame: np.ndarray, image: np.ndarray, x: int, y: int) -> None:
+        """画像をフレームに重ねる（RGBAの場合はアルファで合成し、はみ出す部分は切り取る）"""
+        frame_height, frame_width = frame.shape[:2]
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + image.shape[1], frame_width), min(y + image.shape[0], frame_height)
+        if left >= right or top >= bottom:
+            return
+        
+        region = image[top - y:bottom - y, left - x:right - x]
+        target = frame[top:bottom, left:right]
+        if region.shape[2] == 4:
+            alpha = region[:, :, 3:4].astype(np.float32) / 255.0
+            blended = region[:, :, :3] * alpha + target * (1.0 - alpha)
+            target[:] = blended.astype(np.uint8)
+        else:
+            target[:] = region
@@ -0,0 +1,214 @@
+"""
+字幕画像のキャッシュモジュール
+"""
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from .text_renderer import render_text
+
+logger = logging.getLogger(__name__)
+
+# 描画方法を変えた場合に古い字幕画像を再利用しないよう、キャッシュキーに含める
+RENDERER = 'pillow-1'
+
+def rasterize_subtitle(spec: Dict, output_path: str) -> str:
+    """字幕テキストを透過PNGとして書き出す
+
+    Args:
+        spec: 字幕の描画条件（SubtitleRasterCache.make_specの戻り値）
+        output_path: 出力するPNGファイルのパス
+
+    Returns:
+        str: 出力したPNGファイルのパス
+    """
+    image = render_text(spec)
+    
+    # 書き込み途中のファイルが読まれないよう、一時ファイルに書いてから置き換える
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        image.save(temp_path, format='PNG')
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    return output_path
+
+def evict_lru_files(cache_dir: str, max_bytes: int, keep: Optional[set] = None,
+                    extension: str = '.png', max_age_seconds: Optional[float] = None) -> None:
+    """キャッシュの合計サイズが上限を超えている場合、最終利用が古いファイルから削除する
+
+    Args:
+        cache_dir: キャッシュの保存ディレクトリ
+        max_bytes: キャッシュの合計サイズの上限（バイト）
+        keep: 削除しないファイルのパス（現在のレンダリングで使用中のもの）
+        extension: 対象とするファイルの拡張子
+        max_age_seconds: 最終利用からこの秒数を過ぎたファイルはサイズにかかわらず削除する（Noneの場合は無期限）
+    """
+    keep = keep or set()
+    entries = []
+    total = 0
+    expire_before = time.time() - max_age_seconds if max_age_seconds is not None else None
+    
+    for name in os.listdir(cache_dir):
+        if not name.endswith(extension):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if expire_before is not None and stat.st_mtime < expire_before and path not in keep:
+            try:
+                os.remove(path)
+                continue
+            except OSError:
+                pass
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    
+    if total <= max_bytes:
+        return
+    
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
+
+class SubtitleRasterCache:
+    """字幕画像のディスクキャッシュクラス
+
+    テキスト・フォント・サイズ・色・縁取り・折り返し幅のハッシュをキーにして
+    字幕画像をPNGで保存し、合計サイズが上限を超えたら最終利用が古い順に削除する。
+    字幕はプロセス内でPillowを使って描画するため、作成にプロセスを起動しない。
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        """初期化
+
+        Args:
+            cache_dir: キャッシュの保存ディレクトリ
+            max_bytes: キャッシュの合計サイズの上限（バイト）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        
+        # キャッシュディレクトリが存在しない場合は作成
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_spec(text: str, font_path: Optional[str], font_size: int, color: str,
+                  wrap_width: int, stroke_color: str = 'black', stroke_width: int = 2,
+                  max_height: Optional[int] = None) -> Dict:
+        """字幕の描画条件を作成する
+
+        Args:
+            text: 字幕テキスト
+            font_path: フォントのパス
+            font_size: フォントサイズ
+            color: フォント色
+            wrap_width: 折り返し幅（ピクセル）
+            stroke_color: 縁取りの色
+            stroke_width: 縁取りの幅
+            max_height: 字幕の高さの上限（ピクセル、超える場合はフォントサイズを縮小する）
+
+        Returns:
+            Dict: 描画条件
+        """
+        return {
+            "text": text,
+            "font_path": font_path,
+            "font_size": font_size,
+            "color": color,
+            "stroke_color": stroke_color,
+            "stroke_width": stroke_width,
+            "wrap_width": int(wrap_width),
+            "max_height": int(max_height) if max_height else None,
+            "renderer": RENDERER,
+        }
+    
+    @staticmethod
+    def make_key(spec: Dict) -> str:
+        """描画条件からキャッシュキーを作成する
+
+        Args:
+            spec: 描画条件
+
+        Returns:
+            str: キャッシュキー（SHA-256）
+        """
+        canonical = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def get(self, spec: Dict) -> Optional[str]:
+        """キャッシュ済みの字幕画像を取得する
+
+        Args:
+            spec: 描画条件
+
+        Returns:
+            Optional[str]: 字幕画像のパス（キャッシュにない場合はNone）
+        """
+        path = self._path_for(self.make_key(spec))
+        if not os.path.exists(path):
+            return None
+        
+        # 最終利用時刻を更新（LRU削除に使用）
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        
+        return path
+    
+    def rasterize(self, specs: List[Dict]) -> List[str]:
+        """字幕画像を取得し、キャッシュにないものはまとめて作成する
+
+        Args:
+            specs: 描画条件のリスト
+
+        Returns:
+            List[str]: specsと同じ順序の字幕画像のパスリスト
+        """
+        paths = []
+        missing = {}
+        
+        for spec in specs:
+            key = self.make_key(spec)
+            path = self.get(spec)
+            if path is None:
+                path = self._path_for(key)
+                missing[key] = (spec, path)
+            paths.append(path)
+        
+        if missing:
+            logger.info(f"Rasterizing {len(missing)} subtitles ({len(specs) - len(missing)} cached)")
+            for spec, path in missing.values():
+                rasterize_subtitle(spec, path)
+            
+            self.evict(keep=set(paths))
+        
+        return paths
+    
+    def evict(self, keep: Optional[set] = None) -> None:
+        """合計サイズが上限を超えている場合、最終利用が古いものから削除する
+
+        Args:
+            keep: 削除しないファイルのパス（現在のレンダリングで使用中のもの）
+        """
+        evict_lru_files(self.cache_dir, self.max_bytes, keep)
+    
+    def _path_for(self, key: str) -> str:
+        """キャッシュキーに対応するファイルパスを返す"""
+        return os.path.join(self.cache_dir, f"{key}.png")
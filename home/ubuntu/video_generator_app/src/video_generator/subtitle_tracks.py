@@ -0,0 +1,152 @@
+"""
+ソフト字幕（字幕トラック・サイドカーファイル）の作成モジュール
+"""
+import os
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+from .ffmpeg_utils import run_command
+
+logger = logging.getLogger(__name__)
+
+def format_timestamp(seconds: float, separator: str = '.') -> str:
+    """秒数を字幕ファイルの時刻表記（HH:MM:SS.mmm）に変換する
+
+    Args:
+        seconds: 秒数
+        separator: 秒とミリ秒の区切り文字（SRTは','、WebVTTは'.'）
+
+    Returns:
+        str: 時刻表記
+    """
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+def format_srt(subtitles: List[Dict]) -> str:
+    """字幕情報をSRT形式に変換する
+
+    Args:
+        subtitles: 字幕情報のリスト
+            [
+                {"text": "字幕1", "start": 0, "duration": 5},
+                ...
+            ]
+
+    Returns:
+        str: SRT形式の字幕
+    """
+    blocks = []
+    for i, subtitle in enumerate(subtitles, 1):
+        start = subtitle["start"]
+        end = start + subtitle["duration"]
+        blocks.append(
+            f"{i}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n"
+            f"{_clean_text(subtitle['text'])}\n"
+        )
+    return "\n".join(blocks)
+
+def format_webvtt(subtitles: List[Dict]) -> str:
+    """字幕情報をWebVTT形式に変換する
+
+    Args:
+        subtitles: 字幕情報のリスト
+
+    Returns:
+        str: WebVTT形式の字幕
+    """
+    blocks = ["WEBVTT\n"]
+    for subtitle in subtitles:
+        start = subtitle["start"]
+        end = start + subtitle["duration"]
+        # WebVTTでは'<'と'&'がタグと文字参照の開始になるためエスケープする
+        text = _clean_text(subtitle["text"]).replace('&', '&amp;').replace('<', '&lt;')
+        blocks.append(f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n")
+    return "\n".join(blocks)
+
+def sidecar_paths(video_path: str) -> Dict[str, str]:
+    """動画に対応するサイドカー字幕ファイルのパスを返す
+
+    Args:
+        video_path: 動画ファイルのパス
+
+    Returns:
+        Dict[str, str]: 形式（'srt'、'vtt'）とファイルパスの辞書
+    """
+    root, _ = os.path.splitext(video_path)
+    return {"srt": f"{root}.srt", "vtt": f"{root}.vtt"}
+
+def write_sidecars(subtitles: List[Dict], video_path: str) -> Dict[str, str]:
+    """同じ字幕情報からSRTとWebVTTのサイドカーファイルを動画の隣に作成する
+
+    Args:
+        subtitles: 字幕情報のリスト
+        video_path: 動画ファイルのパス
+
+    Returns:
+        Dict[str, str]: 形式（'srt'、'vtt'）とファイルパスの辞書
+    """
+    paths = sidecar_paths(video_path)
+    contents = {"srt": format_srt(subtitles), "vtt": format_webvtt(subtitles)}
+    
+    for kind, path in paths.items():
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(contents[kind])
+    
+    return paths
+
+def subtitle_track_args(input_index: int, language: str = 'jpn') -> List[str]:
+    """SRTの入力をmov_textの字幕トラックとして多重化する出力引数を返す
+
+    Args:
+        input_index: SRTファイルの入力番号
+        language: 字幕トラックの言語（ISO 639-2）
+
+    Returns:
+        List[str]: ffmpegの引数
+    """
+    return ['-map', f"{input_index}:0", '-c:s', 'mov_text', '-metadata:s:s:0', f"language={language}"]
+
+def mux_subtitle_track(video_path: str, srt_path: str, output_path: Optional[str] = None,
+                       ffmpeg_binary: str = 'ffmpeg', language: str = 'jpn') -> str:
+    """映像と音声をストリームコピーしたまま、SRTをmov_textの字幕トラックとして多重化する
+
+    再エンコードしないため、字幕を焼き込む場合と比べてファイルの読み書きの時間しかかからない。
+
+    Args:
+        video_path: 動画ファイルのパス
+        srt_path: SRTファイルのパス
+        output_path: 出力ファイルのパス（Noneの場合はvideo_pathを置き換える）
+        ffmpeg_binary: ffmpegの実行ファイル
+        language: 字幕トラックの言語（ISO 639-2）
+
+    Returns:
+        str: 出力ファイルのパス
+    """
+    output_path = output_path or video_path
+    root, extension = os.path.splitext(output_path)
+    temp_path = f"{root}.{uuid.uuid4().hex}.tmp{extension}"
+    
+    # 既存の字幕トラックは入れ替える
+    cmd = [ffmpeg_binary, '-y', '-i', video_path, '-i', srt_path,
+           '-map', '0:v', '-map', '0:a?', '-c:v', 'copy', '-c:a', 'copy']
+    cmd += subtitle_track_args(1, language)
+    cmd += ['-movflags', '+faststart', temp_path]
+    
+    try:
+        run_command(cmd)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    logger.info(f"Subtitle track added: {output_path}")
+    return output_path
+
+def _clean_text(text: str) -> str:
+    """字幕のテキストから空行を除く（空行はSRT/WebVTTのブロックの区切りになるため）"""
+    lines = [line.strip() for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    return '\n'.join(line for line in lines if line) or ' '
@@ -0,0 +1,286 @@
+"""
+字幕テキストの組版・描画モジュール
+
+PillowのFreeTypeバインディングを使ってプロセス内で字幕を描画する。
+ImageMagickのプロセスを起動しないため、字幕の準備はPythonのCPU処理だけで完結する。
+"""
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# 行頭に置かない文字（閉じ括弧・句読点・小書きの仮名・長音符など）
+NO_LINE_START = set(
+    "、。，．,.・：；:;？！?!ー―‐～…‥゛゜"
+    "」』）］｝〕〉》】〙〗)]}>"
+    "ぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶㇰㇱㇲㇳㇴㇵㇶㇷㇸㇹㇺㇻㇼㇽㇾㇿ"
+    "々〻ゝゞヽヾ"
+)
+
+# 行末に置かない文字（開き括弧）
+NO_LINE_END = set("「『（［｛〔〈《【〘〖([{<")
+
+# 行末からはみ出して置いてよい文字（句読点のぶら下げ）
+HANGING = set("、。，．,.")
+
+# font_pathが指定されていない場合に試す日本語フォント
+FALLBACK_FONTS = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W4.ttc",
+    "C:/Windows/Fonts/meiryo.ttc",
+)
+
+# 行間（フォントサイズに対する比率）
+LINE_SPACING = 0.15
+
+# 字幕の高さの上限（動画の高さに対する比率、超える場合はフォントサイズを縮小する）
+SUBTITLE_MAX_HEIGHT_RATIO = 0.4
+
+@lru_cache(maxsize=16)
+def resolve_font_path(font_path: Optional[str]) -> Optional[str]:
+    """読み込めるフォントのパスを返す
+
+    Args:
+        font_path: フォントのパス（Noneの場合は日本語フォントを探す）
+
+    Returns:
+        Optional[str]: フォントのパス（見つからない場合はNone）
+    """
+    for path in ((font_path,) if font_path else FALLBACK_FONTS):
+        try:
+            ImageFont.truetype(path, 12)
+            return path
+        except OSError:
+            continue
+    
+    logger.warning(f"Font not found ({font_path or 'no Japanese font installed'}), using Pillow default font")
+    return None
+
+@lru_cache(maxsize=64)
+def load_font(font_path: Optional[str], font_size: int) -> ImageFont.FreeTypeFont:
+    """フォントを読み込む（同じフォントとサイズの組はキャッシュしたものを返す）
+
+    Args:
+        font_path: フォントのパス（Noneの場合は日本語フォントを探す）
+        font_size: フォントサイズ
+
+    Returns:
+        ImageFont.FreeTypeFont: フォント
+    """
+    path = resolve_font_path(font_path)
+    if path:
+        return ImageFont.truetype(path, font_size)
+    
+    try:
+        return ImageFont.load_default(font_size)
+    except TypeError:  # Pillow 10.1より前はサイズを指定できない
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=65536)
+def glyph_advance(font_path: Optional[str], font_size: int, char: str) -> float:
+    """1文字の送り幅を返す（フォント・サイズ・文字ごとにキャッシュする）
+
+    Args:
+        font_path: フォントのパス
+        font_size: フォントサイズ
+        char: 文字
+
+    Returns:
+        float: 送り幅（ピクセル）
+    """
+    return load_font(font_path, font_size).getlength(char)
+
+def text_width(text: str, font_path: Optional[str], font_size: int) -> float:
+    """文字の送り幅の合計からテキストの幅を求める
+
+    Args:
+        text: テキスト
+        font_path: フォントのパス
+        font_size: フォントサイズ
+
+    Returns:
+        float: 幅（ピクセル）
+    """
+    return sum(glyph_advance(font_path, font_size, char) for char in text)
+
+def _split_units(text: str) -> List[str]:
+    """テキストを改行できる位置で区切る
+
+    日本語は1文字ごとに改行できる。英数字の単語は途中で改行せず、後続の空白を含めて1単位とする。
+    """
+    units = []
+    word = ''
+    for char in text:
+        if char.isascii() and not char.isspace() and char not in NO_LINE_START and char not in NO_LINE_END:
+            word += char
+            continue
+        if word:
+            units.append(word)
+            word = ''
+        if char == ' ' and units and units[-1][-1:].isascii():
+            units[-1] += char
+        else:
+            units.append(char)
+    if word:
+        units.append(word)
+    return units
+
+@lru_cache(maxsize=4096)
+def wrap_text(text: str, font_path: Optional[str], font_size: int, max_width: int) -> Tuple[str, ...]:
+    """禁則処理をしながらテキストを折り返す
+
+    行頭禁則の文字は前の文字と一緒に次の行へ送り（句読点は行末にぶら下げる）、
+    行末禁則の文字は次の行へ送る。折り返し結果はテキスト・フォント・サイズ・幅ごとにキャッシュする。
+
+    Args:
+        text: テキスト（改行を含む場合は段落ごとに折り返す）
+        font_path: フォントのパス
+        font_size: フォントサイズ
+        max_width: 折り返し幅（ピクセル）
+
+    Returns:
+        Tuple[str, ...]: 行のタプル
+    """
+    def width_of(units):
+        return sum(text_width(unit, font_path, font_size) for unit in units)
+    
+    lines = []
+    for paragraph in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        units = []
+        for unit in _split_units(paragraph.strip()):
+            # 折り返し幅より長い単語は文字単位で折り返す
+            if len(unit) > 1 and text_width(unit, font_path, font_size) > max_width:
+                units.extend(unit)
+            else:
+                units.append(unit)
+        
+        current: List[str] = []
+        for unit in units:
+            if current and width_of(current) + text_width(unit.rstrip(), font_path, font_size) > max_width:
+                if unit in HANGING:
+                    current.append(unit)
+                    continue
+                
+                carry = []
+                if unit[0] in NO_LINE_START:
+                    # 行頭禁則の文字が続く場合はまとめて、その前の1文字と一緒に送る
+                    while len(current) > 1 and current[-1][0] in NO_LINE_START:
+                        carry.insert(0, current.pop())
+                    if len(current) > 1:
+                        carry.insert(0, current.pop())
+                while len(current) > 1 and current[-1][-1] in NO_LINE_END:
+                    carry.insert(0, current.pop())
+                
+                lines.append(''.join(current).rstrip())
+                current = carry
+            current.append(unit)
+        
+        lines.append(''.join(current).rstrip())
+    
+    return tuple(lines)
+
+def line_height(font_path: Optional[str], font_size: int) -> int:
+    """行の高さ（行間を含む）を返す
+
+    Args:
+        font_path: フォントのパス
+        font_size: フォントサイズ
+
+    Returns:
+        int: 行の高さ（ピクセル）
+    """
+    ascent, descent = load_font(font_path, font_size).getmetrics()
+    return ascent + descent + int(round(font_size * LINE_SPACING))
+
+def layout_size(lines: Tuple[str, ...], font_path: Optional[str], font_size: int,
+                stroke_width: int = 0) -> Tuple[int, int]:
+    """折り返したテキストの描画サイズを返す
+
+    Args:
+        lines: 行のタプル
+        font_path: フォントのパス
+        font_size: フォントサイズ
+        stroke_width: 縁取りの幅
+
+    Returns:
+        Tuple[int, int]: (幅, 高さ)
+    """
+    width = max((text_width(line, font_path, font_size) for line in lines), default=0)
+    height = line_height(font_path, font_size) * len(lines)
+    return int(round(width)) + stroke_width * 2, height + stroke_width * 2
+
+def fit_font_size(text: str, font_path: Optional[str], font_size: int, max_width: int,
+                  max_height: Optional[int] = None, stroke_width: int = 0, min_size: int = 12) -> int:
+    """折り返したテキストが指定の高さに収まる最大のフォントサイズを二分探索で求める
+
+    文字の送り幅と折り返し結果はキャッシュされるため、探索の各段階での計測は
+    同じ文字の2回目以降は辞書の参照だけで済む。
+
+    Args:
+        text: テキスト
+        font_path: フォントのパス
+        font_size: フォントサイズの上限
+        max_width: 折り返し幅（ピクセル）
+        max_height: 高さの上限（ピクセル、Noneの場合はfont_sizeをそのまま返す）
+        stroke_width: 縁取りの幅
+        min_size: フォントサイズの下限
+
+    Returns:
+        int: フォントサイズ
+    """
+    def fits(size):
+        lines = wrap_text(text, font_path, size, max_width)
+        return layout_size(lines, font_path, size, stroke_width)[1] <= max_height
+    
+    if max_height is None or fits(font_size):
+        return font_size
+    
+    low, high = min(min_size, font_size), font_size
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def render_text(spec: Dict) -> Image.Image:
+    """字幕の描画条件からテキストを透過画像に描画する
+
+    画像の幅は折り返し幅とし、各行を中央揃えで描画する。
+
+    Args:
+        spec: 字幕の描画条件（SubtitleRasterCache.make_specの戻り値）
+
+    Returns:
+        Image.Image: RGBAの画像
+    """
+    font_path = spec["font_path"]
+    wrap_width = spec["wrap_width"]
+    stroke_width = spec["stroke_width"]
+    max_width = max(1, wrap_width - stroke_width * 2)
+    
+    font_size = fit_font_size(
+        spec["text"], font_path, spec["font_size"], max_width,
+        max_height=spec.get("max_height"), stroke_width=stroke_width
+    )
+    font = load_font(font_path, font_size)
+    lines = wrap_text(spec["text"], font_path, font_size, max_width)
+    _, height = layout_size(lines, font_path, font_size, stroke_width)
+    step = line_height(font_path, font_size)
+    
+    image = Image.new('RGBA', (wrap_width, max(1, height)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        x = (wrap_width - text_width(line, font_path, font_size)) / 2
+        draw.text(
+            (x, stroke_width + step * i), line, font=font, fill=spec["color"],
+            stroke_width=stroke_width, stroke_fill=spec["stroke_color"]
+        )
+    
+    return image
@@ -0,0 +1,330 @@
+"""
+動画のタイムラインモジュール
+"""
+import json
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# スライドの表示区間の決め方（schedule_slidesのmode）
+SLIDE_MODES = ('fixed', 'even', 'comments')
+
+class Timeline:
+    """ナレーション・字幕・スライドのタイミングを整数単位で保持するクラス
+
+    ナレーションの開始位置と長さはサンプル数、スライドはフレーム数で配列に保持し、
+    秒は参照時にだけ計算する。秒の浮動小数点を足し合わせないため、コメント数が多くても
+    開始時刻に誤差が蓄積しない。字幕はテキストのあるナレーションと同じ区間に表示する。
+    """
+    
+    __slots__ = ('sample_rate', 'fps', 'audio_paths', 'texts', 'audio_starts', 'audio_lengths',
+                 'slide_paths', 'slide_starts', 'slide_lengths')
+    
+    def __init__(self, sample_rate: int = 44100, fps: int = 24):
+        """初期化
+
+        Args:
+            sample_rate: ナレーションの位置の単位（1秒あたりのサンプル数）
+            fps: スライドの位置の単位（1秒あたりのフレーム数）
+        """
+        self.sample_rate = sample_rate
+        self.fps = fps
+        self.audio_paths: List[str] = []
+        self.texts: List[Optional[str]] = []
+        self.audio_starts = array('q')
+        self.audio_lengths = array('q')
+        self.slide_paths: List[str] = []
+        self.slide_starts = array('q')
+        self.slide_lengths = array('q')
+    
+    def __len__(self) -> int:
+        return len(self.audio_paths)
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Timeline) and self.to_dict() == other.to_dict()
+    
+    @property
+    def total_samples(self) -> int:
+        """ナレーション全体の長さ（サンプル数）"""
+        if not self.audio_starts:
+            return 0
+        return self.audio_starts[-1] + self.audio_lengths[-1]
+    
+    @property
+    def total_frames(self) -> int:
+        """動画全体の長さ（フレーム数、ナレーションがない場合はスライドの合計）"""
+        if self.audio_starts:
+            return self.samples_to_frames(self.total_samples)
+        if self.slide_starts:
+            return self.slide_starts[-1] + self.slide_lengths[-1]
+        return 0
+    
+    def output_frames(self, fps: Optional[int] = None) -> int:
+        """動画全体の長さを、指定のフレームレートでのフレーム数で返す
+
+        Args:
+            fps: 出力のフレームレート（Noneの場合はタイムラインのフレームレート）
+
+        Returns:
+            int: フレーム数（ナレーションがない場合はslide_framesの合計）
+        """
+        if fps is None or fps == self.fps:
+            return self.total_frames
+        if self.audio_starts:
+            return (self.total_samples * fps * 2 + self.sample_rate) // (self.sample_rate * 2)
+        return sum(self.slide_frames(fps))
+    
+    @property
+    def duration(self) -> float:
+        """ナレーション全体の長さ（秒）"""
+        return self.total_samples / self.sample_rate
+    
+    def samples_to_frames(self, samples: int) -> int:
+        """サンプル数を最も近いフレーム数に変換する
+
+        Args:
+            samples: サンプル数
+
+        Returns:
+            int: フレーム数
+        """
+        return (samples * self.fps * 2 + self.sample_rate) // (self.sample_rate * 2)
+    
+    def add_narration(self, path: str, duration: float, text: Optional[str] = None) -> None:
+        """ナレーションを末尾に追加する
+
+        Args:
+            path: 音声ファイルのパス
+            duration: 音声の長さ（秒）
+            text: 字幕テキスト（Noneの場合は字幕なし）
+        """
+        self.audio_starts.append(self.total_samples)
+        self.audio_lengths.append(int(round(duration * self.sample_rate)))
+        self.audio_paths.append(path)
+        self.texts.append(text)
+    
+    def schedule_slides(self, image_paths: List[str], slide_duration: float,
+                        mode: str = 'fixed', comments_per_slide: int = 0) -> None:
+        """スライドの表示区間をフレーム単位で決定する
+
+        modeが'fixed'の場合は1枚あたりslide_durationずつ表示する。ナレーションがある場合は、
+        最後のスライドをナレーションの終わりまで延長し、ナレーションより後のスライドは切り詰める。
+        'even'の場合はナレーション全体を画像の枚数で均等に分け、'comments'の場合は
+        comments_per_slide件のコメントごとに、コメントの境界で次の画像に切り替える。
+        ナレーションがない場合はどのモードでも'fixed'と同じになる。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            slide_duration: 1枚あたりの表示時間（秒、'fixed'の場合とナレーションがない場合に使用）
+            mode: 'fixed'、'even'、'comments'のいずれか
+            comments_per_slide: 'comments'の場合の1枚あたりのコメント数
+                （0の場合はすべてのコメントに画像が行き渡るように決定する）
+        """
+        if mode not in SLIDE_MODES:
+            raise ValueError(f"Unsupported slide mode: {mode}")
+        
+        self.slide_paths = []
+        self.slide_starts = array('q')
+        self.slide_lengths = array('q')
+        
+        total_frames = self.samples_to_frames(self.total_samples) if self.audio_starts else 0
+        if total_frames == 0 or mode == 'fixed' or not image_paths:
+            starts = self._fixed_slide_starts(len(image_paths), slide_duration, total_frames)
+        elif mode == 'even':
+            count = min(len(image_paths), total_frames)
+            starts = [i * total_frames // count for i in range(count)]
+        else:
+            per_slide = comments_per_slide or -(-len(self.audio_starts) // len(image_paths))
+            starts = []
+            for i in range(0, len(self.audio_starts), per_slide):
+                start = self.samples_to_frames(self.audio_starts[i])
+                # フレームに丸めると同じ位置になる短いコメントは、前のスライドに含める
+                if (not starts or start > starts[-1]) and start < total_frames:
+                    starts.append(start)
+            starts = starts[:len(image_paths)]
+        
+        if not starts:
+            return
+        
+        # 各スライドは次のスライドの開始まで表示し、最後のスライドはナレーションの終わりまで延長する
+        last_end = total_frames or starts[-1] + max(1, int(round(slide_duration * self.fps)))
+        for path, start, end in zip(image_paths, starts, starts[1:] + [last_end]):
+            self.slide_paths.append(path)
+            self.slide_starts.append(start)
+            self.slide_lengths.append(end - start)
+    
+    def _fixed_slide_starts(self, count: int, slide_duration: float, total_frames: int) -> List[int]:
+        """1枚あたりの表示時間が一定の場合のスライドの開始位置を返す（ナレーションより後のスライドは除く）"""
+        slide_frames = max(1, int(round(slide_duration * self.fps)))
+        starts = [i * slide_frames for i in range(count)]
+        if total_frames > 0:
+            starts = [start for start in starts if start < total_frames]
+        return starts
+    
+    def entries(self) -> Iterator[Tuple[str, Optional[str], int, int]]:
+        """ナレーションを順に返す
+
+        Returns:
+            Iterator[Tuple[str, Optional[str], int, int]]: (音声パス, 字幕テキスト, 開始位置, 長さ)（サンプル単位）の反復子
+        """
+        return zip(self.audio_paths, self.texts, self.audio_starts, self.audio_lengths)
+    
+    def narration(self) -> List[Tuple[str, float, float]]:
+        """ナレーションを秒単位で返す
+
+        Returns:
+            List[Tuple[str, float, float]]: (音声パス, 開始時刻, 長さ)のリスト
+        """
+        rate = self.sample_rate
+        return [(path, start / rate, length / rate) for path, _, start, length in self.entries()]
+    
+    def subtitles(self) -> List[Dict]:
+        """字幕情報を秒単位で返す
+
+        Returns:
+            List[Dict]: 字幕情報のリスト
+                [
+                    {"text": "字幕1", "start": 0, "duration": 5},
+                    ...
+                ]
+        """
+        rate = self.sample_rate
+        return [
+            {"text": text, "start": start / rate, "duration": length / rate}
+            for _, text, start, length in self.entries()
+            if text is not None
+        ]
+    
+    def slides(self, image_paths: Optional[List[str]] = None,
+               narration_aligned: bool = False) -> List[Tuple[str, float, float]]:
+        """スライドの表示区間を秒単位で返す
+
+        Args:
+            image_paths: スライドの画像を置き換えるパスリスト（出力サイズに正規化した画像など、
+                schedule_slidesに渡したものと同じ順序。Noneの場合は置き換えない）
+            narration_aligned: Trueの場合、ナレーションの開始位置（または終わり）をフレームに丸めた位置にある
+                スライドの境界は、丸める前のナレーションの時刻で返す（コメントの境界で区切った区間内の
+                相対時刻が、前のコメントの長さの変更で変わらないようにするため）
+
+        Returns:
+            List[Tuple[str, float, float]]: (画像パス, 開始時刻, 表示時間)のリスト
+        """
+        paths = self.slide_paths if image_paths is None else image_paths[:len(self.slide_paths)]
+        if len(paths) != len(self.slide_paths):
+            raise ValueError(f"Expected {len(self.slide_paths)} slide images, got {len(paths)}")
+        
+        if not narration_aligned:
+            return [
+                (path, start / self.fps, length / self.fps)
+                for path, start, length in zip(paths, self.slide_starts, self.slide_lengths)
+            ]
+        
+        exact = {}
+        for samples in list(self.audio_starts) + [self.total_samples]:
+            exact.setdefault(self.samples_to_frames(samples), samples / self.sample_rate)
+        
+        slides = []
+        for path, start, length in zip(paths, self.slide_starts, self.slide_lengths):
+            begin = exact.get(start, start / self.fps)
+            end = exact.get(start + length, (start + length) / self.fps)
+            slides.append((path, begin, end - begin))
+        return slides
+    
+    def slide_frames(self, fps: Optional[int] = None) -> List[int]:
+        """スライドの表示区間の長さを、指定のフレームレートでのフレーム数で返す
+
+        タイムラインと出力のフレームレートが異なる場合（24fpsで計画したタイムラインをプレビューで
+        使う場合など）は、区間の境界を換算してから長さを求めるため、合計は全体の長さを換算したものと一致する。
+
+        Args:
+            fps: 出力のフレームレート（Noneの場合はタイムラインのフレームレート）
+
+        Returns:
+            List[int]: スライドごとのフレーム数
+        """
+        if fps is None or fps == self.fps or not self.slide_starts:
+            return self.slide_lengths.tolist()
+        
+        # 境界を最も近いフレームに丸める（区間が0フレームにならないよう、最低1フレームずつ進める）
+        bounds = []
+        for start in list(self.slide_starts) + [self.slide_starts[-1] + self.slide_lengths[-1]]:
+            bound = (start * fps * 2 + self.fps) // (self.fps * 2)
+            bounds.append(max(bound, bounds[-1] + 1) if bounds else bound)
+        return [end - start for start, end in zip(bounds, bounds[1:])]
+    
+    def copy(self) -> 'Timeline':
+        """複製を返す
+
+        Returns:
+            Timeline: 配列を共有しない複製
+        """
+        return Timeline.from_dict(self.to_dict())
+    
+    def to_dict(self) -> Dict:
+        """JSONに変換できる辞書を返す
+
+        Returns:
+            Dict: 列ごとの配列で表したタイムライン
+        """
+        return {
+            "sample_rate": self.sample_rate,
+            "fps": self.fps,
+            "narration": {
+                "paths": list(self.audio_paths),
+                "texts": list(self.texts),
+                "starts": self.audio_starts.tolist(),
+                "lengths": self.audio_lengths.tolist(),
+            },
+            "slides": {
+                "paths": list(self.slide_paths),
+                "starts": self.slide_starts.tolist(),
+                "lengths": self.slide_lengths.tolist(),
+            },
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Timeline':
+        """to_dictの戻り値からタイムラインを復元する
+
+        Args:
+            data: to_dictの戻り値
+
+        Returns:
+            Timeline: タイムライン
+        """
+        timeline = cls(data["sample_rate"], data["fps"])
+        narration = data["narration"]
+        slides = data["slides"]
+        
+        if not len(narration["paths"]) == len(narration["texts"]) == len(narration["starts"]) == len(narration["lengths"]):
+            raise ValueError("Narration columns have different lengths")
+        if not len(slides["paths"]) == len(slides["starts"]) == len(slides["lengths"]):
+            raise ValueError("Slide columns have different lengths")
+        
+        timeline.audio_paths = list(narration["paths"])
+        timeline.texts = list(narration["texts"])
+        timeline.audio_starts = array('q', narration["starts"])
+        timeline.audio_lengths = array('q', narration["lengths"])
+        timeline.slide_paths = list(slides["paths"])
+        timeline.slide_starts = array('q', slides["starts"])
+        timeline.slide_lengths = array('q', slides["lengths"])
+        return timeline
+    
+    def to_json(self) -> str:
+        """JSON文字列に変換する
+
+        Returns:
+            str: JSON文字列
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+    
+    @classmethod
+    def from_json(cls, text: str) -> 'Timeline':
+        """JSON文字列からタイムラインを復元する
+
+        Args:
+            text: to_jsonの戻り値
+
+        Returns:
+            Timeline: タイムライン
+        """
+        return cls.from_dict(json.loads(text))
@@ -5,66 +5,231 @@ import os
 import logging
 import time
 import json
-from typing import Dict, List, Optional, Tuple
+import uuid
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Dict, List, Optional, Tuple, Union
 import subprocess
-from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips, CompositeAudioClip, CompositeVideoClip, TextClip
+from moviepy.config import get_setting
+
+try:
+    import fcntl
+except ImportError:  # Windowsでは使用できない
+    fcntl = None
+from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, VideoClip, concatenate_videoclips
+
+from .subtitle_cache import SubtitleRasterCache
+from .text_renderer import SUBTITLE_MAX_HEIGHT_RATIO
+from .overlay_index import IndexedCompositeVideoClip
+from .streaming_compositor import StreamingCompositor
+from .image_normalizer import ImageNormalizer
+from .render_metrics import RenderMetrics
+from .render_cache import RenderCache
+from .slide_segments import SlideSegmentCache
+from .audio_probe import DurationIndex
+from .timeline import Timeline, SLIDE_MODES
+from .subtitle_tracks import sidecar_paths, write_sidecars, mux_subtitle_track
+from .audio_mixer import AudioMixer
+from .render_profiles import (
+    VIDEO_CODEC, AUDIO_CODEC, get_render_profile, x264_params, video_encoder_args, audio_encoder_args
+)
+from .segment_renderer import (
+    split_timeline, split_at_boundaries, segment_frames, segment_key, clip_events, render_segment, concat_segments
+)
+from .ffmpeg_utils import (
+    run_command, write_concat_list, mux_tracks, keyframe_args, tee_output_args, package_hls, HLS_PLAYLIST_NAME
+)
 
 logger = logging.getLogger(__name__)
 
 class VideoGenerator:
     """diffusionstudio/coreを使用した動画生成クラス"""
     
-    def __init__(self, output_dir: str, temp_dir: str, font_path: Optional[str] = None):
+    def __init__(self, output_dir: str, temp_dir: str, font_path: Optional[str] = None,
+                 subtitle_cache_dir: Optional[str] = None,
+                 subtitle_cache_max_bytes: int = 512 * 1024 * 1024,
+                 max_concurrent_jobs: int = 1,
+                 segment_workers: Optional[int] = None,
+                 duration_index: Optional[DurationIndex] = None,
+                 bgm_duck_gain: float = 1.0,
+                 frame_mode: str = 'cfr',
+                 width: int = 1920, height: int = 1080,
+                 fps: int = 24, render_profile: Optional[Dict] = None,
+                 image_cache_dir: Optional[str] = None,
+                 image_cache_max_bytes: int = 1024 * 1024 * 1024,
+                 render_cache_dir: Optional[str] = None,
+                 render_cache_max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 render_cache_max_age: Optional[float] = 7 * 24 * 60 * 60,
+                 segment_cache_dir: Optional[str] = None,
+                 segment_comments: int = 20,
+                 hls_segment_seconds: int = 4,
+                 streaming_threshold: int = 300,
+                 slide_mode: str = 'fixed',
+                 comments_per_slide: int = 0,
+                 timeline_fps: Optional[int] = None,
+                 slide_segment_cache_dir: Optional[str] = None,
+                 slide_segment_cache_max_bytes: int = 2 * 1024 * 1024 * 1024):
         """初期化
 
         Args:
             output_dir: 動画ファイルの出力ディレクトリ
             temp_dir: 一時ファイルの保存ディレクトリ
             font_path: 字幕用フォントのパス（Noneの場合はデフォルト）
+            subtitle_cache_dir: 字幕画像キャッシュのディレクトリ（Noneの場合は一時ディレクトリ内）
+            subtitle_cache_max_bytes: 字幕画像キャッシュの合計サイズの上限（バイト）
+            max_concurrent_jobs: 同時に実行される動画生成ジョブ数（CPUコアの割り当てに使用）
+            segment_workers: 区間を並列レンダリングするプロセス数（Noneの場合はCPU数と同時ジョブ数から決定）
+            duration_index: 音声ファイルの長さのインデックス（Noneの場合は新規作成）
+            bgm_duck_gain: ナレーション中のBGMの音量倍率（1.0の場合はダッキングなし）
+            frame_mode: 'cfr'は固定フレームレート、'vfr'はスライドと字幕が変わる時だけフレームを出力する
+            width: 出力動画の幅（偶数）
+            height: 出力動画の高さ（偶数）
+            fps: 出力動画のフレームレート
+            render_profile: エンコード設定（get_render_profileの戻り値、Noneの場合は'standard'）
+            image_cache_dir: 正規化済み画像のキャッシュのディレクトリ（Noneの場合は一時ディレクトリ内）
+            image_cache_max_bytes: 正規化済み画像のキャッシュの合計サイズの上限（バイト）
+            render_cache_dir: 完成した動画のキャッシュのディレクトリ（Noneの場合はキャッシュしない）
+            render_cache_max_bytes: 完成した動画のキャッシュの合計サイズの上限（バイト）
+            render_cache_max_age: 完成した動画のキャッシュの保持期間（秒、最終利用から）
+            segment_cache_dir: 前回のレンダリングの区間ごとの動画を保持するディレクトリ
+                （セッションごとに指定する。Noneの場合は再利用しない）
+            segment_comments: segment_cache_dirを指定した場合に1区間にまとめるコメント数
+            hls_segment_seconds: HLSを出力する場合のセグメントの長さの目安（秒）
+            streaming_threshold: コメント数がこの数以上の場合は、スライドと字幕の画像を表示中の間だけ
+                読み込むストリーミング合成を使う（0の場合は常に使う）
+            slide_mode: スライドの表示区間の決め方（'fixed'は1枚あたりslide_durationずつ、
+                'even'はナレーション全体を均等に分け、'comments'はコメントの境界で切り替える）
+            comments_per_slide: slide_modeが'comments'の場合の1枚あたりのコメント数
+                （0の場合はすべてのコメントに画像が行き渡るように決定する）
+            timeline_fps: タイムラインを計画するフレームレート（Noneの場合はfps、プレビューで
+                本番と同じタイムラインを使う場合は本番のフレームレートを指定する）
+            slide_segment_cache_dir: スライド画像ごとのエンコード済み区間のキャッシュのディレクトリ
+                （Noneの場合は一時ディレクトリ内）
+            slide_segment_cache_max_bytes: スライド画像ごとの区間のキャッシュの合計サイズの上限（バイト）
         """
+        if frame_mode not in ('cfr', 'vfr'):
+            raise ValueError(f"Unsupported frame mode: {frame_mode}")
+        if slide_mode not in SLIDE_MODES:
+            raise ValueError(f"Unsupported slide mode: {slide_mode}")
+        
         self.output_dir = output_dir
         self.temp_dir = temp_dir
         self.font_path = font_path
+        self.frame_mode = frame_mode
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.render_profile = render_profile or get_render_profile()
+        self.streaming_threshold = streaming_threshold
+        self.slide_mode = slide_mode
+        self.comments_per_slide = comments_per_slide
+        self.timeline_fps = timeline_fps or fps
+        
+        # 直近のgenerate_videoの段階ごとの計測結果
+        self.metrics = RenderMetrics()
+        
+        # 1ジョブあたりに使えるCPUコア数
+        self.cores_per_job = max(1, (os.cpu_count() or 1) // max(1, max_concurrent_jobs))
+        self.segment_workers = segment_workers or self.cores_per_job
+        self.segment_cache_dir = segment_cache_dir
+        self.segment_comments = segment_comments
+        self.hls_segment_seconds = hls_segment_seconds
+        
+        # 音声の長さはヘッダから取得してインデックスに保持する
+        self.duration_index = duration_index if duration_index is not None else DurationIndex()
+        
+        # 音声はNumPyでPCMのまま合成する
+        self.audio_mixer = AudioMixer(
+            ffmpeg_binary=get_setting("FFMPEG_BINARY"),
+            duck_gain=bgm_duck_gain
+        )
         
         # 出力ディレクトリが存在しない場合は作成
         os.makedirs(output_dir, exist_ok=True)
         os.makedirs(temp_dir, exist_ok=True)
+        if segment_cache_dir:
+            os.makedirs(segment_cache_dir, exist_ok=True)
+        
+        # 字幕画像のキャッシュ（セッションをまたいで再利用する）
+        self.subtitle_cache = SubtitleRasterCache(
+            subtitle_cache_dir or os.path.join(temp_dir, "subtitle_cache"),
+            max_bytes=subtitle_cache_max_bytes
+        )
+        
+        # スライド画像は出力サイズに正規化してキャッシュする（合成時のリサイズを不要にする）
+        self.image_normalizer = ImageNormalizer(
+            image_cache_dir or os.path.join(temp_dir, "image_cache"),
+            width=width,
+            height=height,
+            max_bytes=image_cache_max_bytes,
+            max_workers=self.cores_per_job
+        )
+        
+        # スライドショーは画像ごとにエンコードした区間をキャッシュし、ストリームコピーで組み立てる
+        self.slide_segments = SlideSegmentCache(
+            slide_segment_cache_dir or os.path.join(temp_dir, "slide_segments"),
+            ffmpeg_binary=get_setting("FFMPEG_BINARY"),
+            max_bytes=slide_segment_cache_max_bytes,
+            max_workers=self.cores_per_job
+        )
+        
+        # 同じ入力の動画はレンダリングせずにキャッシュから返す
+        self.render_cache = None
+        if render_cache_dir:
+            self.render_cache = RenderCache(
+                render_cache_dir,
+                max_bytes=render_cache_max_bytes,
+                max_age_seconds=render_cache_max_age
+            )
     
     def create_slideshow(self, image_paths: List[str], slide_duration: float = 5.0, 
-                        output_filename: Optional[str] = None) -> str:
+                        output_filename: Optional[str] = None,
+                        timeline: Optional[Timeline] = None) -> str:
         """画像からスライドショー動画を作成する
 
+        timelineを指定した場合は、スライドの表示区間をナレーションからslide_modeに従って決定し、
+        ナレーションと同じ長さの動画を1回だけエンコードする（音声の追加時に切り詰めや最後のフレームの延長は不要になる）。
+        画像ごとにエンコードした区間をキャッシュから取得し、ストリームコピーで連結するため、
+        キャッシュにある画像は再エンコードしない。
+
         Args:
             image_paths: 画像ファイルのパスリスト
             slide_duration: 1枚あたりの表示時間（秒）
-            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            output_filename: 出力ファイル名（Noneの場合は自動生成、絶対パスの場合はそのパスに出力）
+            timeline: ナレーションのタイムライン（Noneの場合は1枚あたりslide_durationずつ表示する）
 
         Returns:
             str: 生成された動画ファイルのパス
         """
         # 出力ファイル名が指定されていない場合は自動生成
         if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
             timestamp = int(time.time())
-            output_filename = f"slideshow_{timestamp}.mp4"
+            output_filename = f"slideshow_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
         
         # 拡張子がない場合は追加
         if not output_filename.endswith('.mp4'):
             output_filename += '.mp4'
         
         output_path = os.path.join(self.temp_dir, output_filename)
+        work_dir = tempfile.mkdtemp(prefix="slideshow_", dir=self.temp_dir)
         
         try:
-            # 各画像からクリップを作成
-            clips = []
-            for img_path in image_paths:
-                clip = ImageClip(img_path).set_duration(slide_duration)
-                clips.append(clip)
+            # スライドの表示区間を決定
+            timeline = self._plan_timeline([] if timeline is None else timeline,
+                                           image_paths=image_paths, slide_duration=slide_duration)
             
-            # クリップを連結
-            video = concatenate_videoclips(clips, method="compose")
+            # 画像を出力サイズに正規化し、画像ごとの区間を取得（キャッシュにないものだけエンコード）
+            slides = timeline.slides(self.image_normalizer.normalize(image_paths))
+            segment_paths = self.slide_segments.segments(
+                [(path, length) for (path, _, _), length in zip(slides, timeline.slide_frames(self.fps))],
+                self.width, self.height, self.fps,
+                video_encoder_args(self.render_profile, self.fps)
+            )
             
-            # 動画を保存
-            video.write_videofile(output_path, codec='libx264', fps=24)
+            # 区間をストリームコピーで連結
+            self.slide_segments.assemble(segment_paths, output_path, work_dir)
             
             logger.info(f"Slideshow created successfully: {output_path}")
             return output_path
@@ -72,65 +237,54 @@ class VideoGenerator:
         except Exception as e:
             logger.error(f"Error creating slideshow: {e}")
             raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
     
-    def add_audio_to_video(self, video_path: str, audio_paths: List[str], 
+    def add_audio_to_video(self, video_path: str, audio_paths: Union[List[str], Timeline], 
                           bgm_path: Optional[str] = None, bgm_volume: float = 0.3,
                           output_filename: Optional[str] = None) -> str:
         """動画に音声とBGMを追加する
 
         Args:
             video_path: 元動画のパス
-            audio_paths: 音声ファイルのパスリスト
+            audio_paths: 音声ファイルのパスリスト、またはタイムライン
             bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
             bgm_volume: BGMの音量（0.0〜1.0）
-            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            output_filename: 出力ファイル名（Noneの場合は自動生成、絶対パスの場合はそのパスに出力）
 
         Returns:
             str: 生成された動画ファイルのパス
         """
         # 出力ファイル名が指定されていない場合は自動生成
         if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
             timestamp = int(time.time())
-            output_filename = f"video_with_audio_{timestamp}.mp4"
+            output_filename = f"video_with_audio_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
         
         # 拡張子がない場合は追加
         if not output_filename.endswith('.mp4'):
             output_filename += '.mp4'
         
         output_path = os.path.join(self.temp_dir, output_filename)
+        work_dir = tempfile.mkdtemp(prefix="audio_", dir=self.temp_dir)
+        video = None
         
         try:
             # 元動画を読み込む
             video = VideoFileClip(video_path)
+            source = video
             
-            # 音声クリップを読み込む
-            audio_clips = []
-            current_time = 0
-            
-            for audio_path in audio_paths:
-                audio = AudioFileClip(audio_path)
-                audio = audio.set_start(current_time)
-                audio_clips.append(audio)
-                current_time += audio.duration
-            
-            # BGMを追加（ある場合）
-            if bgm_path:
-                bgm = AudioFileClip(bgm_path)
-                
-                # BGMをループして動画の長さに合わせる
-                if bgm.duration < current_time:
-                    loops = int(current_time / bgm.duration) + 1
-                    bgm = concatenate_videoclips([bgm] * loops).subclip(0, current_time)
-                else:
-                    bgm = bgm.subclip(0, current_time)
-                
-                # BGMの音量を調整
-                bgm = bgm.volumex(bgm_volume)
-                
-                audio_clips.append(bgm)
+            # 音声の開始時刻を決定
+            if not isinstance(audio_paths, Timeline):
+                audio_paths = [{"path": path} for path in audio_paths]
+            timeline = self._plan_timeline(audio_paths)
+            current_time = timeline.duration
             
-            # 音声を合成
-            composite_audio = CompositeAudioClip(audio_clips)
+            # 音声を合成し、パイプでffmpegに渡してAACにエンコード
+            audio_path = self.audio_mixer.encode(timeline.narration(), current_time,
+                                                 os.path.join(work_dir, "audio.m4a"),
+                                                 bgm_path, bgm_volume,
+                                                 bitrate=self.render_profile["audio_bitrate"])
             
             # 動画の長さを音声に合わせる
             if video.duration < current_time:
@@ -141,11 +295,8 @@ class VideoGenerator:
             else:
                 video = video.subclip(0, current_time)
             
-            # 音声を動画に設定
-            video = video.set_audio(composite_audio)
-            
-            # 動画を保存
-            video.write_videofile(output_path, codec='libx264', audio_codec='aac', fps=24)
+            # 動画を保存（エンコード済みの音声はそのまま多重化する）
+            video.write_videofile(output_path, audio=audio_path, **self._write_options())
             
             logger.info(f"Audio added to video successfully: {output_path}")
             return output_path
@@ -153,15 +304,23 @@ class VideoGenerator:
         except Exception as e:
             logger.error(f"Error adding audio to video: {e}")
             raise
+        finally:
+            if video is not None:
+                self._close_clips([source])
+            shutil.rmtree(work_dir, ignore_errors=True)
     
-    def add_subtitles(self, video_path: str, subtitles: List[Dict], 
+    def add_subtitles(self, video_path: str, subtitles: Union[List[Dict], Timeline], 
                      font_size: int = 36, font_color: str = 'white',
-                     output_filename: Optional[str] = None) -> str:
+                     output_filename: Optional[str] = None,
+                     soft: bool = False) -> str:
         """動画に字幕を追加する
 
+        softがTrueの場合は焼き込まずに、SRTとWebVTTのサイドカーファイルを出力し、
+        映像と音声をストリームコピーしたままmov_textの字幕トラックとして多重化する。
+
         Args:
             video_path: 元動画のパス
-            subtitles: 字幕情報のリスト
+            subtitles: 字幕情報のリスト、またはタイムライン
                 [
                     {"text": "字幕1", "start": 0, "duration": 5},
                     {"text": "字幕2", "start": 5, "duration": 3},
@@ -170,14 +329,19 @@ class VideoGenerator:
             font_size: フォントサイズ
             font_color: フォント色
             output_filename: 出力ファイル名（Noneの場合は自動生成）
+            soft: Trueの場合は焼き込まずに字幕トラックとサイドカーファイルにする
 
         Returns:
             str: 生成された動画ファイルのパス
         """
+        if isinstance(subtitles, Timeline):
+            subtitles = subtitles.subtitles()
+        
         # 出力ファイル名が指定されていない場合は自動生成
         if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
             timestamp = int(time.time())
-            output_filename = f"video_with_subtitles_{timestamp}.mp4"
+            output_filename = f"video_with_subtitles_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
         
         # 拡張子がない場合は追加
         if not output_filename.endswith('.mp4'):
@@ -185,40 +349,26 @@ class VideoGenerator:
         
         output_path = os.path.join(self.output_dir, output_filename)
         
+        if soft:
+            sidecars = write_sidecars(subtitles, output_path)
+            return mux_subtitle_track(video_path, sidecars["srt"], output_path, get_setting("FFMPEG_BINARY"))
+        
+        clips = []
         try:
             # 元動画を読み込む
             video = VideoFileClip(video_path)
+            clips.append(video)
             
             # 字幕クリップを作成
-            subtitle_clips = []
-            
-            for subtitle in subtitles:
-                text = subtitle["text"]
-                start = subtitle["start"]
-                duration = subtitle["duration"]
-                
-                # TextClipを作成
-                txt_clip = TextClip(
-                    text,
-                    fontsize=font_size,
-                    color=font_color,
-                    font=self.font_path,
-                    stroke_color='black',
-                    stroke_width=2,
-                    method='caption',
-                    size=(video.w * 0.9, None)  # 幅を動画の90%に設定
-                )
-                
-                # 位置を設定（下部中央）
-                txt_clip = txt_clip.set_position(('center', 'bottom')).set_duration(duration).set_start(start)
-                
-                subtitle_clips.append(txt_clip)
+            subtitle_clips = self._build_subtitle_clips(subtitles, video.w, font_size, font_color)
+            clips += subtitle_clips
             
             # 字幕を動画に合成
-            final_video = CompositeVideoClip([video] + subtitle_clips)
+            final_video = IndexedCompositeVideoClip([video] + subtitle_clips)
+            clips.append(final_video)
             
             # 動画を保存
-            final_video.write_videofile(output_path, codec='libx264', audio_codec='aac', fps=24)
+            final_video.write_videofile(output_path, **self._write_options())
             
             logger.info(f"Subtitles added to video successfully: {output_path}")
             return output_path
@@ -226,92 +376,1014 @@ class VideoGenerator:
         except Exception as e:
             logger.error(f"Error adding subtitles to video: {e}")
             raise
+        finally:
+            # 読み込み用のffmpegプロセスが残らないよう、例外の場合も含めて閉じる
+            self._close_clips(clips)
     
-    def generate_video(self, image_paths: List[str], audio_paths: List[Dict], 
+    def generate_video(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline], 
                       intro_audio_path: Optional[str] = None,
                       bgm_path: Optional[str] = None,
                       slide_duration: float = 5.0,
-                      output_filename: Optional[str] = None) -> str:
+                      output_filename: Optional[str] = None,
+                      single_pass: bool = True,
+                      hls_dir: Optional[str] = None,
+                      soft_subtitles: bool = False) -> str:
         """画像と音声から動画を生成する
 
+        hls_dirを指定した場合は、fMP4セグメントのHLSも出力する。single_passの場合は区間に分割せずに
+        1回のエンコードで書き出し、エンコードしながらセグメントを書き出すため、完成前からプレイリストを
+        再生できる（前回の区間の再利用は行わない）。段階ごとに書き出す場合とキャッシュから返す場合は、
+        完成した動画をストリームコピーで分割する。
+
+        soft_subtitlesがTrueの場合は字幕を焼き込まずに、SRTとWebVTTのサイドカーファイルを動画の隣に出力し、
+        同じ字幕をmov_textの字幕トラックとして多重化する（字幕のための再エンコードは行わない）。
+
         Args:
             image_paths: 画像ファイルのパスリスト
-            audio_paths: 音声ファイル情報のリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン（イントロを含めて計画済みのもの）
                 [
                     {"path": "音声ファイルパス1", "text": "テキスト1"},
                     {"path": "音声ファイルパス2", "text": "テキスト2"},
                     ...
                 ]
-            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし、audio_pathsがタイムラインの場合は使用しない）
             bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
             slide_duration: 1枚あたりの表示時間（秒）
             output_filename: 出力ファイル名（Noneの場合は自動生成）
+            single_pass: Trueの場合はスライド・音声・字幕を1つの合成にまとめて1回だけエンコードする。
+                Falseの場合はスライドショー・音声追加・字幕追加の各段階で動画を書き出す
+            hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ（Noneの場合は出力しない、既存の内容は削除される）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに字幕トラックとサイドカーファイルにする
 
         Returns:
             str: 生成された動画ファイルのパス
+            （段階ごとの計測結果はself.metricsに記録される）
         """
+        self.metrics = RenderMetrics()
+        
+        # 出力ファイル名が指定されていない場合は自動生成（キャッシュから配置する場合も同じパスを使う）
+        if output_filename is None:
+            timestamp = int(time.time())
+            output_filename = f"video_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+        
+        # 拡張子がない場合は追加
+        if not output_filename.endswith('.mp4'):
+            output_filename += '.mp4'
+        
+        output_path = os.path.join(self.output_dir, output_filename)
+        
+        # 前回のHLSのセグメントが残っていると新しいプレイリストと混ざるため削除しておく
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+        
         try:
-            # スライドショーを作成
-            slideshow_path = self.create_slideshow(image_paths, slide_duration)
-            
-            # 音声パスのリストを作成
-            all_audio_paths = []
-            subtitles = []
-            current_time = 0
+            # サイドカーファイルはキャッシュから返す場合も含めて毎回作成する
+            if soft_subtitles:
+                write_sidecars(self._plan_timeline(audio_paths, intro_audio_path).subtitles(), output_path)
             
-            # イントロ音声がある場合は先頭に追加
-            if intro_audio_path:
-                all_audio_paths.append(intro_audio_path)
-                
-                # イントロ音声の長さを取得
-                intro_audio = AudioFileClip(intro_audio_path)
-                intro_duration = intro_audio.duration
+            # 同じ入力の動画がキャッシュにあればそのまま返す
+            cache_key = None
+            if self.render_cache is not None:
+                with self.metrics.stage("cache_lookup") as stage:
+                    cache_key = self.render_cache.make_key(RenderCache.describe(
+                        image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration,
+                        engine='diffusionstudio', single_pass=single_pass,
+                        font_path=self.font_path, font_size=36, font_color='white',
+                        width=self.width, height=self.height, fps=self.fps, encoder=self._encoder_args(),
+                        frame_mode=self.frame_mode, bgm_duck_gain=self.audio_mixer.duck_gain,
+                        soft_subtitles=soft_subtitles, slide_mode=self.slide_mode,
+                        comments_per_slide=self.comments_per_slide
+                    ))
+                    cached_path = self.render_cache.fetch(cache_key, output_path)
+                    stage["cache_hit"] = cached_path is not None
+                if cached_path is not None:
+                    if hls_dir:
+                        self._package_hls(cached_path, hls_dir)
+                    return cached_path
                 
-                # イントロ字幕を追加
-                if audio_paths and "text" in audio_paths[0]:
-                    subtitles.append({
-                        "text": audio_paths[0]["text"],
-                        "start": current_time,
-                        "duration": intro_duration
-                    })
-                
-                current_time += intro_duration
+                # 以前の出力がキャッシュとinodeを共有している場合があるため、上書きせずに削除しておく
+                if os.path.exists(output_path):
+                    os.remove(output_path)
             
-            # 各音声ファイルを追加
-            for audio_info in audio_paths:
-                audio_path = audio_info["path"]
-                all_audio_paths.append(audio_path)
-                
-                # 音声の長さを取得
-                audio = AudioFileClip(audio_path)
-                audio_duration = audio.duration
-                
-                # 字幕を追加
-                if "text" in audio_info:
-                    subtitles.append({
-                        "text": audio_info["text"],
-                        "start": current_time,
-                        "duration": audio_duration
-                    })
+            if single_pass:
+                video_path = self._generate_video_single_pass(
+                    image_paths,
+                    audio_paths,
+                    intro_audio_path=intro_audio_path,
+                    bgm_path=bgm_path,
+                    slide_duration=slide_duration,
+                    output_filename=output_filename,
+                    hls_dir=hls_dir,
+                    soft_subtitles=soft_subtitles
+                )
+            else:
+                video_path = self._generate_video_staged(
+                    image_paths,
+                    audio_paths,
+                    intro_audio_path=intro_audio_path,
+                    bgm_path=bgm_path,
+                    slide_duration=slide_duration,
+                    output_filename=output_filename,
+                    soft_subtitles=soft_subtitles
+                )
+            
+            # エンコード中にHLSを出力しなかった場合は、完成した動画を分割する
+            if hls_dir and not os.path.exists(os.path.join(hls_dir, HLS_PLAYLIST_NAME)):
+                self._package_hls(video_path, hls_dir)
+            
+            if cache_key is not None:
+                try:
+                    self.render_cache.store(cache_key, video_path)
+                except OSError as e:
+                    logger.warning(f"Failed to store render in cache: {e}")
+            
+            return video_path
+            
+        except Exception as e:
+            logger.error(f"Error generating video: {e}")
+            raise
+    
+    def generate_video_profiles(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                                profiles: List[Dict],
+                                intro_audio_path: Optional[str] = None,
+                                bgm_path: Optional[str] = None,
+                                slide_duration: float = 5.0,
+                                output_prefix: Optional[str] = None) -> Dict[str, str]:
+        """画像と音声から複数の出力プロファイル（アスペクト比・解像度・ビットレート）の動画を生成する
+
+        ナレーションの計画と音声の合成・AACへのエンコードは1回だけ、映像のエンコードと並行して別プロセスで行い、
+        すべてのプロファイルで同じ音声をストリームコピーで多重化する。スライド画像と字幕画像は
+        プロファイルの出力サイズごとにキャッシュから取得する。各プロファイルは固定フレームレートで1回ずつエンコードする。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            profiles: 出力プロファイルのリスト（make_profileの戻り値）
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_prefix: 出力ファイル名の接頭辞（Noneの場合は自動生成、"{接頭辞}_{プロファイル名}.mp4"に出力）
+
+        Returns:
+            Dict[str, str]: プロファイル名と生成された動画ファイルのパスの辞書
+            （段階ごとの計測結果はself.metricsに記録される）
+        """
+        if not profiles:
+            raise ValueError("At least one output profile is required")
+        
+        self.metrics = RenderMetrics()
+        
+        if output_prefix is None:
+            output_prefix = f"video_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        output_paths = {
+            profile["name"]: os.path.join(self.output_dir, f"{output_prefix}_{profile['name']}.mp4")
+            for profile in profiles
+        }
+        
+        try:
+            # 同じ入力の動画がキャッシュにあればそのまま使う
+            pending = list(profiles)
+            cache_keys = {}
+            if self.render_cache is not None:
+                pending = []
+                with self.metrics.stage("cache_lookup") as stage:
+                    for profile in profiles:
+                        output_path = output_paths[profile["name"]]
+                        cache_key = self.render_cache.make_key(RenderCache.describe(
+                            image_paths, audio_paths, intro_audio_path, bgm_path, slide_duration,
+                            engine='diffusionstudio', single_pass=True,
+                            font_path=self.font_path, font_size=36, font_color='white',
+                            width=profile["width"], height=profile["height"], fps=self.fps,
+                            encoder=self._encoder_args(profile["bitrate"]),
+                            bgm_duck_gain=self.audio_mixer.duck_gain, slide_mode=self.slide_mode,
+                            comments_per_slide=self.comments_per_slide
+                        ))
+                        if self.render_cache.fetch(cache_key, output_path) is not None:
+                            continue
+                        
+                        # 以前の出力がキャッシュとinodeを共有している場合があるため、上書きせずに削除しておく
+                        if os.path.exists(output_path):
+                            os.remove(output_path)
+                        cache_keys[profile["name"]] = cache_key
+                        pending.append(profile)
+                    stage["cache_hit"] = not pending
+            
+            if not pending:
+                return output_paths
+            
+            with self.metrics.stage("plan"):
+                timeline = self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
+                narration, subtitles, total_duration = timeline.narration(), timeline.subtitles(), timeline.duration
+            
+            work_dir = tempfile.mkdtemp(prefix="profiles_", dir=self.temp_dir)
+            audio_worker = ProcessPoolExecutor(max_workers=1)
+            
+            try:
+                # 音声は1回だけ別プロセスで合成してエンコードし、すべてのプロファイルで共有する
+                audio_future = self._start_audio(audio_worker, narration, total_duration, bgm_path, work_dir)
+                audio_path = None
                 
-                current_time += audio_duration
+                for profile in pending:
+                    output_path = output_paths[profile["name"]]
+                    with self.metrics.stage(f"normalize_images_{profile['name']}"):
+                        normalizer = self.image_normalizer.for_size(profile["width"], profile["height"])
+                        profile_images = normalizer.normalize(image_paths)
+                    
+                    clips = []
+                    try:
+                        final_video, clips = self._compose_video(
+                            timeline, profile_images, subtitles, 36, 'white',
+                            profile["width"], profile["height"], stage_name=f"subtitles_{profile['name']}"
+                        )
+                        
+                        video_path = os.path.join(work_dir, f"video_{profile['name']}.mp4") if audio_future else output_path
+                        with self.metrics.stage(f"encode_{profile['name']}") as stage:
+                            final_video.write_videofile(video_path, audio=False,
+                                                        **self._write_options(profile["bitrate"]))
+                            stage["frames"] = int(round(final_video.duration * self.fps))
+                            stage["output_bytes"] = RenderMetrics.file_size(video_path)
+                    finally:
+                        self._close_clips(clips)
+                    
+                    if audio_future:
+                        if audio_path is None:
+                            audio_path = self._finish_audio(audio_future)
+                        with self.metrics.stage(f"mux_{profile['name']}") as stage:
+                            mux_tracks(video_path, audio_path, output_path, get_setting("FFMPEG_BINARY"))
+                            stage["output_bytes"] = RenderMetrics.file_size(output_path)
+                    
+                    if profile["name"] in cache_keys:
+                        try:
+                            self.render_cache.store(cache_keys[profile["name"]], output_path)
+                        except OSError as e:
+                            logger.warning(f"Failed to store render in cache: {e}")
+                    logger.info(f"Video generated successfully ({profile['name']}): {output_path}")
+                    
+            finally:
+                audio_worker.shutdown()
+                shutil.rmtree(work_dir, ignore_errors=True)
+            
+            return output_paths
+            
+        except Exception as e:
+            logger.error(f"Error generating video profiles: {e}")
+            raise
+    
+    def _generate_video_staged(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                               intro_audio_path: Optional[str] = None,
+                               bgm_path: Optional[str] = None,
+                               slide_duration: float = 5.0,
+                               output_filename: Optional[str] = None,
+                               soft_subtitles: bool = False) -> str:
+        """スライドショー・音声追加・字幕追加の各段階で動画を書き出して動画を生成する
+
+        途中の動画はジョブごとの作業ディレクトリに書き出し、成功・失敗にかかわらず削除する。
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに字幕トラックとサイドカーファイルにする
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        work_dir = tempfile.mkdtemp(prefix="job_", dir=self.temp_dir)
+        
+        try:
+            # ナレーション・字幕・スライドのタイムラインを作成
+            with self.metrics.stage("plan"):
+                timeline = self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
+                total_duration = timeline.duration
+            
+            # ナレーションと同じ長さのスライドショーを作成
+            with self.metrics.stage("slideshow") as stage:
+                slideshow_path = self.create_slideshow(
+                    image_paths,
+                    slide_duration,
+                    output_filename=os.path.join(work_dir, "slideshow.mp4"),
+                    timeline=timeline
+                )
+                stage["frames"] = timeline.output_frames(self.fps)
+                stage["output_bytes"] = RenderMetrics.file_size(slideshow_path)
             
             # 音声を動画に追加
-            video_with_audio_path = self.add_audio_to_video(
-                slideshow_path, 
-                all_audio_paths, 
-                bgm_path
-            )
+            with self.metrics.stage("audio") as stage:
+                video_with_audio_path = self.add_audio_to_video(
+                    slideshow_path, 
+                    timeline, 
+                    bgm_path,
+                    output_filename=os.path.join(work_dir, "video_with_audio.mp4")
+                )
+                stage["frames"] = int(round(total_duration * self.fps))
+                stage["output_bytes"] = RenderMetrics.file_size(video_with_audio_path)
             
             # 字幕を追加
-            final_video_path = self.add_subtitles(
-                video_with_audio_path, 
-                subtitles,
-                output_filename=output_filename
-            )
+            with self.metrics.stage("subtitles") as stage:
+                final_video_path = self.add_subtitles(
+                    video_with_audio_path, 
+                    timeline,
+                    output_filename=output_filename,
+                    soft=soft_subtitles
+                )
+                stage["frames"] = int(round(total_duration * self.fps))
+                stage["output_bytes"] = RenderMetrics.file_size(final_video_path)
             
             return final_video_path
             
-        except Exception as e:
-            logger.error(f"Error generating video: {e}")
-            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _generate_video_single_pass(self, image_paths: List[str], audio_paths: Union[List[Dict], Timeline],
+                                    intro_audio_path: Optional[str] = None,
+                                    bgm_path: Optional[str] = None,
+                                    slide_duration: float = 5.0,
+                                    output_filename: Optional[str] = None,
+                                    font_size: int = 36, font_color: str = 'white',
+                                    hls_dir: Optional[str] = None,
+                                    soft_subtitles: bool = False) -> str:
+        """スライド・音声・字幕をメモリ上で1つの合成にまとめ、1回のエンコードで動画を生成する
+
+        Args:
+            image_paths: 画像ファイルのパスリスト
+            audio_paths: 音声ファイル情報のリスト
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            slide_duration: 1枚あたりの表示時間（秒）
+            output_filename: 出力ファイル名（Noneの場合は自動生成）
+            font_size: 字幕のフォントサイズ
+            font_color: 字幕のフォント色
+            hls_dir: エンコードしながらHLSを出力するディレクトリ（指定した場合は区間に分割しない）
+            soft_subtitles: Trueの場合は字幕を焼き込まずに、動画の隣のSRTをmov_textの字幕トラックとして多重化する
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        # 出力ファイル名が指定されていない場合は自動生成
+        if output_filename is None:
+            # 同じ秒に実行された他のジョブと衝突しないよう、ランダムな接尾辞を付ける
+            timestamp = int(time.time())
+            output_filename = f"video_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+        
+        # 拡張子がない場合は追加
+        if not output_filename.endswith('.mp4'):
+            output_filename += '.mp4'
+        
+        output_path = os.path.join(self.output_dir, output_filename)
+        
+        # ナレーション・字幕・スライドのタイミングを決定（デコーダは開かない）
+        with self.metrics.stage("plan"):
+            timeline = self._plan_timeline(audio_paths, intro_audio_path, image_paths, slide_duration)
+            subtitles = timeline.subtitles()
+        
+        # 画像を出力サイズに正規化
+        with self.metrics.stage("normalize_images"):
+            image_paths = self.image_normalizer.normalize(image_paths)
+        
+        # ソフト字幕の場合は焼き込まずに、エンコード後に字幕トラックとして多重化する
+        burned_subtitles = [] if soft_subtitles else subtitles
+        
+        if self.frame_mode == 'vfr':
+            # 可変フレームレートの場合は画面が変わる時点のフレームだけをエンコード
+            video_path = self._render_vfr(
+                timeline, image_paths, burned_subtitles, bgm_path, output_path, font_size, font_color, hls_dir
+            )
+        elif (self.segment_workers > 1 or self.segment_cache_dir) and len(timeline) > 1 and not hls_dir:
+            # 複数のワーカーが使える場合や前回の区間を再利用できる場合は、コメントの境界で区間に分けてレンダリング
+            # （区間の連結は最後に行うため、生成中から再生できるようHLSを出力する場合は分割しない）
+            video_path = self._render_segmented(
+                timeline, image_paths, burned_subtitles, bgm_path, output_path, font_size, font_color
+            )
+        else:
+            video_path = self._render_composite(
+                timeline, image_paths, burned_subtitles, bgm_path, output_path, font_size, font_color, hls_dir
+            )
+        
+        if soft_subtitles and subtitles:
+            with self.metrics.stage("subtitle_track"):
+                mux_subtitle_track(video_path, sidecar_paths(output_path)["srt"],
+                                   ffmpeg_binary=get_setting("FFMPEG_BINARY"))
+        
+        return video_path
+    
+    def _render_composite(self, timeline: Timeline, image_paths: List[str],
+                          subtitles: List[Dict], bgm_path: Optional[str], output_path: str,
+                          font_size: int = 36, font_color: str = 'white',
+                          hls_dir: Optional[str] = None) -> str:
+        """スライド・音声・字幕を1つの合成にまとめ、1回のエンコードで動画を書き出す
+
+        音声の合成とエンコードは別プロセスで映像のエンコードと並行して行い、最後にストリームコピーで多重化する。
+        HLSを出力する場合は音声を含めてエンコードしながら配信するため、音声の完成を待ってからエンコードする。
+
+        Args:
+            timeline: ナレーションとスライドのタイムライン
+            image_paths: スライドの画像ファイルのパスリスト（出力サイズに正規化済み）
+            subtitles: 焼き込む字幕情報のリスト
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            output_path: 出力ファイルのパス
+            font_size: 字幕のフォントサイズ
+            font_color: 字幕のフォント色
+            hls_dir: エンコードしながらHLSを出力するディレクトリ（Noneの場合は出力しない）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        narration, total_duration = timeline.narration(), timeline.duration
+        work_dir = tempfile.mkdtemp(prefix="job_", dir=self.temp_dir)
+        clips = []
+        
+        try:
+            with ProcessPoolExecutor(max_workers=1) as audio_worker:
+                # 音声とBGMの合成・エンコードを別プロセスで開始
+                audio_future = self._start_audio(audio_worker, narration, total_duration, bgm_path, work_dir)
+                
+                # スライドをナレーションの長さに合わせて配置し、字幕を重ねる
+                final_video, clips = self._compose_video(timeline, image_paths, subtitles, font_size, font_color)
+                
+                if hls_dir:
+                    # teeで同じエンコード結果をMP4とHLSの両方に書き込む（エンコード済みの音声はそのまま多重化する）
+                    audio_path = self._finish_audio(audio_future)
+                    ffmpeg_params = ['-map', '0:v'] + (['-map', '1:a'] if audio_path else [])
+                    ffmpeg_params += keyframe_args(self.hls_segment_seconds)
+                    tee_args = tee_output_args(output_path, hls_dir, self.hls_segment_seconds)
+                    ffmpeg_params += tee_args[:-1]
+                    with self.metrics.stage("encode") as stage:
+                        options = self._write_options()
+                        options["ffmpeg_params"] += ffmpeg_params
+                        final_video.write_videofile(tee_args[-1], audio=audio_path or True, **options)
+                        stage["frames"] = int(round(final_video.duration * self.fps))
+                        stage["output_bytes"] = RenderMetrics.file_size(output_path)
+                else:
+                    # 音声なしの映像を1回だけエンコードし、完成した音声とストリームコピーで多重化する
+                    video_path = os.path.join(work_dir, "video.mp4") if audio_future else output_path
+                    with self.metrics.stage("encode") as stage:
+                        final_video.write_videofile(video_path, audio=False, **self._write_options())
+                        stage["frames"] = int(round(final_video.duration * self.fps))
+                        stage["output_bytes"] = RenderMetrics.file_size(video_path)
+                    
+                    if audio_future:
+                        audio_path = self._finish_audio(audio_future)
+                        with self.metrics.stage("mux") as stage:
+                            mux_tracks(video_path, audio_path, output_path, get_setting("FFMPEG_BINARY"))
+                            stage["output_bytes"] = RenderMetrics.file_size(output_path)
+            
+            logger.info(f"Video generated in a single pass: {output_path}")
+            return output_path
+            
+        finally:
+            self._close_clips(clips)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _render_segmented(self, timeline: Timeline, image_paths: List[str],
+                          subtitles: List[Dict], bgm_path: Optional[str], output_path: str,
+                          font_size: int = 36, font_color: str = 'white') -> str:
+        """コメントの境界で区間に分割して並列にレンダリングし、無劣化で連結する
+
+        各区間は同じエンコード設定で音声なしの動画として書き出し、音声は区間のレンダリングと並行して
+        別プロセスで1回だけ合成・エンコードする。最後にconcatデマルチプレクサで映像と音声を
+        ストリームコピーしながら多重化する。
+        
+        segment_cache_dirが指定されている場合はsegment_comments件ごとのコメントの境界で区切り、
+        入力が前回のレンダリングと同じ区間はエンコードせずにそのまま連結する。
+        区間の内容はフレームに丸める前のコメントの開始時刻からの相対時刻で決め、連結時にフレーム単位の
+        境界に合わせて各区間の末尾を除くため、音声の長さがフレームの整数倍でなく変わっても以降の区間は変わらない。
+        コメントのテキストを編集した場合はその区間だけを再エンコードする。
+        slide_modeが'comments'の場合はスライドもコメントの境界で切り替わるため、音声の長さが変わっても
+        その区間だけを再エンコードする。'fixed'と'even'ではスライドの切り替え時刻がナレーションの位置と
+        無関係に決まるため、音声の長さが変わると以降の区間の画面も変わり、すべて再エンコードする。
+        
+        同じディレクトリを使う他のレンダリングと重ならないよう、区間の確認から連結まではディレクトリを
+        共有ロックし、今回使わなかった区間は連結の後に、他のレンダリングがない場合だけ削除する。
+
+        Args:
+            timeline: ナレーションとスライドのタイムライン
+            image_paths: スライドの画像ファイルのパスリスト（出力サイズに正規化済み）
+            subtitles: 焼き込む字幕情報のリスト
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            output_path: 出力ファイルのパス
+            font_size: 字幕のフォントサイズ
+            font_color: 字幕のフォント色
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        fps = self.fps
+        narration, total_duration = timeline.narration(), timeline.duration
+        work_dir = tempfile.mkdtemp(prefix="segments_", dir=self.temp_dir)
+        audio_worker = ProcessPoolExecutor(max_workers=1)
+        lock_file = None
+        started = time.time()
+        
+        try:
+            if self.segment_cache_dir:
+                lock_file = self._lock_segment_cache()
+            
+            # 音声とBGMの合成・エンコードを別プロセスで開始し、区間のレンダリングと並行させる
+            audio_future = self._start_audio(audio_worker, narration, total_duration, bgm_path, work_dir)
+            
+            size = (self.width, self.height)
+            slides = timeline.slides(image_paths, narration_aligned=bool(self.segment_cache_dir))
+            
+            # 字幕画像はキャッシュから取得（ない場合はプロセス内で描画）
+            with self.metrics.stage("subtitles"):
+                raster_paths = self._subtitle_rasters(subtitles, size[0], font_size, font_color, size[1])
+            subtitle_events = [
+                (path, subtitle["start"], subtitle["duration"])
+                for path, subtitle in zip(raster_paths, subtitles)
+            ]
+            
+            # コメントの境界で区間に分割
+            boundaries = [start for _, start, _ in narration]
+            if self.segment_cache_dir:
+                segments = split_at_boundaries(boundaries, total_duration, fps, self.segment_comments)
+            else:
+                segments = split_timeline(boundaries, total_duration, self.segment_workers, fps)
+            frame_counts = segment_frames(segments, fps) if self.segment_cache_dir else None
+            threads = max(1, self.cores_per_job // min(len(segments), self.segment_workers))
+            if self.render_profile["threads"]:
+                threads = min(threads, self.render_profile["threads"])
+            
+            segment_specs = []
+            for i, (start, end) in enumerate(segments):
+                duration = round(end - start, 6)
+                if frame_counts:
+                    # 連結で使うフレーム数は区間の位置によって1フレーム変わるため、1フレーム多く描画しておく
+                    duration = round((int(duration * fps) + 1.5) / fps, 6)
+                spec = {
+                    "output_path": os.path.join(work_dir, f"segment_{i:04d}.mp4"),
+                    "duration": duration,
+                    "size": size,
+                    "slides": clip_events(slides, start, end),
+                    "subtitles": clip_events(subtitle_events, start, end),
+                    "fps": fps,
+                    "codec": VIDEO_CODEC,
+                    "preset": self.render_profile["preset"],
+                    # 区間の末尾のフレームを除いて連結する場合は、Bフレームを使わない
+                    "ffmpeg_params": x264_params(self.render_profile, fps) + (['-bf', '0'] if frame_counts else []),
+                    "threads": threads,
+                    "streaming": len(timeline) >= self.streaming_threshold,
+                }
+                if self.segment_cache_dir:
+                    spec["output_path"] = os.path.join(self.segment_cache_dir, f"{segment_key(spec)}.mp4")
+                segment_specs.append(spec)
+            segment_paths = [spec["output_path"] for spec in segment_specs]
+            
+            # 前回と同じ入力の区間はエンコードしない
+            pending = [spec for spec in segment_specs if not os.path.exists(spec["output_path"])]
+            
+            logger.info(f"Rendering {len(pending)} of {len(segment_specs)} segments with {self.segment_workers} workers")
+            with self.metrics.stage("render_segments") as stage:
+                if len(pending) == 1 or self.segment_workers == 1:
+                    for spec in pending:
+                        render_segment(spec)
+                elif pending:
+                    with ProcessPoolExecutor(max_workers=min(self.segment_workers, len(pending))) as executor:
+                        list(executor.map(render_segment, pending))
+                stage["frames"] = sum(int(round(spec["duration"] * fps)) for spec in pending)
+                stage["output_bytes"] = sum(RenderMetrics.file_size(spec["output_path"]) for spec in pending)
+                stage["reused_segments"] = len(segment_specs) - len(pending)
+            
+            # 区間と完成した音声をストリームコピーで連結・多重化
+            audio_path = self._finish_audio(audio_future)
+            with self.metrics.stage("concat") as stage:
+                concat_segments(segment_paths, output_path, audio_path, get_setting("FFMPEG_BINARY"),
+                                audio_codec='copy', work_dir=work_dir, frame_counts=frame_counts, fps=fps)
+                stage["output_bytes"] = RenderMetrics.file_size(output_path)
+            
+            # 連結が終わってから、今回使わなかった区間（前回のレンダリングの古い区間）を削除
+            if lock_file is not None:
+                self._prune_segments(set(segment_paths), started, lock_file)
+            
+            logger.info(f"Video generated from {len(segment_paths)} parallel segments: {output_path}")
+            return output_path
+            
+        finally:
+            # ファイルを閉じるとロックも解放される
+            if lock_file is not None:
+                lock_file.close()
+            audio_worker.shutdown()
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _render_vfr(self, timeline: Timeline, image_paths: List[str],
+                    subtitles: List[Dict], bgm_path: Optional[str], output_path: str,
+                    font_size: int = 36, font_color: str = 'white',
+                    hls_dir: Optional[str] = None) -> str:
+        """画面が変わる時点のフレームだけを書き出し、可変フレームレートでエンコードする
+
+        スライドと字幕の切り替え時刻で区切った各区間について合成結果を1回だけ描画し、
+        表示時間付きのconcatリストとしてffmpegに渡す。静止画が続く区間はフレームを
+        複製しないため、エンコードするフレーム数は切り替えの回数程度になる。
+
+        Args:
+            timeline: ナレーションとスライドのタイムライン
+            image_paths: スライドの画像ファイルのパスリスト（出力サイズに正規化済み）
+            subtitles: 焼き込む字幕情報のリスト
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            output_path: 出力ファイルのパス
+            font_size: 字幕のフォントサイズ
+            font_color: 字幕のフォント色
+            hls_dir: エンコードしながらHLSを出力するディレクトリ（Noneの場合は出力しない）
+
+        Returns:
+            str: 生成された動画ファイルのパス
+        """
+        import numpy as np
+        from PIL import Image
+        
+        narration, total_duration = timeline.narration(), timeline.duration
+        work_dir = tempfile.mkdtemp(prefix="vfr_", dir=self.temp_dir)
+        clips = []
+        
+        try:
+            slides = timeline.slides(image_paths)
+            final_video, clips = self._compose_video(timeline, image_paths, subtitles, font_size, font_color)
+            duration = total_duration if total_duration > 0 else final_video.duration
+            
+            # スライドと字幕が切り替わる時刻
+            times = {0, duration}
+            times.update(start for _, start, _ in slides)
+            for subtitle in subtitles:
+                times.update((subtitle["start"], subtitle["start"] + subtitle["duration"]))
+            times = sorted(t for t in times if 0 <= t <= duration)
+            
+            # 区間ごとに1フレームだけ描画し、直前と同じ画面の場合は表示時間を延長する
+            with self.metrics.stage("draw_frames") as stage:
+                entries = []
+                previous = None
+                for start, end in zip(times, times[1:]):
+                    frame = final_video.get_frame((start + end) / 2)
+                    if previous is not None and np.array_equal(frame, previous):
+                        entries[-1] = (entries[-1][0], entries[-1][1] + end - start)
+                        continue
+                    frame_path = os.path.join(work_dir, f"frame_{len(entries):05d}.png")
+                    Image.fromarray(frame).save(frame_path, compress_level=1)
+                    entries.append((frame_path, end - start))
+                    previous = frame
+                stage["frames"] = len(entries)
+                stage["output_bytes"] = sum(RenderMetrics.file_size(path) for path, _ in entries)
+            
+            list_path = write_concat_list(entries, os.path.join(work_dir, "frames.ffconcat"), repeat_last=True)
+            
+            ffmpeg_binary = get_setting("FFMPEG_BINARY")
+            cmd = [ffmpeg_binary, '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+            audio_chunks = None
+            if narration:
+                # 合成した音声はファイルに書き出さず、パイプで渡す
+                audio_chunks = self.audio_mixer.pcm_chunks(narration, duration, bgm_path)
+                cmd += self.audio_mixer.input_options()
+                cmd += ['-i', 'pipe:0', '-map', '0:v', '-map', '1:a'] + audio_encoder_args(self.render_profile)
+            # フレームがまばらなため、GOPの長さはフレーム数で指定し、静止画向けにチューニングする
+            cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+            cmd += video_encoder_args(self.render_profile, self.fps, keyframe_interval=12, tune='stillimage')
+            cmd += ['-vsync', 'vfr', '-enc_time_base', '1:1000', '-video_track_timescale', '1000',
+                    '-t', f"{duration:.3f}"]
+            if hls_dir:
+                cmd += keyframe_args(self.hls_segment_seconds)
+                cmd += tee_output_args(output_path, hls_dir, self.hls_segment_seconds)
+            else:
+                cmd += ['-movflags', '+faststart', output_path]
+            with self.metrics.stage("encode") as stage:
+                run_command(cmd, stdin_chunks=audio_chunks)
+                stage["frames"] = len(entries)
+                stage["output_bytes"] = RenderMetrics.file_size(output_path)
+            
+            logger.info(f"Video generated with {len(entries)} variable-rate frames: {output_path}")
+            return output_path
+            
+        finally:
+            self._close_clips(clips)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _package_hls(self, video_path: str, hls_dir: str) -> None:
+        """完成した動画をストリームコピーでHLSに分割する
+
+        Args:
+            video_path: 動画ファイルのパス
+            hls_dir: HLSのプレイリストとセグメントの出力ディレクトリ
+        """
+        with self.metrics.stage("package_hls"):
+            package_hls(video_path, hls_dir, self.hls_segment_seconds, get_setting("FFMPEG_BINARY"))
+    
+    def _lock_segment_cache(self) -> IO[str]:
+        """区間の保持ディレクトリのロックファイルを開き、共有ロックを取得する
+
+        同じセッションのレンダリング（バックグラウンドの生成と再試行など）は同時に共有ロックを持てる。
+        削除は排他ロックを取得できた場合だけ行うため、他のレンダリングが使用中の区間は削除されない。
+
+        Returns:
+            IO[str]: ロックファイル（閉じるとロックが解放される）
+        """
+        lock_file = open(os.path.join(self.segment_cache_dir, ".lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+        return lock_file
+    
+    def _prune_segments(self, keep: set, started: float, lock_file: IO[str]) -> None:
+        """区間の保持ディレクトリから、今回のレンダリングで使っていない古い区間を削除する
+
+        他のレンダリングが共有ロックを持っている場合は削除しない（次のレンダリングで削除する）。
+        ロックを使えない環境でも、今回のレンダリングの開始後に作成された区間は削除しない。
+
+        Args:
+            keep: 残す区間の動画のパス
+            started: 今回のレンダリングの開始時刻（time.time()）
+            lock_file: _lock_segment_cacheの戻り値
+        """
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info("Another render is using the segment directory, skipping pruning")
+                return
+        
+        for name in os.listdir(self.segment_cache_dir):
+            path = os.path.join(self.segment_cache_dir, name)
+            if not name.endswith('.mp4') or path in keep:
+                continue
+            try:
+                if os.path.getmtime(path) < started:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Error removing stale segment {path}: {e}")
+    
+    def _plan_timeline(self, audio_paths: Union[List[Dict], Timeline],
+                       intro_audio_path: Optional[str] = None,
+                       image_paths: Optional[List[str]] = None,
+                       slide_duration: float = 5.0) -> Timeline:
+        """ナレーション音声の開始位置を割り当て、字幕とスライドのタイムラインを作成する
+
+        音声の長さはインデックス（ヘッダの解析結果）から取得し、デコーダは開かない。
+        audio_pathsがタイムラインの場合はそのまま使い、スライドが未決定の場合のみ
+        複製したタイムラインで決定する（渡されたタイムラインは変更しない）。
+
+        Args:
+            audio_paths: 音声ファイル情報のリスト、またはタイムライン
+            intro_audio_path: イントロ音声のパス（Noneの場合はイントロなし）
+            image_paths: スライドの画像ファイルのパスリスト（Noneの場合はスライドを決定しない）
+            slide_duration: 1枚あたりの表示時間（秒）
+
+        Returns:
+            Timeline: タイムライン
+        """
+        if isinstance(audio_paths, Timeline):
+            timeline = audio_paths
+        else:
+            timeline = Timeline(self.audio_mixer.sample_rate, self.timeline_fps)
+            
+            # イントロ音声がある場合は先頭に追加（字幕は最初のコメント）
+            if intro_audio_path:
+                intro_text = audio_paths[0].get("text") if audio_paths else None
+                timeline.add_narration(intro_audio_path, self._audio_duration(intro_audio_path), intro_text)
+            
+            # 各音声ファイルを追加
+            for audio_info in audio_paths:
+                timeline.add_narration(audio_info["path"], self._audio_duration(audio_info["path"]),
+                                       audio_info.get("text"))
+        
+        if image_paths is not None and not timeline.slide_paths:
+            if timeline is audio_paths:
+                timeline = timeline.copy()
+            timeline.schedule_slides(image_paths, slide_duration, self.slide_mode, self.comments_per_slide)
+        
+        return timeline
+    
+    def _start_audio(self, executor: ProcessPoolExecutor, narration: List[Tuple[str, float, float]],
+                     total_duration: float, bgm_path: Optional[str], work_dir: str) -> Optional[Future]:
+        """ナレーションとBGMの合成・AACへのエンコードを別プロセスで開始する
+
+        Args:
+            executor: 音声用のプロセスプール
+            narration: (音声パス, 開始時刻, 長さ)のリスト
+            total_duration: 合成後の長さ（秒）
+            bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
+            work_dir: 音声ファイルを書き出す作業ディレクトリ
+
+        Returns:
+            Optional[Future]: エンコード済みの音声ファイルのパスを返すFuture（ナレーションがない場合はNone）
+        """
+        if not narration:
+            return None
+        
+        return executor.submit(self.audio_mixer.encode, narration, total_duration,
+                               os.path.join(work_dir, "audio.m4a"), bgm_path,
+                               bitrate=self.render_profile["audio_bitrate"])
+    
+    def _finish_audio(self, future: Optional[Future]) -> Optional[str]:
+        """別プロセスの音声のエンコードの完了を待つ
+
+        映像と並行して終わっていれば待ち時間はなく、映像より時間がかかった分だけが
+        "audio_wait"の段階として記録される。
+
+        Args:
+            future: _start_audioの戻り値
+
+        Returns:
+            Optional[str]: エンコード済みの音声ファイルのパス（ナレーションがない場合はNone）
+        """
+        if future is None:
+            return None
+        
+        with self.metrics.stage("audio_wait") as stage:
+            audio_path = future.result()
+            stage["output_bytes"] = RenderMetrics.file_size(audio_path)
+        return audio_path
+    
+    def _write_options(self, bitrate: Optional[str] = None) -> Dict:
+        """moviepyのwrite_videofileに渡すエンコード設定をレンダリングプロファイルから作成する
+
+        Args:
+            bitrate: 映像のビットレート（Noneの場合はプロファイルのCRF）
+
+        Returns:
+            Dict: write_videofileのキーワード引数
+        """
+        return {
+            "codec": VIDEO_CODEC,
+            "fps": self.fps,
+            "preset": self.render_profile["preset"],
+            "threads": self.render_profile["threads"] or None,
+            "ffmpeg_params": x264_params(self.render_profile, self.fps, bitrate),
+            "audio_codec": AUDIO_CODEC,
+            "audio_bitrate": self.render_profile["audio_bitrate"],
+        }
+    
+    def _encoder_args(self, bitrate: Optional[str] = None) -> List[str]:
+        """映像と音声のエンコード引数を返す（完成した動画のキャッシュキーに使う）
+
+        Args:
+            bitrate: 映像のビットレート（Noneの場合はプロファイルのCRF）
+
+        Returns:
+            List[str]: ffmpegの引数
+        """
+        return video_encoder_args(self.render_profile, self.fps, bitrate) + audio_encoder_args(self.render_profile)
+    
+    def _audio_duration(self, path: str) -> float:
+        """音声ファイルの長さを取得する
+
+        ヘッダから長さを取得できない形式の場合のみAudioFileClipで開いて取得する。
+
+        Args:
+            path: 音声ファイルのパス
+
+        Returns:
+            float: 長さ（秒）
+        """
+        try:
+            return self.duration_index.get(path)
+        except ValueError:
+            audio = AudioFileClip(path)
+            try:
+                return audio.duration
+            finally:
+                audio.close()
+    
+    def _compose_video(self, timeline: Timeline, image_paths: List[str], subtitles: List[Dict],
+                       font_size: int, font_color: str,
+                       width: Optional[int] = None, height: Optional[int] = None,
+                       stage_name: str = "subtitles") -> Tuple[object, List]:
+        """スライドと字幕を合成したクリップを作成する
+
+        コメント数がstreaming_threshold以上の場合は、画像を表示中の間だけ読み込む
+        ストリーミング合成を使う。それ以外の場合はすべての画像をクリップとして読み込んで合成する。
+
+        Args:
+            timeline: ナレーションとスライドのタイムライン
+            image_paths: スライドの画像ファイルのパスリスト（出力サイズに正規化済み）
+            subtitles: 焼き込む字幕情報のリスト
+            font_size: フォントサイズ（短辺1080pxの動画での値）
+            font_color: フォント色
+            width: 動画の幅（Noneの場合はself.width）
+            height: 動画の高さ（Noneの場合はself.height）
+            stage_name: 字幕の作成を計測する段階の名前
+
+        Returns:
+            Tuple[VideoClip, List]: 合成したクリップと、書き出し後に閉じるオブジェクトのリスト
+        """
+        width = width or self.width
+        height = height or self.height
+        slides = timeline.slides(image_paths)
+        
+        if len(timeline) >= self.streaming_threshold:
+            with self.metrics.stage(stage_name):
+                raster_paths = self._subtitle_rasters(subtitles, width, font_size, font_color, height)
+            overlays = [
+                (path, subtitle["start"], subtitle["duration"])
+                for path, subtitle in zip(raster_paths, subtitles)
+            ]
+            compositor = StreamingCompositor((width, height), slides, overlays)
+            video = VideoClip(compositor.frame, duration=timeline.total_frames / timeline.fps)
+            logger.info(f"Streaming composition of {len(slides)} slides and {len(overlays)} subtitles")
+            return video, [video, compositor]
+        
+        video = self._build_slides(slides)
+        with self.metrics.stage(stage_name):
+            subtitle_clips = self._build_subtitle_clips(subtitles, width, font_size, font_color, video_height=height)
+        final_video = IndexedCompositeVideoClip([video] + subtitle_clips) if subtitle_clips else video
+        return final_video, [final_video, video] + subtitle_clips
+    
+    def _build_slides(self, slides: List[Tuple[str, float, float]]):
+        """スケジュール済みのスライドからクリップを作成して連結する
+
+        画像は出力サイズに正規化済みのため、リサイズせずにそのまま連結する。
+
+        Args:
+            slides: (画像パス, 開始時刻, 表示時間)のリスト（Timeline.slidesの戻り値）
+
+        Returns:
+            VideoClip: スライドを連結したクリップ
+        """
+        clips = [ImageClip(img_path).set_duration(duration) for img_path, _, duration in slides]
+        
+        return concatenate_videoclips(clips, method="chain")
+    
+    @staticmethod
+    def _close_clips(clips: List) -> None:
+        """クリップを閉じて、読み込み用のffmpegプロセスを終了する
+
+        Args:
+            clips: 閉じるクリップのリスト
+        """
+        for clip in clips:
+            try:
+                clip.close()
+            except Exception as e:
+                logger.warning(f"Error closing clip: {e}")
+    
+    def _scaled_font_size(self, font_size: int, width: Optional[int] = None,
+                          height: Optional[int] = None) -> int:
+        """字幕のフォントサイズを出力サイズに合わせて拡大・縮小する
+
+        フォントサイズは短辺1080pxの動画を基準とした値として扱う。折り返し幅も動画の幅に
+        比例するため、プレビュー（低解像度）でも本番と同じ位置で改行される。
+
+        Args:
+            font_size: 短辺1080pxの動画でのフォントサイズ
+            width: 出力の幅（Noneの場合はself.width）
+            height: 出力の高さ（Noneの場合はself.height）
+
+        Returns:
+            int: 出力サイズでのフォントサイズ
+        """
+        return max(1, round(font_size * min(width or self.width, height or self.height) / 1080))
+    
+    def _subtitle_rasters(self, subtitles: List[Dict], video_width: int, font_size: int, font_color: str,
+                          video_height: Optional[int] = None) -> List[str]:
+        """字幕画像をキャッシュから取得し、キャッシュにないものだけをプロセス内で描画する
+
+        Args:
+            subtitles: 字幕情報のリスト
+            video_width: 動画の幅（字幕の折り返し幅の基準）
+            font_size: フォントサイズ（短辺1080pxの動画での値）
+            font_color: フォント色
+            video_height: 動画の高さ（Noneの場合はself.height）
+
+        Returns:
+            List[str]: subtitlesと同じ順序の字幕画像のパスリスト
+        """
+        specs = [
+            SubtitleRasterCache.make_spec(
+                subtitle["text"],
+                self.font_path,
+                self._scaled_font_size(font_size, video_width, video_height),
+                font_color,
+                wrap_width=video_width * 0.9,  # 幅を動画の90%に設定
+                max_height=(video_height or self.height) * SUBTITLE_MAX_HEIGHT_RATIO
+            )
+            for subtitle in subtitles
+        ]
+        return self.subtitle_cache.rasterize(specs)
+    
+    def _build_subtitle_clips(self, subtitles: List[Dict], video_width: int,
+                              font_size: int = 36, font_color: str = 'white',
+                              video_height: Optional[int] = None) -> List[ImageClip]:
+        """字幕情報から字幕クリップを作成する
+
+        字幕画像はキャッシュから取得し、キャッシュにないものだけをプロセス内で描画する。
+
+        Args:
+            subtitles: 字幕情報のリスト
+            video_width: 動画の幅（字幕の折り返し幅の基準）
+            font_size: フォントサイズ（短辺1080pxの動画での値）
+            font_color: フォント色
+            video_height: 動画の高さ（Noneの場合はself.height、フォントサイズの拡大・縮小に使用）
+
+        Returns:
+            List[ImageClip]: 位置と表示時間を設定した字幕クリップのリスト
+        """
+        raster_paths = self._subtitle_rasters(subtitles, video_width, font_size, font_color, video_height)
+        
+        subtitle_clips = []
+        
+        for subtitle, raster_path in zip(subtitles, raster_paths):
+            txt_clip = ImageClip(raster_path, transparent=True)
+            
+            # 位置を設定（下部中央）
+            txt_clip = txt_clip.set_position(('center', 'bottom')).set_duration(subtitle["duration"]).set_start(subtitle["start"])
+            
+            subtitle_clips.append(txt_clip)
+        
+        return subtitle_clips
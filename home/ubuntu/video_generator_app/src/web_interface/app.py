@@ -4,7 +4,7 @@ WEBインターフェースのメインアプリケーション
 import os
 import uuid
 import logging
-from fastapi import FastAPI, Request, Form, UploadFile, File
+from fastapi import FastAPI, Request, Form, UploadFile, File, BackgroundTasks
 from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -18,7 +18,11 @@ from src.config import Config
 from src.comment_extractor import create_extractor, detect_platform
 from src.tts import create_tts_engine, SpeakerManager
 from src.image_search import create_image_search_engine, ImageManager
-from src.video_generator import create_video_generator
+from src.video_generator import (
+    create_video_generator, DurationIndex, make_profile, parse_output_profiles, parse_render_profiles,
+    preview_size, sidecar_paths, Timeline
+)
+from src.video_generator.ffmpeg_utils import HLS_PLAYLIST_NAME
 
 # ロギングの設定
 logging.basicConfig(
@@ -76,10 +80,19 @@ class VideoGenerationRequest(BaseModel):
     intro_audio_path: Optional[str] = None
     bgm_path: Optional[str] = None
     slide_duration: float = 5.0
+    preview: bool = False  # Trueの場合は低解像度のプレビューを生成（タイムラインは本番と同じ、エンコード設定はrender_profileに関わらずdraft）
+    profiles: Optional[List[str]] = None  # 出力プロファイル名（Config.OUTPUT_PROFILES）。指定した場合は1回の生成で全プロファイルを出力
+    stream: bool = False  # Trueの場合はバックグラウンドで生成し、生成中からHLSで再生できるようにする
+    soft_subtitles: bool = False  # Trueの場合は字幕を焼き込まずに字幕トラックとSRT/WebVTTファイルにする
+    render_profile: Optional[str] = None  # レンダリングプロファイル名（Noneの場合はConfig.RENDER_PROFILE、プレビューでは本番の解像度・フレームレートの決定にだけ使う）
 
 class VideoGenerationResponse(BaseModel):
     session_id: str
     video_path: str
+    video_paths: Optional[Dict[str, str]] = None
+    status: str = "completed"  # "rendering"（バックグラウンドで生成中）または "completed"
+    playlist_url: Optional[str] = None
+    metrics: Optional[Dict] = None
 
 # ルート
 @app.get("/", response_class=HTMLResponse)
@@ -168,6 +181,9 @@ async def generate_speech(request: TTSRequest):
         # 話者管理クラスを作成
         speaker_manager = SpeakerManager(tts_engine)
         
+        # 音声の長さのインデックス（音声ファイルを書き出すたびに登録する）
+        duration_index = DurationIndex()
+        
         # イントロ音声を生成
         intro_text = sessions[session_id]["comments"]["intro_text"]
         intro_voice = request.intro_voice or speaker_manager.assign_random_voice(exclude_last=False)
@@ -177,6 +193,7 @@ async def generate_speech(request: TTSRequest):
             voice=intro_voice,
             output_filename=f"intro_{session_id}.mp3"
         )
+        duration_index.add(intro_audio_path)
         
         # コメント音声を生成
         comment_audio_paths = []
@@ -193,7 +210,8 @@ async def generate_speech(request: TTSRequest):
             comment_audio_paths.append({
                 "path": audio_path,
                 "text": comment["text"],
-                "voice": voice
+                "voice": voice,
+                "duration": duration_index.add(audio_path)
             })
         
         # セッションに保存
@@ -201,6 +219,7 @@ async def generate_speech(request: TTSRequest):
             "intro_audio_path": intro_audio_path,
             "comment_audio_paths": comment_audio_paths
         }
+        sessions[session_id]["durations"] = duration_index
         
         return {
             "session_id": session_id,
@@ -305,8 +324,8 @@ async def apply_filter(session_id: str = Form(...), filter_type: str = Form(...)
 
 # 動画生成API
 @app.post("/api/generate-video", response_model=VideoGenerationResponse)
-async def generate_video(request: VideoGenerationRequest):
-    """画像と音声から動画を生成する"""
+async def generate_video(request: VideoGenerationRequest, background_tasks: BackgroundTasks):
+    """画像と音声から動画を生成する（streamがTrueの場合は生成をバックグラウンドで開始してすぐに返す）"""
     try:
         session_id = request.session_id
         
@@ -316,35 +335,259 @@ async def generate_video(request: VideoGenerationRequest):
                 content={"error": "Session not found"}
             )
         
+        # 出力プロファイルを指定した場合は、設定にあるプロファイルか確認する
+        profiles = None
+        if request.profiles:
+            available = {profile["name"]: profile for profile in parse_output_profiles(Config.OUTPUT_PROFILES)}
+            unknown = [name for name in request.profiles if name not in available]
+            if unknown:
+                return JSONResponse(
+                    status_code=400,
+                    content={"error": f"Unknown output profiles: {', '.join(unknown)}"}
+                )
+            profiles = [available[name] for name in request.profiles]
+        
+        # レンダリングプロファイルを指定した場合は、組み込みか設定にあるプロファイルか確認する
+        if request.render_profile and request.render_profile not in parse_render_profiles(Config.RENDER_PROFILES):
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Unknown render profile: {request.render_profile}"}
+            )
+        
+        if request.stream and profiles:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Streaming is not supported with multiple output profiles"}
+            )
+        
+        if request.soft_subtitles and profiles:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Soft subtitles are not supported with multiple output profiles"}
+            )
+        
+        if not request.stream:
+            return _render_video(request, profiles)
+        
+        # 生成中のHLSのプレイリストを配信し、完成前から再生できるようにする
+        entry = "preview" if request.preview else "video"
+        hls_dir = os.path.join(Config.VIDEOS_DIR, session_id, f"{entry}_hls")
+        video_path = os.path.join(Config.VIDEOS_DIR, f"{entry}_{session_id}.mp4")
+        sessions[session_id][entry] = {
+            "status": "rendering",
+            "video_path": video_path,
+            "hls_dir": hls_dir
+        }
+        background_tasks.add_task(_render_video, request, None, hls_dir)
+        
+        return {
+            "session_id": session_id,
+            "video_path": video_path,
+            "status": "rendering",
+            "playlist_url": f"/api/hls/{session_id}/{entry}/{HLS_PLAYLIST_NAME}"
+        }
+        
+    except Exception as e:
+        logger.error(f"Error generating video: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+def _render_video(request: VideoGenerationRequest, profiles: Optional[List[Dict]] = None,
+                  hls_dir: Optional[str] = None) -> Dict:
+    """動画を生成してセッションに保存する
+
+    バックグラウンドで実行する場合はスレッドプールから呼び出される。
+
+    Args:
+        request: 動画生成リクエスト
+        profiles: 出力プロファイルのリスト（Noneの場合は1つの動画を生成）
+        hls_dir: 生成しながらHLSを出力するディレクトリ（Noneの場合は出力しない）
+
+    Returns:
+        Dict: レスポンスの内容
+    """
+    session_id = request.session_id
+    entry = "preview" if request.preview else "video"
+    
+    # 前回のレンダリングの区間ごとの動画はセッションごとに保持し、変更のない区間を再利用する
+    # （プレビューと本番は解像度が異なるため、別のディレクトリに保持する）
+    segment_cache_dir = os.path.join(
+        Config.TEMP_DIR, session_id, "preview_segments" if request.preview else "segments"
+    )
+    
+    try:
         # 動画生成エンジンを作成
         video_generator = create_video_generator(
-            "diffusionstudio",
+            Config.VIDEO_ENGINE,
             output_dir=Config.VIDEOS_DIR,
-            temp_dir=Config.TEMP_DIR
+            temp_dir=Config.TEMP_DIR,
+            subtitle_cache_dir=Config.SUBTITLE_CACHE_DIR,
+            subtitle_cache_max_bytes=Config.SUBTITLE_CACHE_MAX_MB * 1024 * 1024,
+            max_concurrent_jobs=Config.MAX_CONCURRENT_JOBS,
+            duration_index=sessions[session_id].get("durations"),
+            bgm_duck_gain=Config.BGM_DUCK_GAIN,
+            frame_mode=Config.VIDEO_FRAME_MODE,
+            render_profile=request.render_profile or Config.RENDER_PROFILE,
+            render_profiles=Config.RENDER_PROFILES,
+            width=Config.VIDEO_WIDTH,
+            height=Config.VIDEO_HEIGHT,
+            image_cache_dir=Config.IMAGE_CACHE_DIR,
+            image_cache_max_bytes=Config.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+            slide_segment_cache_dir=Config.SLIDE_SEGMENT_CACHE_DIR,
+            slide_segment_cache_max_bytes=Config.SLIDE_SEGMENT_CACHE_MAX_MB * 1024 * 1024,
+            render_cache_dir=Config.RENDER_CACHE_DIR,
+            render_cache_max_bytes=Config.RENDER_CACHE_MAX_MB * 1024 * 1024,
+            render_cache_max_age=Config.RENDER_CACHE_MAX_AGE_DAYS * 24 * 60 * 60,
+            segment_cache_dir=segment_cache_dir,
+            preview=request.preview,
+            preview_short_side=Config.PREVIEW_SHORT_SIDE,
+            preview_fps=Config.PREVIEW_FPS,
+            hls_segment_seconds=Config.HLS_SEGMENT_SECONDS,
+            streaming_threshold=Config.STREAMING_RENDER_THRESHOLD,
+            slide_mode=Config.SLIDE_MODE,
+            comments_per_slide=Config.COMMENTS_PER_SLIDE
         )
         
+        # プレビューと本番で同じタイムラインを使う（本番のフレームレートで計画したものをセッションに保持する）
+        timeline = _session_timeline(request, video_generator)
+        
         # 動画を生成
-        video_path = video_generator.generate_video(
-            image_paths=request.image_paths,
-            audio_paths=request.audio_paths,
-            intro_audio_path=request.intro_audio_path,
-            bgm_path=request.bgm_path,
-            slide_duration=request.slide_duration,
-            output_filename=f"video_{session_id}.mp4"
-        )
+        output_name = f"{entry}_{session_id}"
+        video_paths = None
+        if profiles:
+            # 音声の合成や字幕の作成を共有して、複数のアスペクト比・解像度の動画を1回で生成
+            if request.preview:
+                profiles = [
+                    make_profile(profile["name"], *preview_size(profile["width"], profile["height"],
+                                                                Config.PREVIEW_SHORT_SIDE))
+                    for profile in profiles
+                ]
+            
+            video_paths = video_generator.generate_video_profiles(
+                image_paths=request.image_paths,
+                audio_paths=timeline,
+                profiles=profiles,
+                intro_audio_path=request.intro_audio_path,
+                bgm_path=request.bgm_path,
+                slide_duration=request.slide_duration,
+                output_prefix=output_name
+            )
+            video_path = video_paths[profiles[0]["name"]]
+        else:
+            video_path = video_generator.generate_video(
+                image_paths=request.image_paths,
+                audio_paths=timeline,
+                intro_audio_path=request.intro_audio_path,
+                bgm_path=request.bgm_path,
+                slide_duration=request.slide_duration,
+                output_filename=f"{output_name}.mp4",
+                hls_dir=hls_dir,
+                soft_subtitles=request.soft_subtitles
+            )
         
-        # セッションに保存
-        sessions[session_id]["video"] = {
-            "video_path": video_path
+        # 段階ごとの計測結果
+        metrics = video_generator.metrics.to_dict()
+        
+        # セッションに保存（プレビューは本番の動画とは別に保持する）
+        sessions[session_id][entry] = {
+            "status": "completed",
+            "video_path": video_path,
+            "video_paths": video_paths,
+            "hls_dir": hls_dir,
+            "subtitle_paths": sidecar_paths(video_path) if request.soft_subtitles and not profiles else None,
+            "metrics": metrics,
+            "segment_cache_dir": segment_cache_dir
         }
         
         return {
             "session_id": session_id,
-            "video_path": video_path
+            "video_path": video_path,
+            "video_paths": video_paths,
+            "status": "completed",
+            "metrics": metrics
         }
         
     except Exception as e:
-        logger.error(f"Error generating video: {e}")
+        # バックグラウンドで失敗した場合もステータスで確認できるようにする
+        logger.error(f"Error rendering video: {e}")
+        if hls_dir:
+            sessions[session_id][entry] = {"status": "failed", "error": str(e), "hls_dir": hls_dir}
+        raise
+
+def _session_timeline(request: VideoGenerationRequest, video_generator) -> Timeline:
+    """セッションに保持したタイムラインを返す（入力が変わった場合は計画し直して保持する）
+
+    タイムラインはエンジンのtimeline_fps（プレビューの場合も本番のフレームレート）で計画する。
+    同じ名前で作り直された音声ファイルも検出できるよう、ファイルのサイズと更新時刻も比較する。
+
+    Args:
+        request: 動画生成リクエスト
+        video_generator: 動画生成エンジン
+
+    Returns:
+        Timeline: タイムライン
+    """
+    audio_files = [request.intro_audio_path] if request.intro_audio_path else []
+    audio_files += [audio_info["path"] for audio_info in request.audio_paths]
+    inputs = {
+        "image_paths": request.image_paths,
+        "audio_paths": request.audio_paths,
+        "intro_audio_path": request.intro_audio_path,
+        "slide_duration": request.slide_duration,
+        "audio_files": [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in audio_files],
+        "fps": video_generator.timeline_fps,
+    }
+    
+    stored = sessions[request.session_id].get("timeline")
+    if stored is None or stored["inputs"] != inputs:
+        timeline = video_generator.plan_timeline(
+            request.audio_paths, request.intro_audio_path, request.image_paths, request.slide_duration
+        )
+        stored = {"inputs": inputs, "timeline": timeline}
+        sessions[request.session_id]["timeline"] = stored
+    
+    return stored["timeline"]
+
+# HLS配信API
+@app.get("/api/hls/{session_id}/{entry}/{filename}")
+async def get_hls_file(session_id: str, entry: str, filename: str):
+    """生成中または生成済みの動画のHLSプレイリストとセグメントを返す"""
+    try:
+        if session_id not in sessions or entry not in ("video", "preview") or entry not in sessions[session_id]:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Session or video not found"}
+            )
+        
+        hls_dir = sessions[session_id][entry].get("hls_dir")
+        path = os.path.join(hls_dir or "", os.path.basename(filename))
+        if not hls_dir or filename != os.path.basename(filename) or not os.path.isfile(path):
+            # プレイリストは最初のセグメントが書き出されるまで作成されない
+            return JSONResponse(
+                status_code=404,
+                content={"error": "HLS file not found", "status": sessions[session_id][entry].get("status")}
+            )
+        
+        media_types = {
+            ".m3u8": "application/vnd.apple.mpegurl",
+            ".m4s": "video/iso.segment",
+            ".mp4": "video/mp4",
+        }
+        headers = {}
+        if filename.endswith(".m3u8"):
+            # 生成中はプレイリストが更新されるため、キャッシュさせない
+            headers["Cache-Control"] = "no-cache"
+        
+        return FileResponse(
+            path=path,
+            media_type=media_types.get(os.path.splitext(filename)[1], "application/octet-stream"),
+            headers=headers
+        )
+        
+    except Exception as e:
+        logger.error(f"Error getting HLS file: {e}")
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
@@ -352,8 +595,8 @@ async def generate_video(request: VideoGenerationRequest):
 
 # 動画ダウンロードAPI
 @app.get("/api/download-video/{session_id}")
-async def download_video(session_id: str):
-    """生成された動画をダウンロードする"""
+async def download_video(session_id: str, profile: Optional[str] = None):
+    """生成された動画をダウンロードする（profileを指定した場合はその出力プロファイルの動画）"""
     try:
         if session_id not in sessions or "video" not in sessions[session_id]:
             return JSONResponse(
@@ -361,7 +604,22 @@ async def download_video(session_id: str):
                 content={"error": "Session or video not found"}
             )
         
+        # 生成中の場合は、HLSのプレイリスト（/api/hls）で再生できる
+        status = sessions[session_id]["video"].get("status", "completed")
+        if status != "completed":
+            return JSONResponse(
+                status_code=409,
+                content={"error": f"Video is not ready ({status})", "status": status}
+            )
+        
         video_path = sessions[session_id]["video"]["video_path"]
+        if profile is not None:
+            video_path = (sessions[session_id]["video"].get("video_paths") or {}).get(profile)
+            if video_path is None:
+                return JSONResponse(
+                    status_code=404,
+                    content={"error": f"Video for profile {profile} not found"}
+                )
         
         return FileResponse(
             path=video_path,
@@ -376,6 +634,63 @@ async def download_video(session_id: str):
             content={"error": str(e)}
         )
 
+# プレビュー動画取得API
+@app.get("/api/preview-video/{session_id}")
+async def preview_video(session_id: str):
+    """生成されたプレビュー動画を返す"""
+    try:
+        if session_id not in sessions or "preview" not in sessions[session_id]:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Session or preview not found"}
+            )
+        
+        status = sessions[session_id]["preview"].get("status", "completed")
+        if status != "completed":
+            return JSONResponse(
+                status_code=409,
+                content={"error": f"Preview is not ready ({status})", "status": status}
+            )
+        
+        return FileResponse(
+            path=sessions[session_id]["preview"]["video_path"],
+            media_type="video/mp4"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error getting preview video: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+# 字幕ファイルダウンロードAPI
+@app.get("/api/download-subtitles/{session_id}")
+async def download_subtitles(session_id: str, format: str = "vtt"):
+    """ソフト字幕で生成した動画のサイドカー字幕ファイル（vttまたはsrt）をダウンロードする"""
+    try:
+        video = sessions.get(session_id, {}).get("video")
+        subtitle_paths = (video or {}).get("subtitle_paths") or {}
+        if format not in subtitle_paths or not os.path.exists(subtitle_paths[format]):
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Session or subtitles not found"}
+            )
+        
+        media_types = {"vtt": "text/vtt", "srt": "application/x-subrip"}
+        return FileResponse(
+            path=subtitle_paths[format],
+            filename=os.path.basename(subtitle_paths[format]),
+            media_type=media_types[format]
+        )
+        
+    except Exception as e:
+        logger.error(f"Error downloading subtitles: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
 # BGMアップロードAPI
 @app.post("/api/upload-bgm")
 async def upload_bgm(session_id: str = Form(...), bgm_file: UploadFile = File(...)):
@@ -0,0 +1,153 @@
+"""
+音声の長さ取得機能のテスト用スクリプト
+"""
+import os
+import sys
+import wave
+import struct
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 音声の長さ取得モジュールをインポート
+from src.video_generator.audio_probe import DurationIndex, probe_duration
+
+def test_wav_duration(duration: float = 3.0, sample_rate: int = 48000, output_dir: str = None):
+    """WAVファイルの長さ取得のテスト
+
+    Args:
+        duration: テスト用WAVファイルの長さ（秒）
+        sample_rate: サンプリング周波数
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "audio_probe")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 無音のWAVファイルを作成
+        wav_path = os.path.join(output_dir, "silence.wav")
+        with wave.open(wav_path, "wb") as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            f.writeframes(b"\0" * 4 * int(sample_rate * duration))
+        
+        # ヘッダから長さを取得
+        probed = probe_duration(wav_path)
+        logger.info(f"Probed duration: {probed}s (expected {duration}s)")
+        assert abs(probed - duration) < 1e-6
+        
+        # インデックスに登録して再取得
+        index = DurationIndex()
+        index.add(wav_path)
+        assert index.get(wav_path) == probed
+        
+        return probed
+        
+    except Exception as e:
+        logger.error(f"Error in test_wav_duration: {e}")
+        raise
+
+def test_synthesized_mp3_duration(frame_count: int = 100, xing_frames: int = 500, output_dir: str = None):
+    """合成したMPEGオーディオのフレームからなるMP3ファイルの長さ取得のテスト
+
+    固定ビットレートのフレームだけのファイル、ID3v2タグが先頭にあるファイル、
+    Xingヘッダのあるファイルを作成し、ヘッダから求めた長さが正確であることを確認する。
+
+    Args:
+        frame_count: 作成するフレーム数
+        xing_frames: Xingヘッダに記録するフレーム数（実際のフレーム数と異なる値にして、ヘッダが使われることを確認する）
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "audio_probe")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # MPEG-1 Layer III、128kbps、44.1kHz、ジョイントステレオ、パディングなしのフレーム
+        # （フレーム長は144 * 128000 // 44100 = 417バイト、1フレームあたり1152サンプル）
+        header = bytes([0xFF, 0xFB, 0x90, 0x44])
+        frame = header + b"\0" * (417 - len(header))
+        
+        # Xingヘッダはステレオのサイド情報（32バイト）の直後に置く
+        xing_frame = bytearray(frame)
+        xing_frame[4 + 32:4 + 32 + 12] = b"Xing" + struct.pack(">II", 0x01, xing_frames)
+        
+        # ID3v2タグ（サイズは7ビットずつのsyncsafe整数）
+        tag_size = 300
+        id3_tag = b"ID3\x03\x00\x00" + bytes([(tag_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+        id3_tag += b"\0" * tag_size
+        
+        cases = {
+            "cbr.mp3": (frame * frame_count, frame_count),
+            "id3.mp3": (id3_tag + frame * frame_count, frame_count),
+            "xing.mp3": (id3_tag + bytes(xing_frame) + frame * frame_count, xing_frames),
+        }
+        
+        index = DurationIndex()
+        for name, (data, frames) in cases.items():
+            path = os.path.join(output_dir, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            
+            expected = frames * 1152 / 44100
+            duration = index.add(path)
+            logger.info(f"{name}: {duration:.6f}s (expected {expected:.6f}s)")
+            assert abs(duration - expected) < 1e-9, name
+        
+        return index.to_dict()
+        
+    except Exception as e:
+        logger.error(f"Error in test_synthesized_mp3_duration: {e}")
+        raise
+
+def test_mp3_duration(mp3_paths: list = None):
+    """MP3ファイルの長さ取得のテスト（TTSのテストで生成したファイルがある場合のみ）
+
+    Args:
+        mp3_paths: MP3ファイルのパスリスト（Noneの場合はTTSのテストの出力）
+    """
+    try:
+        if mp3_paths is None:
+            tts_dir = os.path.join(os.getcwd(), "test_output", "tts")
+            mp3_paths = [os.path.join(tts_dir, "intro.mp3"), os.path.join(tts_dir, "comment_001.mp3")]
+        
+        index = DurationIndex()
+        
+        for mp3_path in mp3_paths:
+            if not os.path.exists(mp3_path):
+                logger.warning(f"File not found, skipped: {mp3_path}")
+                continue
+            
+            duration = index.add(mp3_path)
+            logger.info(f"{os.path.basename(mp3_path)}: {duration:.3f}s")
+            assert duration > 0 and index.get(mp3_path) == duration
+        
+        return index.to_dict()
+        
+    except Exception as e:
+        logger.error(f"Error in test_mp3_duration: {e}")
+        raise
+
+if __name__ == "__main__":
+    # WAVファイルのテスト
+    test_wav_duration()
+    
+    # 合成したMP3ファイルのテスト
+    test_synthesized_mp3_duration()
+    
+    # MP3ファイルのテスト（TTSのテストで生成したファイルを使用）
+    test_mp3_duration()
@@ -0,0 +1,119 @@
+"""
+動画生成エンジンの比較ベンチマーク用スクリプト
+"""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 動画生成モジュールをインポート
+from src.video_generator import create_video_generator
+
+def test_engine_benchmark(engines: tuple = ("diffusionstudio", "ffmpeg", "pyav"), comment_count: int = 20,
+                          image_count: int = 5, comment_duration: float = 2.0,
+                          width: int = 1280, height: int = 720, fps: int = 24, output_dir: str = None):
+    """同じ入力から各エンジンで動画を生成し、所要時間と段階ごとの計測結果を比較する
+
+    Args:
+        engines: 比較するエンジンタイプ
+        comment_count: コメント（ナレーションと字幕）の数
+        image_count: スライド画像の数
+        comment_duration: 1コメントあたりのナレーションの長さ（秒）
+        width: 出力動画の幅
+        height: 出力動画の高さ
+        fps: 出力動画のフレームレート
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+
+    Returns:
+        Dict: エンジンタイプごとの所要時間と計測結果
+    """
+    from PIL import Image
+    
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "engine_benchmark")
+        
+        input_dir = os.path.join(output_dir, "inputs")
+        os.makedirs(input_dir, exist_ok=True)
+        
+        if shutil.which("ffmpeg") is None:
+            logger.warning("ffmpeg not found, skipping engine benchmark")
+            return None
+        
+        # 色の異なるスライド画像と、無音のナレーション音声を作成
+        image_paths = []
+        for i in range(image_count):
+            path = os.path.join(input_dir, f"slide_{i}.png")
+            Image.new("RGB", (width, height), ((i * 50) % 256, 80, 160)).save(path)
+            image_paths.append(path)
+        
+        audio_paths = []
+        for i in range(comment_count):
+            path = os.path.join(input_dir, f"comment_{i}.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(2)
+                f.setsampwidth(2)
+                f.setframerate(44100)
+                f.writeframes(b"\0" * 4 * int(44100 * comment_duration))
+            audio_paths.append({"path": path, "text": f"ベンチマーク用のコメント{i + 1}です。"})
+        
+        results = {}
+        for engine_type in engines:
+            engine_dir = os.path.join(output_dir, engine_type)
+            video_generator = create_video_generator(
+                engine_type,
+                output_dir=engine_dir,
+                temp_dir=os.path.join(engine_dir, "temp"),
+                width=width,
+                height=height,
+                fps=fps
+            )
+            
+            start = time.perf_counter()
+            try:
+                video_path = video_generator.generate_video(
+                    image_paths,
+                    audio_paths,
+                    output_filename=f"benchmark_{engine_type}.mp4"
+                )
+            except ImportError as e:
+                # PyAVなど、エンジンが使うライブラリがインストールされていない場合は比較から除く
+                logger.warning(f"Skipping {engine_type}: {e}")
+                continue
+            wall_seconds = time.perf_counter() - start
+            assert os.path.getsize(video_path) > 0
+            
+            results[engine_type] = {
+                "wall_seconds": round(wall_seconds, 3),
+                "output_bytes": os.path.getsize(video_path),
+                "metrics": video_generator.metrics.to_dict(),
+            }
+            logger.info(f"{engine_type}: {wall_seconds:.2f}s, {results[engine_type]['output_bytes']} bytes")
+        
+        logger.info(f"Benchmark results: {json.dumps(results, ensure_ascii=False, indent=2)}")
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error in test_engine_benchmark: {e}")
+        raise
+
+if __name__ == "__main__":
+    # コマンドライン引数で比較するエンジンを指定できる（例: python tests/test_engine_benchmark.py ffmpeg pyav）
+    if len(sys.argv) > 1:
+        test_engine_benchmark(tuple(sys.argv[1:]))
+    else:
+        test_engine_benchmark()
@@ -0,0 +1,76 @@
+"""
+スライド画像の正規化機能のテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 画像正規化モジュールをインポート
+from src.video_generator.image_normalizer import ImageNormalizer
+
+def test_normalize_images(width: int = 1920, height: int = 1080, output_dir: str = None):
+    """画像の正規化のテスト
+
+    Args:
+        width: 出力する画像の幅
+        height: 出力する画像の高さ
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    from PIL import Image
+    
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "image_normalizer")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # EXIFで90度回転を指定した横長のJPEGと、透過PNGを作成
+        rotated_path = os.path.join(output_dir, "rotated.jpg")
+        image = Image.new("RGB", (400, 200), "red")
+        exif = image.getexif()
+        exif[0x0112] = 6
+        image.save(rotated_path, exif=exif)
+        
+        transparent_path = os.path.join(output_dir, "transparent.png")
+        Image.new("RGBA", (300, 300), (0, 255, 0, 0)).save(transparent_path)
+        
+        # 正規化
+        normalizer = ImageNormalizer(os.path.join(output_dir, "cache"), width=width, height=height)
+        normalized_paths = normalizer.normalize([rotated_path, transparent_path])
+        
+        for path in normalized_paths:
+            with Image.open(path) as normalized:
+                logger.info(f"{os.path.basename(path)}: {normalized.size} {normalized.mode}")
+                assert normalized.size == (width, height)
+                assert normalized.mode == "RGB"
+        
+        # 回転後は縦長になるため、左右に余白が入る
+        with Image.open(normalized_paths[0]) as normalized:
+            assert normalized.getpixel((0, height // 2)) == (0, 0, 0)
+        
+        # 2回目はキャッシュから同じファイルが返される
+        assert normalizer.normalize([rotated_path]) == normalized_paths[:1]
+        
+        return normalized_paths
+        
+    except Exception as e:
+        logger.error(f"Error in test_normalize_images: {e}")
+        raise
+
+if __name__ == "__main__":
+    # 横動画のテスト
+    test_normalize_images(1920, 1080)
+    
+    # 縦動画のテスト
+    test_normalize_images(1080, 1920)
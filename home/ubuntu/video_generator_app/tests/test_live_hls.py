@@ -0,0 +1,146 @@
+"""
+生成中のHLSの出力のテスト用スクリプト
+"""
+import os
+import sys
+import wave
+import shutil
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 動画生成モジュールをインポート
+from src.video_generator import create_video_generator
+from src.video_generator import video_generator as moviepy_engine
+from src.video_generator import pyav_generator as pyav_engine
+from src.video_generator.ffmpeg_utils import HLS_PLAYLIST_NAME
+
+def test_live_hls(engines: tuple = ("diffusionstudio", "pyav"), comment_count: int = 6,
+                  comment_duration: float = 2.0, width: int = 320, height: int = 180, fps: int = 12,
+                  output_dir: str = None):
+    """HLSのプレイリストが完成後の分割ではなく、エンコード中（最後の多重化より前）に書き出されることのテスト
+
+    Webアプリと同じく区間の保持ディレクトリを指定した状態で生成する。
+
+    Args:
+        engines: テストするエンジンタイプ
+        comment_count: コメント（ナレーションと字幕）の数
+        comment_duration: 1コメントあたりのナレーションの長さ（秒）
+        width: 出力動画の幅
+        height: 出力動画の高さ
+        fps: 出力動画のフレームレート
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    from PIL import Image
+    
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "live_hls")
+        
+        input_dir = os.path.join(output_dir, "inputs")
+        os.makedirs(input_dir, exist_ok=True)
+        
+        if shutil.which("ffmpeg") is None:
+            logger.warning("ffmpeg not found, skipping live HLS test")
+            return None
+        
+        # スライド画像と、無音のナレーション音声を作成
+        image_paths = []
+        for i in range(2):
+            path = os.path.join(input_dir, f"slide_{i}.png")
+            Image.new("RGB", (width, height), ((i * 120) % 256, 80, 160)).save(path)
+            image_paths.append(path)
+        
+        audio_paths = []
+        for i in range(comment_count):
+            path = os.path.join(input_dir, f"comment_{i}.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(2)
+                f.setsampwidth(2)
+                f.setframerate(44100)
+                f.writeframes(b"\0" * 4 * int(44100 * comment_duration))
+            audio_paths.append({"path": path, "text": f"コメント{i + 1}"})
+        
+        # 最後の多重化（区間の連結・トラックの多重化・セグメントのMP4へのまとめ）の時点で
+        # プレイリストにセグメントがあることを確認し、完成後の分割は使わせない
+        hls_dirs = []
+        mux_calls = []
+        
+        def check_playlist(name, function):
+            def wrapper(*args, **kwargs):
+                playlist_path = os.path.join(hls_dirs[-1], HLS_PLAYLIST_NAME)
+                assert os.path.exists(playlist_path), f"{name} ran before the HLS playlist was written"
+                with open(playlist_path, encoding="utf-8") as f:
+                    assert "#EXTINF" in f.read(), f"{name} ran before any HLS segment was published"
+                mux_calls.append(name)
+                return function(*args, **kwargs)
+            return wrapper
+        
+        def package_hls(*args, **kwargs):
+            raise AssertionError("HLS was packaged from the finished video instead of while encoding")
+        
+        originals = []
+        for module in (moviepy_engine, pyav_engine):
+            for name in ("concat_segments", "mux_tracks", "hls_to_mp4"):
+                if hasattr(module, name):
+                    originals.append((module, name, getattr(module, name)))
+                    setattr(module, name, check_playlist(name, getattr(module, name)))
+            originals.append((module, "package_hls", module.package_hls))
+            module.package_hls = package_hls
+        
+        try:
+            results = {}
+            for engine_type in engines:
+                engine_dir = os.path.join(output_dir, engine_type)
+                hls_dirs.append(os.path.join(engine_dir, "hls"))
+                video_generator = create_video_generator(
+                    engine_type,
+                    output_dir=engine_dir,
+                    temp_dir=os.path.join(engine_dir, "temp"),
+                    segment_cache_dir=os.path.join(engine_dir, "segments"),
+                    hls_segment_seconds=2,
+                    width=width,
+                    height=height,
+                    fps=fps
+                )
+                
+                try:
+                    video_path = video_generator.generate_video(
+                        image_paths,
+                        audio_paths,
+                        output_filename=f"live_{engine_type}.mp4",
+                        hls_dir=hls_dirs[-1]
+                    )
+                except ImportError as e:
+                    # PyAVなど、エンジンが使うライブラリがインストールされていない場合は除く
+                    logger.warning(f"Skipping {engine_type}: {e}")
+                    continue
+                
+                with open(os.path.join(hls_dirs[-1], HLS_PLAYLIST_NAME), encoding="utf-8") as f:
+                    assert "#EXT-X-ENDLIST" in f.read()
+                assert os.path.getsize(video_path) > 0
+                logger.info(f"{engine_type}: live HLS in {hls_dirs[-1]}, final mux steps {mux_calls}")
+                results[engine_type] = video_path
+                mux_calls.clear()
+            
+            return results
+            
+        finally:
+            for module, name, function in originals:
+                setattr(module, name, function)
+                
+    except Exception as e:
+        logger.error(f"Error in test_live_hls: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_live_hls()
@@ -0,0 +1,56 @@
+"""
+出力プロファイルの解析機能のテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 出力プロファイルモジュールをインポート
+from src.video_generator.output_profiles import parse_output_profiles, group_by_aspect
+
+def test_parse_output_profiles(text: str = 'landscape:1920x1080:8M,portrait:1080x1920:6M,small:1280x720'):
+    """出力プロファイルの解析とアスペクト比ごとのグループ化のテスト
+
+    Args:
+        text: 出力プロファイルの記述
+    """
+    try:
+        profiles = parse_output_profiles(text)
+        for profile in profiles:
+            logger.info(f"{profile['name']}: {profile['width']}x{profile['height']} ({profile['bitrate']})")
+        
+        assert [profile["name"] for profile in profiles] == ["landscape", "portrait", "small"]
+        assert profiles[0]["bitrate"] == "8M"
+        assert profiles[2]["bitrate"] is None
+        
+        # 16:9のプロファイルは大きい順に1つのグループにまとめられる
+        groups = group_by_aspect(profiles)
+        assert [[profile["name"] for profile in group] for group in groups] == [["landscape", "small"], ["portrait"]]
+        
+        # 奇数の解像度や重複した名前はエラーになる
+        for invalid in ('odd:1921x1080', 'a:1920x1080,a:1280x720', 'broken'):
+            try:
+                parse_output_profiles(invalid)
+            except ValueError as e:
+                logger.info(f"Rejected {invalid!r}: {e}")
+            else:
+                raise AssertionError(f"{invalid!r} should be rejected")
+        
+        return profiles
+        
+    except Exception as e:
+        logger.error(f"Error in test_parse_output_profiles: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_parse_output_profiles()
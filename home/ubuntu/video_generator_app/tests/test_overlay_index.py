@@ -0,0 +1,65 @@
+"""
+オーバーレイの区間インデックスのテスト用スクリプト
+"""
+import os
+import sys
+import random
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 区間インデックスモジュールをインポート
+from src.video_generator.overlay_index import OverlayIndex
+
+def test_overlay_index(overlay_count: int = 500, fps: int = 24):
+    """区間インデックスの結果がすべてのオーバーレイを判定した場合と一致するかのテスト
+
+    Args:
+        overlay_count: オーバーレイの数
+        fps: フレームレート
+    """
+    try:
+        rng = random.Random(0)
+        
+        # 先頭は終わりのない背景の動画、続いて字幕（重なりあり）
+        intervals = [(0.0, None)]
+        start = 0.0
+        for _ in range(overlay_count):
+            duration = rng.uniform(1.0, 6.0)
+            intervals.append((round(start, 3), round(start + duration, 3)))
+            start += rng.uniform(0.5, 5.0)
+        total_duration = start + 6.0
+        
+        def brute_force(t):
+            return [i for i, (s, e) in enumerate(intervals) if s <= t and (e is None or t < e)]
+        
+        index = OverlayIndex(intervals)
+        times = [frame / fps for frame in range(int(total_duration * fps))]
+        
+        # 書き出し時と同じく時刻が単調増加する場合
+        for t in times:
+            assert index.active(t) == brute_force(t), t
+        
+        # 時刻が戻る場合（プレビューなど）
+        for t in rng.sample(times, 200):
+            assert index.active(t) == brute_force(t), t
+        
+        max_active = max(len(index.active(t)) for t in times)
+        logger.info(f"{len(index)} overlays, {len(times)} frames, at most {max_active} active per frame")
+        
+        return index
+        
+    except Exception as e:
+        logger.error(f"Error in test_overlay_index: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_overlay_index()
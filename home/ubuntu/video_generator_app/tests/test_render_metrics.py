@@ -0,0 +1,58 @@
+"""
+段階ごとの計測のテスト用スクリプト
+"""
+import os
+import sys
+import time
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 計測モジュールをインポート
+from src.video_generator.render_metrics import RenderMetrics
+
+def test_stage_peak_rss(allocation_mb: int = 200):
+    """最大メモリ使用量が前の段階ではなく、その段階の実行中の値になることのテスト
+
+    Args:
+        allocation_mb: 1つ目の段階で一時的に確保するメモリ量（MB）
+    """
+    try:
+        metrics = RenderMetrics()
+        
+        # 1つ目の段階では大きなバッファを確保し、段階の終了前に解放する
+        with metrics.stage("allocate") as stage:
+            buffer = bytearray(allocation_mb * 1024 * 1024)
+            time.sleep(0.2)
+            stage["output_bytes"] = len(buffer)
+            del buffer
+        
+        with metrics.stage("idle"):
+            time.sleep(0.2)
+        
+        allocate, idle = metrics.to_dict()["stages"]
+        logger.info(f"Stages: {allocate}, {idle}")
+        if "peak_rss_mb" not in allocate:
+            logger.warning("/proc is not available, skipping peak RSS checks")
+            return metrics
+        
+        # 確保した段階の最大値にはバッファが含まれ、次の段階の最大値には含まれない
+        assert allocate["peak_rss_mb"] - idle["peak_rss_mb"] > allocation_mb / 2
+        assert abs(allocate["rss_delta_mb"]) < allocation_mb / 2
+        
+        return metrics
+        
+    except Exception as e:
+        logger.error(f"Error in test_stage_peak_rss: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_stage_peak_rss()
@@ -0,0 +1,79 @@
+"""
+レンダリングプロファイルのテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# レンダリングプロファイルモジュールをインポート
+from src.video_generator.render_profiles import (
+    parse_render_profiles, get_render_profile, video_encoder_args, audio_encoder_args
+)
+
+def test_parse_render_profiles(text: str = 'fast:preset=veryfast:crf=26,archive:preset=slower,'
+                                          'uhd:base=archive:size=3840x2160:fps=30'):
+    """レンダリングプロファイルの解析と、エンコードの引数の作成のテスト
+
+    Args:
+        text: レンダリングプロファイルの記述
+    """
+    try:
+        # 組み込みのプロファイルは速さと品質の順に並ぶ
+        draft, standard, archive = (get_render_profile(name) for name in ('draft', 'standard', 'archive'))
+        assert get_render_profile()["name"] == "standard"
+        assert (draft["preset"], standard["preset"], archive["preset"]) == ('ultrafast', 'medium', 'veryslow')
+        assert archive["crf"] < standard["crf"]
+        
+        # 追加したプロファイルは基にしたプロファイルの設定を引き継ぎ、組み込みは上書きできる
+        profiles = parse_render_profiles(text)
+        logger.info(f"Parsed render profiles: {profiles}")
+        assert list(profiles) == ['draft', 'standard', 'archive', 'fast', 'uhd']
+        assert profiles["fast"]["preset"] == 'veryfast' and profiles["fast"]["crf"] == 26
+        assert profiles["fast"]["tune"] == standard["tune"]
+        assert profiles["archive"]["preset"] == 'slower' and profiles["archive"]["crf"] == 18
+        assert (profiles["uhd"]["width"], profiles["uhd"]["height"], profiles["uhd"]["fps"]) == (3840, 2160, 30)
+        assert profiles["uhd"]["preset"] == 'slower'
+        
+        # 映像はビットレートの指定がなければCRFを使い、GOPの長さはフレーム数に変換する
+        args = video_encoder_args(standard, 24)
+        assert args[:6] == ['-c:v', 'libx264', '-preset', 'medium', '-pix_fmt', 'yuv420p']
+        assert args[args.index('-crf') + 1] == '23' and args[args.index('-g') + 1] == '240'
+        assert args[args.index('-tune') + 1] == 'stillimage' and '-threads' not in args
+        args = video_encoder_args(draft, 8, bitrate='2M')
+        assert '-crf' not in args and args[args.index('-b:v') + 1] == '2M'
+        assert args[args.index('-g') + 1] == '16' and '-tune' not in args
+        assert audio_encoder_args(archive) == ['-c:a', 'aac', '-b:a', '192k']
+        
+        # 不正な記述は例外になる
+        for invalid in ('fast:preset=turbo', 'fast:crf=60', 'fast:tune=music', 'fast:size=1920x1081',
+                        'fast:base=missing', 'fast:color=red', 'fast:crf', 'fast,fast', 'bad name'):
+            try:
+                parse_render_profiles(invalid)
+            except ValueError:
+                continue
+            raise AssertionError(f"Invalid render profile was accepted: {invalid}")
+        try:
+            get_render_profile('missing')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown render profile was accepted")
+        
+        return profiles
+        
+    except Exception as e:
+        logger.error(f"Error in test_parse_render_profiles: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_parse_render_profiles()
@@ -0,0 +1,85 @@
+"""
+区間の分割のテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 区間のレンダリングモジュールをインポート
+from src.video_generator.segment_renderer import split_at_boundaries, segment_frames, clip_events
+from src.video_generator.timeline import Timeline
+
+def test_split_at_boundaries(comment_count: int = 1000, comments_per_segment: int = 20, fps: int = 24,
+                             changed_comment: int = 65, length_change: float = 0.37):
+    """再利用する区間の分割のテスト（区間の数と、音声の長さを変えた場合に変わる区間）
+
+    音声の長さはフレームの整数倍にせず、長さの変更もフレームの整数倍にしない。
+
+    Args:
+        comment_count: コメントの数
+        comments_per_segment: 1区間にまとめるコメント数
+        fps: フレームレート
+        changed_comment: 音声の長さを変えるコメントの番号
+        length_change: 音声の長さの変更（秒）
+    """
+    try:
+        def plan(lengths):
+            # スライドはコメントの境界で切り替え、区間の途中でも切り替わるようにする
+            timeline = Timeline(sample_rate=44100, fps=fps)
+            for i, length in enumerate(lengths):
+                timeline.add_narration(f"comment_{i}.wav", length, f"コメント{i}")
+            timeline.schedule_slides([f"slide_{i}.png" for i in range(comment_count)], 5.0, 'comments', 2)
+            starts = [start for _, start, _ in timeline.narration()]
+            segments = split_at_boundaries(starts, timeline.duration, fps, comments_per_segment)
+            subtitles = [(f"subtitle_{i}.png", subtitle["start"], subtitle["duration"])
+                         for i, subtitle in enumerate(timeline.subtitles())]
+            slides = timeline.slides(narration_aligned=True)
+            # 区間の入力（キーの元になる内容）
+            inputs = [
+                (clip_events(slides, start, end), clip_events(subtitles, start, end), round(end - start, 6))
+                for start, end in segments
+            ]
+            return timeline, segments, inputs
+        
+        lengths = [2.013 + (i % 7) * 0.25 for i in range(comment_count)]
+        timeline, segments, inputs = plan(lengths)
+        
+        # コメントごとではなく、comments_per_segment件ごとに区切る
+        logger.info(f"{comment_count} comments split into {len(segments)} segments")
+        assert len(segments) == -(-comment_count // comments_per_segment)
+        assert segments[0][0] == 0 and segments[-1][1] == timeline.duration
+        assert all(previous[1] == current[0] for previous, current in zip(segments, segments[1:]))
+        assert len(split_at_boundaries([start for _, start, _ in timeline.narration()],
+                                       timeline.duration, fps)) == comment_count
+        
+        # 連結で使うフレーム数の合計は全体の長さと一致する
+        frames = segment_frames(segments, fps)
+        assert sum(frames) == timeline.total_frames and min(frames) > 0
+        
+        # 1つのコメントの音声の長さをフレームの整数倍でなく変えても、入力が変わるのはその区間だけ
+        changed = list(lengths)
+        changed[changed_comment] += length_change
+        _, changed_segments, changed_inputs = plan(changed)
+        assert len(changed_segments) == len(segments)
+        different = [i for i, (before, after) in enumerate(zip(inputs, changed_inputs)) if before != after]
+        assert different == [changed_comment // comments_per_segment], different
+        
+        return segments
+        
+    except Exception as e:
+        logger.error(f"Error in test_split_at_boundaries: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_split_at_boundaries()
+    test_split_at_boundaries(comment_count=30, comments_per_segment=3, changed_comment=4)
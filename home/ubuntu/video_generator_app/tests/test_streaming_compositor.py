@@ -0,0 +1,77 @@
+"""
+ストリーミング合成のテスト用スクリプト
+"""
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+from PIL import Image
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ストリーミング合成モジュールをインポート
+from src.video_generator.streaming_compositor import StreamingCompositor
+
+def test_streaming_compositor(comment_count: int = 1000, fps: int = 4, size: tuple = (64, 36)):
+    """コメント数にかかわらず保持する画像が表示中のものだけになるかのテスト
+
+    Args:
+        comment_count: コメント（字幕）の数
+        fps: フレームを取得する間隔（1秒あたりのフレーム数）
+        size: 出力動画の(幅, 高さ)
+    """
+    work_dir = tempfile.mkdtemp(prefix="test_streaming_")
+    
+    try:
+        width, height = size
+        
+        # 10コメントごとに切り替わるスライドと、1コメント1秒の字幕
+        slides = []
+        for i in range(comment_count // 10):
+            path = os.path.join(work_dir, f"slide_{i}.png")
+            Image.new('RGB', size, (i % 256, 0, 0)).save(path)
+            slides.append((path, i * 10.0, 10.0))
+        
+        overlays = []
+        for i in range(comment_count):
+            path = os.path.join(work_dir, f"subtitle_{i}.png")
+            Image.new('RGBA', (width // 2, height // 4), (0, 255, 0, 255)).save(path)
+            overlays.append((path, float(i), 1.0))
+        
+        compositor = StreamingCompositor(size, slides, overlays)
+        for frame_index in range(comment_count * fps):
+            t = frame_index / fps
+            frame = compositor.frame(t)
+            
+            # スライドの色が背景になり、字幕は下部中央に重なる
+            slide = int(t // 10)
+            assert tuple(frame[0, 0]) == (slide % 256, 0, 0), t
+            assert tuple(frame[height - 1, width // 2]) == (0, 255, 0), t
+        
+        logger.info(f"Loaded {compositor.loaded_images} images, at most {compositor.peak_images} at once")
+        
+        # 各画像は1回だけ読み込まれ、同時に保持するのはスライドと字幕の1枚ずつ
+        assert compositor.loaded_images == len(slides) + len(overlays)
+        assert compositor.peak_images <= 2
+        
+        compositor.close()
+        return compositor
+        
+    except Exception as e:
+        logger.error(f"Error in test_streaming_compositor: {e}")
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_streaming_compositor()
@@ -0,0 +1,65 @@
+"""
+ソフト字幕（SRT/WebVTT）の作成機能のテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ソフト字幕モジュールをインポート
+from src.video_generator.subtitle_tracks import format_srt, format_webvtt, write_sidecars
+
+def test_subtitle_sidecars(output_dir: str = None):
+    """同じ字幕情報からSRTとWebVTTを作成するテスト
+
+    Args:
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    subtitles = [
+        {"text": "最初のコメント", "start": 0, "duration": 2.5},
+        {"text": "改行を含む\n\nコメント <b>&", "start": 2.5, "duration": 3661.0},
+    ]
+    
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "subtitle_tracks")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        srt = format_srt(subtitles)
+        logger.info(f"SRT:\n{srt}")
+        assert "1\n00:00:00,000 --> 00:00:02,500\n最初のコメント\n" in srt
+        assert "2\n00:00:02,500 --> 01:01:03,500\n改行を含む\nコメント <b>&\n" in srt
+        
+        vtt = format_webvtt(subtitles)
+        logger.info(f"WebVTT:\n{vtt}")
+        assert vtt.startswith("WEBVTT\n")
+        assert "00:00:02.500 --> 01:01:03.500\n改行を含む\nコメント &lt;b>&amp;\n" in vtt
+        
+        # 動画と同じ名前でサイドカーファイルが作成される
+        paths = write_sidecars(subtitles, os.path.join(output_dir, "video.mp4"))
+        assert paths == {
+            "srt": os.path.join(output_dir, "video.srt"),
+            "vtt": os.path.join(output_dir, "video.vtt"),
+        }
+        for path in paths.values():
+            assert os.path.exists(path)
+        
+        return paths
+        
+    except Exception as e:
+        logger.error(f"Error in test_subtitle_sidecars: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_subtitle_sidecars()
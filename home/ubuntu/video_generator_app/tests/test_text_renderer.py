@@ -0,0 +1,74 @@
+"""
+字幕テキストの組版・描画機能のテスト用スクリプト
+"""
+import os
+import sys
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 字幕描画モジュールをインポート
+from src.video_generator.text_renderer import (
+    wrap_text, fit_font_size, render_text, text_width, NO_LINE_START, NO_LINE_END
+)
+from src.video_generator.subtitle_cache import SubtitleRasterCache
+
+def test_text_renderer(text: str = "これはテスト用の字幕です。「禁則処理」が正しく行われ、句読点や閉じ括弧が行頭に来ないことを確認します。",
+                       font_path: str = None):
+    """禁則処理付きの折り返し、フォントサイズの自動調整、字幕画像の描画のテスト
+
+    Args:
+        text: 字幕テキスト
+        font_path: フォントのパス（Noneの場合は日本語フォントを探す）
+    """
+    try:
+        font_size = 48
+        max_width = 400
+        
+        lines = wrap_text(text, font_path, font_size, max_width)
+        for line in lines:
+            logger.info(f"{text_width(line, font_path, font_size):.0f}px: {line}")
+        
+        # 改行しても文字は失われない
+        assert ''.join(lines) == text
+        
+        # 行頭禁則・行末禁則の文字は行頭・行末に来ない
+        for line in lines[1:]:
+            assert line[0] not in NO_LINE_START, line
+        for line in lines[:-1]:
+            assert line[-1] not in NO_LINE_END, line
+        
+        # 英単語は途中で改行しない
+        english = wrap_text("subtitle rendering without ImageMagick", font_path, font_size, max_width)
+        assert all(word in "subtitle rendering without ImageMagick".split() for line in english for word in line.split())
+        
+        # 高さの上限に収まるようフォントサイズを縮小する
+        fitted = fit_font_size(text, font_path, font_size, max_width, max_height=font_size * 2)
+        logger.info(f"Fitted font size: {fitted}")
+        assert fitted <= font_size
+        assert fit_font_size(text, font_path, font_size, max_width) == font_size
+        
+        # 字幕画像は折り返し幅の透過画像として描画される
+        spec = SubtitleRasterCache.make_spec(text, font_path, font_size, 'white', max_width)
+        image = render_text(spec)
+        logger.info(f"Rendered subtitle: {image.size}")
+        assert image.mode == 'RGBA'
+        assert image.size[0] == max_width
+        assert image.getbbox() is not None
+        
+        return image
+        
+    except Exception as e:
+        logger.error(f"Error in test_text_renderer: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_text_renderer()
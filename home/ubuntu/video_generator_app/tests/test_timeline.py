@@ -0,0 +1,178 @@
+"""
+タイムラインのテスト用スクリプト
+"""
+import os
+import sys
+import wave
+import logging
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# プロジェクトのルートディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# タイムラインモジュールをインポート
+from src.video_generator.timeline import Timeline
+from src.video_generator import create_video_generator
+
+def test_timeline(comment_count: int = 1000, audio_duration: float = 3.1234567, fps: int = 24):
+    """整数単位のタイムラインの作成とJSONでの保存・復元のテスト
+
+    Args:
+        comment_count: コメントの数
+        audio_duration: 1コメントあたりの音声の長さ（秒）
+        fps: フレームレート
+    """
+    try:
+        timeline = Timeline(sample_rate=44100, fps=fps)
+        for i in range(comment_count):
+            timeline.add_narration(f"audio_{i}.mp3", audio_duration, f"コメント{i}")
+        
+        # 開始位置は長さの整数倍になり、浮動小数点の誤差が蓄積しない
+        length = timeline.audio_lengths[0]
+        assert all(start == i * length for i, start in enumerate(timeline.audio_starts))
+        assert timeline.total_samples == comment_count * length
+        logger.info(f"{len(timeline)} comments, {timeline.duration:.3f}s, {timeline.total_frames} frames")
+        
+        # 字幕はナレーションと同じ区間に表示される
+        subtitles = timeline.subtitles()
+        assert len(subtitles) == comment_count
+        assert subtitles[-1]["start"] == timeline.narration()[-1][1]
+        
+        # スライドはフレーム単位で、最後のスライドがナレーションの終わりまで延長される
+        timeline.schedule_slides(["a.png", "b.png", "c.png"], 5.0)
+        assert list(timeline.slide_lengths[:2]) == [5 * fps, 5 * fps]
+        assert timeline.slide_starts[-1] + timeline.slide_lengths[-1] == timeline.total_frames
+        assert [path for path, _, _ in timeline.slides(["x.png", "y.png", "z.png"])] == ["x.png", "y.png", "z.png"]
+        
+        # JSONで保存・復元しても同じタイムラインになる
+        restored = Timeline.from_json(timeline.to_json())
+        assert restored == timeline
+        
+        # 複製を変更しても元のタイムラインは変わらない
+        copied = timeline.copy()
+        copied.add_narration("extra.mp3", 1.0)
+        assert copied != timeline and len(timeline) == comment_count
+        
+        return timeline
+        
+    except Exception as e:
+        logger.error(f"Error in test_timeline: {e}")
+        raise
+
+def test_slide_modes(comment_count: int = 10, fps: int = 24):
+    """ナレーションに合わせたスライドの表示区間の決定のテスト
+
+    Args:
+        comment_count: コメントの数
+        fps: フレームレート
+    """
+    try:
+        timeline = Timeline(sample_rate=44100, fps=fps)
+        for i in range(comment_count):
+            timeline.add_narration(f"audio_{i}.mp3", 2.0 + i * 0.37, f"コメント{i}")
+        images = ["a.png", "b.png", "c.png"]
+        comment_frames = [timeline.samples_to_frames(start) for start in timeline.audio_starts]
+        
+        for mode, comments_per_slide in (('fixed', 0), ('even', 0), ('comments', 0), ('comments', 2)):
+            timeline.schedule_slides(images, 5.0, mode, comments_per_slide)
+            
+            # どのモードでもスライドは隙間なく並び、ナレーションの終わりでちょうど終わる
+            ends = [start + length for start, length in zip(timeline.slide_starts, timeline.slide_lengths)]
+            assert timeline.slide_starts[0] == 0 and ends[-1] == timeline.total_frames
+            assert list(timeline.slide_starts[1:]) == ends[:-1]
+            assert all(length > 0 for length in timeline.slide_lengths)
+            logger.info(f"{mode}({comments_per_slide}): {list(timeline.slide_lengths)}")
+            
+            # コメントの境界で切り替える場合は、スライドの開始位置がコメントの開始位置と一致する
+            if mode == 'comments':
+                per_slide = comments_per_slide or 4
+                assert list(timeline.slide_starts) == comment_frames[::per_slide][:len(images)]
+        
+        # 均等に分ける場合は、すべての画像の表示時間の差が1フレーム以内になる
+        timeline.schedule_slides(images, 5.0, 'even')
+        assert len(timeline.slide_paths) == len(images)
+        assert max(timeline.slide_lengths) - min(timeline.slide_lengths) <= 1
+        
+        # 別のフレームレートで使う場合（プレビューなど）は、合計が全体の長さを換算したものと一致する
+        preview_frames = timeline.slide_frames(8)
+        assert timeline.slide_frames() == list(timeline.slide_lengths)
+        assert sum(preview_frames) == round(timeline.total_frames * 8 / fps)
+        assert all(length > 0 for length in preview_frames)
+        assert timeline.output_frames() == timeline.total_frames
+        assert timeline.output_frames(8) == round(timeline.duration * 8)
+        
+        # ナレーションがない場合は1枚あたりslide_durationずつ表示する
+        silent = Timeline(fps=fps)
+        silent.schedule_slides(images, 5.0, 'comments')
+        assert list(silent.slide_lengths) == [5 * fps] * len(images)
+        
+        return timeline
+        
+    except Exception as e:
+        logger.error(f"Error in test_slide_modes: {e}")
+        raise
+
+def test_preview_timeline(comment_count: int = 5, fps: int = 24, preview_fps: int = 8, output_dir: str = None):
+    """プレビュー用のエンジンが本番のフレームレートでタイムラインを計画することのテスト
+
+    Args:
+        comment_count: コメントの数
+        fps: 本番のフレームレート
+        preview_fps: プレビューのフレームレート
+        output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+    """
+    try:
+        # 出力ディレクトリの設定
+        if output_dir is None:
+            output_dir = os.path.join(os.getcwd(), "test_output", "timeline")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # フレームの境界に揃わない長さの無音のナレーション音声を作成
+        audio_paths = []
+        for i in range(comment_count):
+            path = os.path.join(output_dir, f"comment_{i}.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(44100)
+                f.writeframes(b"\0" * 2 * int(44100 * (1.013 + i * 0.37)))
+            audio_paths.append({"path": path, "text": f"コメント{i + 1}"})
+        
+        engines = {}
+        for preview in (False, True):
+            engines[preview] = create_video_generator(
+                'pyav',
+                output_dir=output_dir,
+                temp_dir=os.path.join(output_dir, "temp"),
+                fps=fps,
+                preview=preview,
+                preview_fps=preview_fps,
+                slide_mode='comments'
+            )
+        
+        # プレビューでも本番と同じタイムラインになり、出力のフレーム数だけ換算する
+        images = ["a.png", "b.png"]
+        final = engines[False].plan_timeline(audio_paths, image_paths=images)
+        preview = engines[True].plan_timeline(audio_paths, image_paths=images)
+        logger.info(f"Final: {final.to_dict()['slides']}, preview frames: {preview.slide_frames(preview_fps)}")
+        assert engines[True].fps == preview_fps and preview.fps == fps
+        assert preview == final
+        assert sum(preview.slide_frames(preview_fps)) == preview.output_frames(preview_fps)
+        
+        return final
+        
+    except Exception as e:
+        logger.error(f"Error in test_preview_timeline: {e}")
+        raise
+
+if __name__ == "__main__":
+    test_timeline()
+    test_slide_modes()
+    test_preview_timeline()
@@ -150,7 +150,8 @@ def test_add_subtitles(video_path: str, subtitles: list, output_dir: str = None)
         raise
 
 def test_generate_video(image_paths: list, audio_paths: list, intro_audio_path: str = None, 
-                       bgm_path: str = None, slide_duration: float = 5.0, output_dir: str = None):
+                       bgm_path: str = None, slide_duration: float = 5.0, output_dir: str = None,
+                       engine_type: str = "diffusionstudio"):
     """動画生成のテスト
 
     Args:
@@ -160,6 +161,7 @@ def test_generate_video(image_paths: list, audio_paths: list, intro_audio_path:
         bgm_path: BGMファイルのパス（Noneの場合はBGMなし）
         slide_duration: 1枚あたりの表示時間（秒）
         output_dir: 出力ディレクトリ（Noneの場合はデフォルト）
+        engine_type: 動画生成エンジンタイプ ('diffusionstudio'、'ffmpeg'、'pyav'のいずれか)
     """
     try:
         # 出力ディレクトリの設定
@@ -172,7 +174,7 @@ def test_generate_video(image_paths: list, audio_paths: list, intro_audio_path:
         
         # 動画生成エンジンを作成
         video_generator = create_video_generator(
-            "diffusionstudio",
+            engine_type,
             output_dir=output_dir,
             temp_dir=temp_dir
         )
@@ -190,7 +192,7 @@ def test_generate_video(image_paths: list, audio_paths: list, intro_audio_path:
             intro_audio_path=intro_audio_path,
             bgm_path=bgm_path,
             slide_duration=slide_duration,
-            output_filename="test_final_video.mp4"
+            output_filename=f"test_final_video_{engine_type}.mp4"
         )
         
         logger.info(f"Video generated successfully: {video_path}")
@@ -267,3 +269,23 @@ if __name__ == "__main__":
             intro_audio_path=test_intro_audio_path,
             bgm_path=test_bgm_path
         )
+    
+    if test_type == "ffmpeg" or test_type == "all":
+        # ffmpegエンジンによる動画生成のテスト
+        final_video_path = test_generate_video(
+            test_image_paths,
+            test_audio_paths,
+            intro_audio_path=test_intro_audio_path,
+            bgm_path=test_bgm_path,
+            engine_type="ffmpeg"
+        )
+    
+    if test_type == "pyav" or test_type == "all":
+        # PyAVエンジンによる動画生成のテスト
+        final_video_path = test_generate_video(
+            test_image_paths,
+            test_audio_paths,
+            intro_audio_path=test_intro_audio_path,
+            bgm_path=test_bgm_path,
+            engine_type="pyav"
+        )